@@ -12,8 +12,26 @@ from flask import (
     redirect,
     url_for,
 )
-from send_mail import prepare_and_send_email
-from detection import get_detector  # UPDATED
+from detection import (  # UPDATED
+    get_detector,
+    get_shared_detector,
+    configure_runtime,
+    assess_compliance,
+    open_detection_cache,
+    ModelDeployment,
+    CONF_FLOOR,
+)
+from events import EventBroadcaster, DashboardStats
+from episodes import EpisodeBuilder
+from evidence import EvidenceStore
+from heatmap import ViolationHeatmap, render_heatmap
+from pipeline import StagedPipeline
+from recorder import HISTORY_MARGIN_SECONDS, ClipRecorder, FrameHistory
+from scheduler import InferenceScheduler
+from supervisor import SourceSupervisor, SourceLimitError, process_rss_bytes
+from tracing import FrameTrace, TraceRecorder
+from videos import UploadError, VideoLibrary
+from streaming import FrameSignal, MJPEG_MIMETYPE, mjpeg_part, ndjson_line, sse_message
 import json
 from io import BytesIO
 import threading
@@ -22,41 +40,188 @@ from datetime import datetime, timedelta
 import queue
 import re
 import base64
+import hashlib
+from collections import OrderedDict
 
 # Initialize the Flask application
 app = Flask(__name__)
 app.config["VIDEO_UPLOADS"] = "static/video"
 app.config["ALLOWED_VIDEO_EXTENSIONS"] = ["MP4", "MOV", "AVI", "WMV", "WEBM"]
+# Probed video metadata, thumbnails and unfinished uploads; largest upload (GB)
+app.config["VIDEO_INDEX_DIR"] = os.getenv("VIDEO_INDEX_DIR", "video_index")
+app.config["MAX_UPLOAD_GB"] = float(os.getenv("MAX_UPLOAD_GB", 10))
+# Sources added through the API, restored in the background at startup
+app.config["SOURCES_CONFIG"] = os.getenv("SOURCES_CONFIG", "sources.json")
+# Settings changed through the API, shared by every worker process
+app.config["SETTINGS_CONFIG"] = os.getenv("SETTINGS_CONFIG", "settings.json")
 app.config["SECRET_KEY"] = "ppe_violation_detection"
+# How cores are split between concurrent inference lanes (see
+# detection/runtime.py): latency, balanced, throughput, auto or e.g. "4x4"
+app.config["INFERENCE_THREAD_POLICY"] = os.getenv("INFERENCE_THREAD_POLICY", "auto")
+thread_budget = configure_runtime(app.config["INFERENCE_THREAD_POLICY"])
+# Concurrent inference lanes and optional fixed capacity (inferences/sec);
+# without a fixed capacity it is estimated from measured inference latency
+app.config["INFERENCE_LANES"] = (
+    int(os.getenv("INFERENCE_LANES", 0)) or thread_budget.lanes
+)
+app.config["INFERENCE_CAPACITY_FPS"] = float(os.getenv("INFERENCE_CAPACITY_FPS", 0)) or None
+# Encoded stream variants: width in px (None = native), JPEG quality and
+# maximum frame rate (None = source rate)
+app.config["STREAM_VARIANTS"] = {
+    "full": {"width": None, "quality": 80, "fps": None},
+    "tile": {"width": 320, "quality": 60, "fps": 5},
+}
+# Violation clips: seconds kept before/after an episode starts, and the
+# rate/width at which recent frames are kept as JPEG for them
+app.config["CLIP_PRE_SECONDS"] = float(os.getenv("CLIP_PRE_SECONDS", 10))
+app.config["CLIP_POST_SECONDS"] = float(os.getenv("CLIP_POST_SECONDS", 10))
+app.config["CLIP_FPS"] = float(os.getenv("CLIP_FPS", 5))
+app.config["CLIP_WIDTH"] = int(os.getenv("CLIP_WIDTH", 960))
+# Evidence store for best frames, alert snapshots and clips: directory, and
+# the age (days) and total size (GB) beyond which the oldest files are deleted
+app.config["EVIDENCE_DIR"] = os.getenv("EVIDENCE_DIR", "evidence")
+app.config["EVIDENCE_MAX_AGE_DAYS"] = float(os.getenv("EVIDENCE_MAX_AGE_DAYS", 30))
+app.config["EVIDENCE_MAX_GB"] = float(os.getenv("EVIDENCE_MAX_GB", 5))
+app.config["EVIDENCE_THUMB_WIDTH"] = int(os.getenv("EVIDENCE_THUMB_WIDTH", 320))
+# Violation heatmaps: grid size, time bucket length and count, and the
+# half-life of the decayed "recent activity" view (seconds)
+app.config["HEATMAP_GRID"] = (64, 36)
+app.config["HEATMAP_BUCKET_SECONDS"] = float(os.getenv("HEATMAP_BUCKET_SECONDS", 3600))
+app.config["HEATMAP_BUCKETS"] = int(os.getenv("HEATMAP_BUCKETS", 24))
+app.config["HEATMAP_HALF_LIFE"] = float(os.getenv("HEATMAP_HALF_LIFE", 3600))
+# Registry name of the detector used for background analysis of sources,
+# e.g. "ppe_cascade" to skip the full model on frames without people
+app.config["ANALYSIS_DETECTOR"] = os.getenv("ANALYSIS_DETECTOR", "ppe")
+# ...and for screening kiosks ("fake" for reproducible load tests)
+app.config["SCREENING_DETECTOR"] = os.getenv("SCREENING_DETECTOR", "ppe")
+# On-disk detection cache for file sources ("" disables it) and how many
+# frames away a cached result may be reused when a loop lands off by one
+app.config["DETECTION_CACHE_DIR"] = os.getenv("DETECTION_CACHE_DIR", "detection_cache")
+app.config["DETECTION_CACHE_TOLERANCE"] = int(os.getenv("DETECTION_CACHE_TOLERANCE", 1))
+# Candidate analysis models must be weights files in this directory; the live
+# model is ANALYSIS_WEIGHTS, or the last promoted one recorded in live.json
+app.config["MODELS_DIR"] = os.getenv("MODELS_DIR", "models")
+app.config["ANALYSIS_WEIGHTS"] = os.getenv("ANALYSIS_WEIGHTS") or None
+# Per-frame traces: JSON Lines export directory ("" disables it) and the share
+# of frames exported; frames that raise an alert are always exported
+app.config["TRACE_DIR"] = os.getenv("TRACE_DIR", "traces")
+app.config["TRACE_SAMPLE_RATE"] = float(os.getenv("TRACE_SAMPLE_RATE", 0.01))
+# Caps on concurrently running sources and on process memory (MB, 0 = none)
+# beyond which new sources are refused
+app.config["MAX_SOURCES"] = int(os.getenv("MAX_SOURCES", 32))
+app.config["MEMORY_LIMIT_MB"] = float(os.getenv("MEMORY_LIMIT_MB", 0)) or None
+# Whether this process runs the camera pipelines; serve.py clears it in every
+# worker but the one that owns the sources
+app.config["OWNS_SOURCES"] = True
 
 # ensure upload folder exists
 os.makedirs(app.config["VIDEO_UPLOADS"], exist_ok=True)
+# Clips are encoded here, then moved into the evidence store
+CLIP_SCRATCH_DIR = os.path.join(app.config["EVIDENCE_DIR"], "incoming")
+os.makedirs(CLIP_SCRATCH_DIR, exist_ok=True)
 
 # Multi-source management
 sources = {}  # {source_id: SourceInfo}
-source_threads = {}  # {source_id: Thread}
-event_queue = queue.Queue()  # For Server-Sent Events
-detection_events = []  # Store recent detection events
+supervisor = SourceSupervisor(  # Owns every source's worker threads
+    max_sources=app.config["MAX_SOURCES"],
+    memory_limit_mb=app.config["MEMORY_LIMIT_MB"],
+)
+event_bus = EventBroadcaster()  # Fan-out for Server-Sent Events
+dashboard_stats = DashboardStats()  # Incremental dashboard aggregates
+detection_events = []  # Recent violation episodes (last hour)
+detection_events_lock = threading.Lock()
+clip_recorder = ClipRecorder(
+    CLIP_SCRATCH_DIR,
+    pre_seconds=app.config["CLIP_PRE_SECONDS"],
+    post_seconds=app.config["CLIP_POST_SECONDS"],
+)
+evidence_store = EvidenceStore(  # Written in the background, never by detection
+    app.config["EVIDENCE_DIR"],
+    max_age=app.config["EVIDENCE_MAX_AGE_DAYS"] * 86400,
+    max_bytes=app.config["EVIDENCE_MAX_GB"] * 2**30,
+    thumb_width=app.config["EVIDENCE_THUMB_WIDTH"],
+)
+video_library = VideoLibrary(  # Uploads, and metadata probed in the background
+    app.config["VIDEO_UPLOADS"],
+    index_dir=app.config["VIDEO_INDEX_DIR"],
+    extensions=app.config["ALLOWED_VIDEO_EXTENSIONS"],
+    max_upload_bytes=app.config["MAX_UPLOAD_GB"] * 2**30,
+    on_indexed=lambda entry: event_bus.publish(
+        "video_indexed", {k: v for k, v in entry.items() if k != "keyframes"}
+    ),
+)
+frame_traces = TraceRecorder(  # Capture-to-alert spans of analysed frames
+    app.config["TRACE_DIR"], sample_rate=app.config["TRACE_SAMPLE_RATE"]
+)
+
+
+def promoted_weights():
+    """Weights promoted before the last restart, if they still exist."""
+    try:
+        with open(os.path.join(app.config["MODELS_DIR"], "live.json")) as f:
+            weights = json.load(f)["weights"]
+    except (OSError, ValueError, KeyError):
+        return None
+    return weights if os.path.isfile(weights) else None
+
 
-# Legacy global state (for backward compatibility)
-frames_buffer = []
+STATS_INTERVAL_SEC = 5
+inference_scheduler = InferenceScheduler(
+    lanes=app.config["INFERENCE_LANES"],
+    capacity_fps=app.config["INFERENCE_CAPACITY_FPS"],
+)
+analysis_models = ModelDeployment(  # Live analysis model and shadow candidate
+    get_detector(app.config["ANALYSIS_DETECTOR"]),
+    weights=app.config["ANALYSIS_WEIGHTS"] or promoted_weights(),
+    lane=inference_scheduler.lane,  # Shadow inference waits for a free lane
+)
+
+# Legacy single-video view: a regular source registered on first use
 current_video_name = None
-vid_path = None
-video_frames = None
+legacy_source_id = None
+legacy_lock = threading.Lock()
 
 # email alert globals
 email_alert_enabled = False
 email_recipient = None
-last_email_time = 0  # epoch seconds
-EMAIL_COOLDOWN_SEC = 60  # avoid spamming
-
-# violation tracking globals
-violation_log = {}  # {class_name: {'count': int, 'first_seen': timestamp}}
-tracking_loop_count = 0
-current_loop_violations = {}
 
 # Default confidence threshold
 default_confidence = 0.5
+settings_mtime = None  # SETTINGS_CONFIG version the globals above reflect
+
+# Frames decoded only for detection are downscaled to this width
+DETECTION_FRAME_WIDTH = 640
+
+# Per-source stages and their inboxes: (max queued items, policy when full),
+# see pipeline.py. Each stage runs in its own supervised worker.
+SOURCE_STAGES = {
+    "capture": None,  # Decode; feeds detection and history
+    "detection": (1, "drop_oldest"),  # Always analyse the newest frame
+    "events": (32, "block"),  # Compliance and episodes must see every result
+    "alerts": (16, "drop_newest"),  # A slow mail server never backs up analysis
+    "history": (4, "drop_oldest"),  # JPEG encoding for violation clips
+}
+CLOSE_EPISODES = object()  # Events-stage marker: detection was switched off
+
+# Bounding box colour per detector (BGR)
+DETECTOR_COLOURS = {
+    "ppe": (255, 0, 0),  # Blue
+}
+
+# Background startup progress reported by /readyz
+startup_state = {
+    "started": False,
+    "model_ready": False,
+    "sources_restored": False,
+    "error": None,
+}
+startup_lock = threading.Lock()
+sources_config_lock = threading.Lock()
+
+# Raw detections for recently screened images, keyed by image digest
+screening_cache = OrderedDict()
+screening_cache_lock = threading.Lock()
+SCREENING_CACHE_SIZE = 32
 
 
 class SourceInfo:
@@ -65,39 +230,136 @@ class SourceInfo:
         self.name = name
         self.type = source_type  # 'file' or 'stream'
         self.path = path
-        self.status = "inactive"
+        self.config = {}  # add_source() arguments, used to persist the source
+        self.persistent = False  # Saved to SOURCES_CONFIG and restored at startup
+        self._status = "inactive"
         self.fps = 0
         self.frames_buffer = []
-        self.video_capture = None
+        self.frames_read = 0  # Sequence number of the newest buffered frame
+        self.newest_frame = None  # (frame, frames_read, index in file or None)
+        self.detection_cache = None  # DetectionCache for file sources
+        self.frame_signal = FrameSignal()  # Wakes stream consumers on new frames
+        self.stages = StagedPipeline(SOURCE_STAGES)  # Queues between the workers
+        self.heatmap = ViolationHeatmap(  # Where violating people have been
+            *app.config["HEATMAP_GRID"],
+            bucket_seconds=app.config["HEATMAP_BUCKET_SECONDS"],
+            buckets=app.config["HEATMAP_BUCKETS"],
+            half_life=app.config["HEATMAP_HALF_LIFE"],
+        )
+        self.history = FrameHistory(  # Recent frames as JPEG for violation clips
+            app.config["CLIP_PRE_SECONDS"]
+            + app.config["CLIP_POST_SECONDS"]
+            + HISTORY_MARGIN_SECONDS,
+            fps=app.config["CLIP_FPS"],
+            width=app.config["CLIP_WIDTH"],
+        )
+        # {(variant, processed, conf, detectors): (seq, jpeg, encoded_at, captured_at)}
+        self.jpeg_cache = {}
+        self.video_capture = None  # Owned by the capture worker once started
+        self.stop_event = threading.Event()  # Set by the supervisor on removal
+        self.last_frame_at = None  # time.time() of the last grabbed frame
         self.violation_counts = {}
         self.last_detection = None
-        self.detection_thread = None
-        self.alerts_sent = (
-            set()
-        )  # Track unique alerts sent (violation_type, timestamp_minute)
         self.total_frames_processed = 0  # For compliance rate calculation
         self.frames_with_violations = 0  # For compliance rate calculation
+        self.people_checked = 0  # People assessed for PPE across analysed frames
+        self.people_compliant = 0  # ...of which wore everything detected
+        self.loop_count = 0  # Completed passes over a file source
+        self.loop_violations = {}  # {class_name: {'count', 'first_seen', 'first_frame'}}
+        self.violation_log = {}  # Violations from the first complete pass
+        self.detections = {}  # {detector_name: Detections} for the latest analysed frame
+        self.people = []  # Per-person compliance records for the latest analysed frame
+        self.detection_signal = FrameSignal()  # Wakes metadata streams per analysis
+        self.detection_payload = None  # Compact record of the latest analysis
+        self.frame_width = 0  # Native width; detections are reported at this size
+        self.frame_height = 0
+        self.frame_count = 0  # Files only: frames in one pass over the video
+        self.viewers = 0  # Connected stream viewers
+        self._viewers_lock = threading.Lock()
+        self.activity_changed = threading.Event()  # Wakes an idle decode loop
+        self.detection_wanted = threading.Event()  # Set while detection needs frames
+        self.detection_wanted.set()
+
+    @property
+    def activity(self):
+        """Decode mode derived from subscribers.
+
+        'full' while anyone is watching, 'detection' when only background
+        detection needs frames, otherwise 'idle' (keep-alive only).
+        """
+        if self.viewers > 0:
+            return "full"
+        if self.detection_enabled:
+            return "detection"
+        return "idle"
+
+    @property
+    def detection_enabled(self):
+        return self.detection_wanted.is_set()
+
+    def set_detection_enabled(self, enabled):
+        if enabled:
+            self.detection_wanted.set()
+        else:
+            self.detection_wanted.clear()
+        self.activity_changed.set()
+
+    def add_viewer(self):
+        with self._viewers_lock:
+            self.viewers += 1
+        self.activity_changed.set()
+
+    def remove_viewer(self):
+        with self._viewers_lock:
+            self.viewers = max(0, self.viewers - 1)
+        self.activity_changed.set()
+
+    @property
+    def status(self):
+        return self._status
+
+    @status.setter
+    def status(self, value):
+        old_status = self._status
+        self._status = value
+        dashboard_stats.status_changed(self, old_status, value)
+
+    def memory_bytes(self):
+        """Approximate memory held in frame buffers and caches."""
+        frames = list(self.frames_buffer)
+        cached = list(self.jpeg_cache.values())
+        return (
+            sum(frame.nbytes for frame in frames)
+            + sum(len(entry[1]) for entry in cached)
+            + self.history.size_bytes
+            + self.heatmap.size_bytes
+        )
 
+    def record_loop_violation(self, class_name, frame_number):
+        """Record a violation detection for the current pass."""
+        if class_name not in self.loop_violations:
+            self.loop_violations[class_name] = {
+                "count": 0,
+                "first_seen": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "first_frame": frame_number,
+            }
+        self.loop_violations[class_name]["count"] += 1
 
-def reset_violation_tracking():
-    """Reset violation tracking for a new video or loop."""
-    global violation_log, current_loop_violations, tracking_loop_count
-    violation_log = {}
-    current_loop_violations = {}
-    tracking_loop_count = 0
+    def complete_loop(self):
+        """Called when a file source wraps around to its first frame."""
+        # Save violations from the first completed loop
+        if self.loop_count == 0 and self.loop_violations:
+            self.violation_log = dict(self.loop_violations)
+            print(f"Saved violations: {self.violation_log}")
+        self.loop_count += 1
+        self.loop_violations = {}
 
 
-def record_violation(class_name):
-    """Record a violation detection."""
-    global current_loop_violations
+def prepare_and_send_email(*args, **kwargs):
+    """Send an alert email; the Gmail client is only imported on first use."""
+    from send_mail import prepare_and_send_email as send_email
 
-    if class_name not in current_loop_violations:
-        current_loop_violations[class_name] = {
-            "count": 0,
-            "first_seen": time.strftime("%Y-%m-%d %H:%M:%S"),
-            "first_frame": len(frames_buffer),  # Approximate frame number
-        }
-    current_loop_violations[class_name]["count"] += 1
+    return send_email(*args, **kwargs)
 
 
 def allowed_video(filename: str) -> bool:
@@ -108,102 +370,244 @@ def allowed_video(filename: str) -> bool:
 
 
 # Multi-source management functions
-def add_source(name, source_type, path):
-    """Add a new video source."""
-    source_id = str(uuid.uuid4())
-    source = SourceInfo(source_id, name, source_type, path)
-
-    # Initialize video capture
-    if source_type == "file":
-        full_path = os.path.join(app.config["VIDEO_UPLOADS"], path)
-        source.video_capture = cv2.VideoCapture(full_path)
-    else:  # stream
-        source.video_capture = cv2.VideoCapture(path)
+def add_source(
+    name,
+    source_type,
+    path,
+    priority=1,
+    min_fps=1.0,
+    max_fps=10.0,
+    detection_enabled=True,
+    source_id=None,
+):
+    """Add a new video source.
+
+    ``priority``, ``min_fps`` and ``max_fps`` control the source's share of
+    the global inference budget. ``source_id`` is generated unless given, as
+    it is by a sharding coordinator so that a source keeps its id when it
+    moves between nodes.
+    """
+    source_id = source_id or str(uuid.uuid4())
+    supervisor.reserve(source_id)
+    try:
+        source = SourceInfo(source_id, name, source_type, path)
+        source.set_detection_enabled(detection_enabled)
+        source.config = {
+            "id": source_id,
+            "name": name,
+            "type": source_type,
+            "path": path,
+            "priority": priority,
+            "min_fps": min_fps,
+            "max_fps": max_fps,
+            "detection_enabled": detection_enabled,
+        }
 
-    if source.video_capture.isOpened():
-        source.status = "active"
-        source.fps = source.video_capture.get(cv2.CAP_PROP_FPS) or 30
+        # Library videos are described by their index entry, so adding one opens
+        # no decoder here; the capture worker opens the file when it starts
+        info = video_library.info(path) if source_type == "file" else None
+        if info is not None:
+            if info["status"] != "ready":
+                return None
+            source.fps = info["fps"] or 30
+            source.frame_width, source.frame_height = info["width"], info["height"]
+            source.frame_count = info["frames"]
+            source.status = "active"
+        elif open_capture(source):
+            source.fps = source.video_capture.get(cv2.CAP_PROP_FPS) or 30
+            if source_type == "file":
+                source.frame_count = int(
+                    source.video_capture.get(cv2.CAP_PROP_FRAME_COUNT)
+                )
+        else:
+            return None
         sources[source_id] = source
-
-        # Start frame processing thread
-        frame_thread = threading.Thread(target=process_source, args=(source_id,))
-        frame_thread.daemon = True
-        frame_thread.start()
-        source_threads[source_id] = frame_thread
-
-        # Start detection processing thread
-        detection_thread = threading.Thread(
-            target=process_detections, args=(source_id,)
+        dashboard_stats.register_source(source)
+        inference_scheduler.register(
+            source_id,
+            priority=priority,
+            min_fps=min(min_fps, source.fps),
+            max_fps=min(max_fps, source.fps),
         )
-        detection_thread.daemon = True
-        detection_thread.start()
-        source.detection_thread = detection_thread
 
+        # One worker per stage, run by the supervisor, which restarts them after
+        # a crash and joins them when the source is removed
+        supervisor.start(
+            source_id,
+            {
+                "capture": lambda: process_source(source_id),
+                "detection": lambda: process_detections(source_id),
+                "events": lambda: process_events(source_id),
+                "alerts": lambda: process_alerts(source_id),
+                "history": lambda: process_history(source_id),
+            },
+            source.stop_event,
+        )
         return source
-    else:
-        return None
+    finally:
+        # No-op once started; otherwise frees the slot for the next source
+        supervisor.release(source_id)
 
 
-def remove_source(source_id):
-    """Remove a video source."""
-    if source_id in sources:
-        source = sources[source_id]
-        source.status = "inactive"
+def open_capture(source):
+    """(Re)open a source's VideoCapture; returns whether it is usable."""
+    if source.video_capture is not None:
+        source.video_capture.release()
+    if source.type == "file":
+        full_path = os.path.join(app.config["VIDEO_UPLOADS"], source.path)
+        source.video_capture = cv2.VideoCapture(full_path)
+    else:  # stream
+        source.video_capture = cv2.VideoCapture(source.path)
 
-        # Stop video capture
-        if source.video_capture:
-            source.video_capture.release()
+    if not source.video_capture.isOpened():
+        source.status = "error"
+        return False
+    source.status = "active"
+    source.frame_width = int(source.video_capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+    source.frame_height = int(source.video_capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    return True
+
+
+def remove_source(source_id):
+    """Remove a video source once its workers have stopped."""
+    source = sources.get(source_id)
+    if source is None:
+        return False
 
-        # Remove from dictionaries
-        del sources[source_id]
-        if source_id in source_threads:
-            del source_threads[source_id]
+    # Signal and join the workers; the capture worker releases the capture
+    supervisor.stop(source_id)
+    source.status = "inactive"
 
-        return True
-    return False
+    # Remove from dictionaries
+    dashboard_stats.unregister_source(source)
+    inference_scheduler.unregister(source_id)
+    analysis_models.release(source_id)
+    sources.pop(source_id, None)
+    return True
+
+
+def downscale(frame, width):
+    """Resize a frame to ``width`` keeping its aspect ratio (never upscales)."""
+    height, frame_width = frame.shape[:2]
+    if frame_width <= width:
+        return frame
+    return cv2.resize(
+        frame, (width, round(height * width / frame_width)), interpolation=cv2.INTER_AREA
+    )
 
 
 def process_source(source_id):
-    """Process video frames from a source."""
+    """Process video frames from a source.
+
+    The amount of work follows ``source.activity``: with viewers every frame
+    is decoded at full size; for detection alone only the frames the
+    scheduler will analyse are decoded, at reduced resolution; idle streams
+    are only grabbed (never decoded) to keep the connection alive, and idle
+    files are not read at all.
+    """
     source = sources.get(source_id)
     if not source:
         return
 
-    frame_count = 0
+    # After a crash or a dropped stream the supervisor calls us again
+    if (
+        source.video_capture is None
+        or not source.video_capture.isOpened()
+        or source.status == "error"
+    ):
+        if not open_capture(source):
+            raise IOError(f"Could not open {source.path}")
+
     frame_delay = 1.0 / source.fps
     last_frame_time = time.time()
+    last_decode_time = 0.0
 
-    while source.status == "active" and source_id in sources:
-        success, frame = source.video_capture.read()
-        if not success:
-            if source.type == "file":
-                # Restart video from beginning
-                source.video_capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                success, frame = source.video_capture.read()
-                if not success:
-                    time.sleep(0.01)
-                    continue
-            else:
-                # Stream error
-                source.status = "error"
-                break
+    try:
+        while not source.stop_event.is_set():
+            activity = source.activity
+            if activity == "idle" and source.type == "file":
+                # Files can resume from where they stopped whenever demand returns
+                source.activity_changed.wait(timeout=1.0)
+                source.activity_changed.clear()
+                last_frame_time = time.time()
+                continue
+
+            success = source.video_capture.grab()
+            if not success:
+                if source.type == "file":
+                    # Restart video from beginning
+                    source.complete_loop()
+                    source.video_capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    success = source.video_capture.grab()
+                    if not success:
+                        time.sleep(0.01)
+                        continue
+                else:
+                    # Stream error; the supervisor reopens it after a backoff
+                    source.status = "error"
+                    raise IOError(f"Lost stream {source.path}")
 
-        # Control frame rate
-        current_time = time.time()
-        time_since_last_frame = current_time - last_frame_time
-        if time_since_last_frame < frame_delay:
-            time.sleep(frame_delay - time_since_last_frame)
-        last_frame_time = time.time()
+            source.last_frame_at = time.time()
 
-        # Add frame to buffer
-        frame_count += 1
-        source.frames_buffer.append(frame.copy())
+            # Control frame rate
+            current_time = time.time()
+            time_since_last_frame = current_time - last_frame_time
+            if time_since_last_frame < frame_delay:
+                time.sleep(frame_delay - time_since_last_frame)
+            last_frame_time = time.time()
+
+            if activity == "idle":
+                continue  # Keep-alive: grabbed but never decoded
+
+            if activity == "detection":
+                # Only decode the frames the scheduler will actually analyse
+                analysis_delay = 1.0 / inference_scheduler.allocated_fps(source_id)
+                if last_frame_time - last_decode_time < analysis_delay:
+                    continue
+                last_decode_time = last_frame_time
+
+            with source.stages["capture"].timed():
+                success, frame = source.video_capture.retrieve()
+                if not success:
+                    continue
+                if activity == "detection":
+                    frame = downscale(frame, DETECTION_FRAME_WIDTH)
+                else:
+                    frame = frame.copy()
+
+                # Add frame to buffer
+                source.frames_buffer.append(frame)
+                source.frames_read += 1
+                position = None
+                if source.type == "file":
+                    position = (
+                        int(source.video_capture.get(cv2.CAP_PROP_POS_FRAMES)) - 1
+                    )
+                source.newest_frame = (frame, source.frames_read, position)
+                source.frame_signal.notify()
 
-        # Keep buffer size reasonable
-        if len(source.frames_buffer) > 60:
-            source.frames_buffer = source.frames_buffer[-60:]
+                # Hand the frame on; detection keeps only the newest one
+                if source.detection_enabled:
+                    trace = FrameTrace(
+                        source.id, source.frames_read, source.last_frame_at
+                    )
+                    trace.lap("capture")
+                    source.stages["detection"].put(
+                        (frame, source.frames_read, position, trace)
+                    )
+                # Compact JPEG history for pre-event clips (rate-limited)
+                if source.history.claim(last_frame_time):
+                    source.stages["history"].put(
+                        (frame, source.frames_read, last_frame_time)
+                    )
 
-    source.status = "inactive"
+                # Keep buffer size reasonable
+                if len(source.frames_buffer) > 60:
+                    source.frames_buffer = source.frames_buffer[-60:]
+    finally:
+        if source.stop_event.is_set():
+            # This worker owns the capture, so nobody else is reading it
+            source.video_capture.release()
 
 
 def process_detections(source_id):
@@ -212,403 +616,623 @@ def process_detections(source_id):
     if not source:
         return
 
-    # Initialize detector
-    detector = get_detector("ppe")(conf=default_confidence)
-    processed_index = 0
+    # The detector runs at the floor threshold and every consumer filters the
+    # cached raw detections with its own threshold. It comes from the model
+    # deployment, which loads it on the first frame not in the on-disk cache
+    # and may swap it for a promoted model between any two frames.
+    detector_name = app.config["ANALYSIS_DETECTOR"]
+    detector_cls = analysis_models.detector_cls
 
-    while source.status == "active" and source_id in sources:
-        if len(source.frames_buffer) == 0:
-            time.sleep(0.1)
+    def open_cache(weights):
+        if source.type != "file" or not app.config["DETECTION_CACHE_DIR"]:
+            return None
+        try:
+            return open_detection_cache(
+                app.config["DETECTION_CACHE_DIR"],
+                os.path.join(app.config["VIDEO_UPLOADS"], source.path),
+                weights,
+                CONF_FLOOR,
+                source.frame_count,
+                dict(enumerate(detector_cls.CLASSES)),
+                tag="" if detector_name == "ppe" else detector_name,
+            )
+        except OSError as e:
+            print(f"Detection cache unavailable for {source.name}:", e)
+            return None
+
+    generation = None
+    cache = None
+    stage = source.stages["detection"]
+    episodes_open = False
+
+    def should_stop():
+        return source.stop_event.is_set()
+
+    # The scheduler paces analysis at the rate allocated to this source
+    while inference_scheduler.wait_turn(source_id, should_stop):
+        if not source.detection_enabled:
+            if episodes_open:
+                source.stages["events"].put(CLOSE_EPISODES, should_stop)
+                episodes_open = False
+            stage.inbox.clear()
+            source.detection_wanted.wait(timeout=1.0)
             continue
 
-        buffer_len = len(source.frames_buffer)
+        # Block until the capture stage hands over a frame we have not
+        # analysed; stale ones were already replaced in the inbox
+        item = stage.get(lambda: should_stop() or not source.detection_enabled)
+        if item is None:
+            continue
+        frame, processed_index, position, trace = item
+        trace.lap("detection_queue")
+        episodes_open = True
+
+        # A promoted model's results are cached separately (keyed by weights)
+        live = analysis_models.live
+        if live.generation != generation:
+            if cache is not None:
+                cache.flush()
+            generation = live.generation
+            cache = source.detection_cache = open_cache(live.weights)
+
+        with stage.timed():
+            # Frames seen on an earlier pass over the file cost no inference
+            raw_detections = None
+            if cache is not None and position is not None:
+                raw_detections = cache.get(
+                    position, tolerance=app.config["DETECTION_CACHE_TOLERANCE"]
+                )
+            if raw_detections is None:
+                model_generation, detector = analysis_models.detector_for(source_id)
+                # Run detection once and cache the raw scores for viewers
+                with inference_scheduler.slot(source_id):
+                    started = time.perf_counter()
+                    raw_detections = detector.detect_raw(frame)
+                    latency = time.perf_counter() - started
+                # A candidate model may see the same frame in shadow mode
+                analysis_models.mirror(frame, raw_detections, latency)
+                if source.frame_width and frame.shape[1] != source.frame_width:
+                    # Frame was decoded at detection resolution; report native boxes
+                    raw_detections = raw_detections.scaled(
+                        source.frame_width / frame.shape[1]
+                    )
+                if (
+                    cache is not None
+                    and position is not None
+                    and model_generation == generation
+                ):
+                    cache.put(position, raw_detections)
+            source.detections["ppe"] = raw_detections
 
-        # If we've processed all frames, wait for new ones
-        if processed_index >= buffer_len:
-            # If way behind, catch up
-            if processed_index < buffer_len - 30:
-                processed_index = buffer_len - 10
-            else:
-                time.sleep(0.1)
-                continue
+            # Built once per analysis and shared by every metadata subscriber
+            source.detection_payload = detection_payload(
+                raw_detections, processed_index, time.time()
+            )
+            source.detection_signal.notify()
+        trace.lap("inference")
 
-        try:
-            frame = source.frames_buffer[processed_index].copy()
-            processed_index += 1
-        except IndexError:
-            processed_index = max(0, buffer_len - 1)
-            continue
+        # Bookkeeping runs in the events stage, overlapping the next inference
+        source.stages["events"].put(
+            (raw_detections, frame, processed_index, trace), should_stop
+        )
 
-        # Track total frames for compliance rate
-        source.total_frames_processed += 1
-        frame_has_violation = False
-
-        # Run detection
-        for box, label in detector.detect(frame):
-            # Check if this is a violation
-            if any(v in label for v in ["NO-Hardhat", "NO-Mask", "NO-Safety Vest"]):
-                frame_has_violation = True
-                # Extract violation info
-                violation_class = label.split()[0]
-                confidence = float(label.split()[-1])
-
-                # Create unique event ID for tracking
-                timestamp = datetime.now()
-                event_id = f"{violation_class}_{timestamp.strftime('%Y%m%d_%H%M%S')}_{processed_index}"
-
-                # Send detection event
-                event_data = {
-                    "source_id": source_id,
-                    "timestamp": timestamp.isoformat(),
-                    "violation_type": violation_class,
-                    "confidence": confidence,
-                    "event_id": event_id,
-                    "frame_number": processed_index,
-                }
-                event_queue.put(("detection", event_data))
+    if cache is not None:
+        cache.flush()
 
-                # Store detection event for timeline
-                detection_events.append(
-                    {
-                        "source_id": source_id,
-                        "timestamp": timestamp,
-                        "violation_type": violation_class,
-                        "confidence": confidence,
-                        "event_id": event_id,
-                        "frame_number": processed_index,
+
+def process_events(source_id):
+    """Turn a source's analysed frames into compliance stats and episodes."""
+    source = sources.get(source_id)
+    if not source:
+        return
+
+    stage = source.stages["events"]
+    episodes = EpisodeBuilder(source_id)
+    try:
+        while True:
+            item = stage.get(source.stop_event.is_set)
+            if item is None:
+                break
+            if item is CLOSE_EPISODES:
+                publish_episode_events(source, episodes.close_all())
+                continue
+
+            raw_detections, frame, processed_index, trace = item
+            trace.lap("events_queue")
+            # Settings may have been changed through another worker process
+            refresh_settings()
+            with stage.timed():
+                # Violations come from per-person compliance records, built
+                # at the live threshold from /api/settings
+                people = assess_compliance(raw_detections, default_confidence)
+                source.people = people
+
+                # Strongest instance of each violation type on this frame
+                frame_violations = {}
+                for person in people:
+                    for violation_class, confidence in person["violations"]:
+                        best = frame_violations.get(violation_class, (0.0,))[0]
+                        if confidence > best:
+                            frame_violations[violation_class] = (
+                                confidence,
+                                person["bbox"],
+                            )
+                frame_has_violation = bool(frame_violations)
+                for violation_class in frame_violations:
+                    source.record_loop_violation(violation_class, processed_index)
+                if frame_has_violation:
+                    source.heatmap.add(
+                        [person["bbox"] for person in people if person["violations"]],
+                        source.frame_width,
+                        source.frame_height,
+                    )
+
+                # Consecutive positive frames are coalesced into episodes. Their
+                # box is kept in the coordinates of their best frame, which is
+                # decoded at detection resolution in detection-only mode
+                if source.frame_width and frame.shape[1] != source.frame_width:
+                    scale = frame.shape[1] / source.frame_width
+                    frame_violations = {
+                        name: (confidence, [round(v * scale) for v in bbox])
+                        for name, (confidence, bbox) in frame_violations.items()
                     }
+                alerts = publish_episode_events(
+                    source,
+                    episodes.observe(
+                        datetime.now(), processed_index, frame_violations, frame
+                    ),
+                    trace,
                 )
 
-                # Keep only last hour of events
-                cutoff_time = datetime.now() - timedelta(hours=1)
-                detection_events[:] = [
-                    e for e in detection_events if e["timestamp"] > cutoff_time
-                ]
+                # Update compliance tracking
+                dashboard_stats.record_frame(source, frame_has_violation, people)
+            trace.lap("events")
+            source.stages.record_latency(trace.captured_at)
 
-                # Update source stats
-                source.last_detection = timestamp
-                if violation_class not in source.violation_counts:
-                    source.violation_counts[violation_class] = 0
-                source.violation_counts[violation_class] += 1
+            # Emails go out only after this stage is done with the trace
+            queue_alerts(source, alerts, trace)
+            if not trace.awaiting_email:
+                frame_traces.finish(
+                    trace, "alert" if trace.alerted_at is not None else "analysed"
+                )
+    finally:
+        # Episodes never outlive the worker that tracks them
+        publish_episode_events(source, episodes.close_all())
 
-                # Email alert - only send once per violation instance (per minute to avoid spam)
-                alert_key = (violation_class, timestamp.strftime("%Y%m%d_%H%M"))
-                if (
-                    email_alert_enabled
-                    and email_recipient
-                    and alert_key not in source.alerts_sent
-                ):
-                    source.alerts_sent.add(alert_key)
-                    try:
-                        prepare_and_send_email(
-                            sender="support.ai@giindia.com",
-                            recipient=email_recipient,
-                            subject=f"PPE Violation Detected - {source.name}",
-                            message_text=f"A {violation_class} violation was detected at {source.name} at "
-                            + timestamp.strftime("%Y-%m-%d %H:%M:%S"),
-                            im0=frame,
-                        )
-                    except Exception as e:
-                        print("Email send failed:", e)
-
-        # Update compliance tracking
-        if frame_has_violation:
-            source.frames_with_violations += 1
-
-        # Small delay to prevent CPU overload
-        time.sleep(0.05)
-
-
-def generate_source_frames(source_id, processed=False, conf_=0.5, detector_names=None):
-    """Generate frames for a specific source."""
+
+def process_alerts(source_id):
+    """Send a source's queued violation emails."""
     source = sources.get(source_id)
     if not source:
-        # Return placeholder
-        placeholder = np.zeros((480, 640, 3), dtype=np.uint8)
-        cv2.putText(
-            placeholder,
-            "Source not found",
-            (150, 240),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            1.2,
-            (255, 255, 255),
-            2,
-        )
-        _, buf = cv2.imencode(".jpg", placeholder)
-        while True:
-            yield (
-                b"--frame\r\nContent-Type: image/jpeg\r\n\r\n" + buf.tobytes() + b"\r\n"
+        return
+
+    stage = source.stages["alerts"]
+    while True:
+        item = stage.get(source.stop_event.is_set)
+        if item is None:
+            break
+        alert, trace = item
+        if trace is not None:
+            trace.lap("alert_queue")
+        with stage.timed():
+            try:
+                prepare_and_send_email(**alert)
+                outcome = "email"
+            except Exception as e:
+                print("Email send failed:", e)
+                outcome = "email_failed"
+        if trace is not None:
+            trace.lap("email")
+            frame_traces.finish(trace, outcome)
+
+
+def queue_alerts(source, alerts, trace=None):
+    """Hand emails to the alerts stage; the first accepted one carries the trace."""
+    for alert in alerts:
+        if trace is not None:
+            trace.awaiting_email = True
+        if source.stages["alerts"].put((alert, trace)):
+            trace = None
+        elif trace is not None:
+            trace.awaiting_email = False
+
+
+def process_history(source_id):
+    """Encode a source's claimed history frames for violation clips."""
+    source = sources.get(source_id)
+    if not source:
+        return
+
+    stage = source.stages["history"]
+    while True:
+        item = stage.get(source.stop_event.is_set)
+        if item is None:
+            break
+        with stage.timed():
+            source.history.store(*item)
+
+
+def save_episode_frame(episode):
+    """Hand an episode's best frame to the evidence store and remember its URL.
+
+    Returns the evidence record, or None if the store's writer is backed up,
+    in which case the previous best frame stays in place.
+    """
+    saved = evidence_store.put(
+        episode.best_frame,
+        episode.source_id,
+        episode.id,
+        "best_frame",
+        episode.last_seen.timestamp(),
+    )
+    if saved is not None:
+        episode.best_frame_url = saved.url
+        episode.best_frame_thumbnail = saved.thumbnail
+    episode.best_frame_dirty = False
+    return saved
+
+
+def attach_episode_clip(episode, filename, offset):
+    """Store a finished clip against its episode and re-announce the episode."""
+    clip = evidence_store.put_file(
+        os.path.join(clip_recorder.directory, filename),
+        episode.source_id,
+        episode.id,
+        "clip",
+        episode.started_at.timestamp(),
+    )
+    episode.clip_url = clip.url
+    episode.clip_offset = offset
+    event_type = "episode_ended" if episode.ended_at else "episode_updated"
+    event_bus.publish(event_type, episode.as_dict())
+
+
+def publish_episode_events(source, events, trace=None):
+    """Store and broadcast episode transitions of a source.
+
+    Returns the alert emails to send, one per started episode.
+    """
+    alerts = []
+    for event_type, episode in events:
+        saved = None
+        if episode.best_frame_dirty and episode.best_frame is not None:
+            saved = save_episode_frame(episode)
+
+        if event_type == "episode_started":
+            # Store the episode for the timeline; updates mutate it in place
+            cutoff_time = datetime.now() - timedelta(hours=1)
+            with detection_events_lock:
+                detection_events[:] = [
+                    e for e in detection_events if e.last_seen > cutoff_time
+                ]
+                detection_events.append(episode)
+
+            # Update source stats and global rollups
+            dashboard_stats.record_violation(
+                source, episode.violation_type, episode.started_at
             )
-            time.sleep(0.1)
 
-    if processed:
-        if detector_names is None:
-            detector_names = ["ppe"]
+            # Encode a pre/post-event clip once the post window has passed
+            clip_recorder.record(
+                source.history,
+                episode.started_at.timestamp(),
+                f"episode_{episode.id}",
+                on_done=lambda filename, offset, episode=episode: attach_episode_clip(
+                    episode, filename, offset
+                ),
+            )
 
-        # Instantiate detectors for rendering
-        detectors = [get_detector(n)(conf=conf_) for n in detector_names]
-        colour_map = {
-            "ppe": (255, 0, 0),  # Blue
-        }
+            # Email alert - once per episode, sent by the alerts stage. Its
+            # snapshot is the best frame, so the store keeps one copy
+            if email_alert_enabled and email_recipient:
+                snapshot = evidence_store.put(
+                    saved.data if saved is not None else episode.best_frame,
+                    source.id,
+                    episode.id,
+                    "alert",
+                    episode.started_at.timestamp(),
+                )
+                alerts.append(
+                    {
+                        "sender": "support.ai@giindia.com",
+                        "recipient": email_recipient,
+                        "subject": f"PPE Violation Detected - {source.name}",
+                        "message_text": (
+                            f"A {episode.violation_type} violation was detected "
+                            f"at {source.name} at "
+                            + episode.started_at.strftime("%Y-%m-%d %H:%M:%S")
+                        ),
+                        "im0": snapshot.data if snapshot else episode.best_frame,
+                        "filename": snapshot.name if snapshot else None,
+                    }
+                )
 
-    processed_index = 0
+        event_bus.publish(event_type, episode.as_dict())
+        if event_type == "episode_started" and trace is not None:
+            trace.alerted()  # Dashboards receive the alert now
+        if event_type == "episode_ended":
+            episode.best_frame = None  # Saved already; release the image
+    return alerts
 
-    while source_id in sources:
-        if len(source.frames_buffer) == 0:
-            time.sleep(0.01)
-            continue
 
-        buffer_len = len(source.frames_buffer)
+def parse_confidence(value):
+    """A ``conf`` query argument as a float in [0, 1], or None if it is not."""
+    try:
+        conf = float(value)
+    except (TypeError, ValueError):
+        return None
+    return conf if 0 <= conf <= 1 else None
 
-        if processed_index >= buffer_len:
-            if processed_index > buffer_len + 30:
-                processed_index = max(0, buffer_len - 10)
-            else:
-                time.sleep(0.01)
-                continue
 
-        try:
-            frame = source.frames_buffer[processed_index].copy()
-            processed_index += 1
-        except IndexError:
-            processed_index = max(0, buffer_len - 1)
-            continue
+def detection_payload(detections, seq, timestamp):
+    """Compact record of one analysed frame for client-side overlays.
 
-        if processed:
-            # Run detectors just for visualization (detection happens in background)
-            for name, det in zip(detector_names, detectors):
-                colour = colour_map.get(name, (0, 255, 0))
-                for box, label in det.detect(frame):
-                    # Draw bounding box
-                    x1, y1, x2, y2 = box
-                    cv2.rectangle(frame, (x1, y1), (x2, y2), colour, 2)
-                    cv2.putText(
-                        frame,
-                        label,
-                        (x1, max(0, y1 - 6)),
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        0.5,
-                        colour,
-                        2,
-                        cv2.LINE_AA,
-                    )
+    Boxes are flattened ``[x1, y1, x2, y2, ...]`` in native frame coordinates,
+    with parallel class id and confidence lists. ``seq`` matches the
+    ``X-Frame-Seq`` header of the MJPEG part carrying the analysed frame.
+    """
+    return {
+        "seq": seq,
+        "ts": round(timestamp, 3),
+        "boxes": detections.boxes.ravel().tolist(),
+        "classes": detections.class_ids.tolist(),
+        "scores": np.round(detections.confidences, 3).tolist(),
+    }
 
-        _, buf = cv2.imencode(".jpg", frame)
-        yield (b"--frame\r\nContent-Type: image/jpeg\r\n\r\n" + buf.tobytes() + b"\r\n")
 
+def detection_meta(source):
+    """First record of a metadata stream: frame size and class names."""
+    detector_cls = get_detector(app.config["ANALYSIS_DETECTOR"])
+    return {
+        "source_id": source.id,
+        "width": source.frame_width,
+        "height": source.frame_height,
+        "names": dict(enumerate(detector_cls.CLASSES)),
+    }
 
-# Auto-select first available video after functions are defined
-def initialize_video():
-    global current_video_name, vid_path, video_frames
-    video_dir = app.config["VIDEO_UPLOADS"]
-    if os.path.exists(video_dir):
-        # Get all video files and sort them
-        video_files = [f for f in os.listdir(video_dir) if allowed_video(f)]
-        video_files.sort()
-
-        for filename in video_files:
-            current_video_name = filename
-            vid_path = os.path.join(video_dir, filename)
-            video_frames = cv2.VideoCapture(vid_path)
-            if video_frames.isOpened():
-                print(f"Auto-selected video: {filename}")
-                reset_violation_tracking()
-                break
-            else:
-                video_frames = None
-                current_video_name = None
-                vid_path = None
 
+def latest_detection_payload(source, conf_=0.0):
+    """Latest payload, with detections below ``conf_`` dropped if requested."""
+    payload = source.detection_payload
+    raw_detections = source.detections.get("ppe")
+    if payload is None or not conf_ or raw_detections is None:
+        return payload
+    return detection_payload(raw_detections.filter(conf_), payload["seq"], payload["ts"])
 
-initialize_video()
 
+def generate_detection_metadata(source_id, conf_=0.0, fmt="sse"):
+    """Stream a source's detection records as SSE or NDJSON."""
+    source = sources.get(source_id)
+    if source is None:
+        return  # Removed since the route checked
+    format_record = sse_message if fmt == "sse" else ndjson_line
+    keep_alive = ": keep-alive\n\n" if fmt == "sse" else "\n"
+
+    yield format_record("meta", detection_meta(source))
+    last_seq = 0
+    while source_id in sources:
+        seq = source.detection_signal.wait(last_seq, timeout=15)
+        if seq == last_seq:
+            yield keep_alive
+            continue
+        last_seq = seq
+        yield format_record("detections", latest_detection_payload(source, conf_))
 
-def generate_raw_frames():
-    global \
-        video_frames, \
-        frames_buffer, \
-        tracking_loop_count, \
-        violation_log, \
-        current_loop_violations
 
-    # If no video is loaded, yield a placeholder image
-    if video_frames is None or not video_frames.isOpened():
-        # Create a black frame with "No video selected" text
-        placeholder = np.zeros((480, 640, 3), dtype=np.uint8)
+def draw_detections(frame, detections, colour):
+    """Draw boxes and labels for a filtered set of detections onto a frame."""
+    for box, label in detections.to_labelled():
+        x1, y1, x2, y2 = box
+        cv2.rectangle(frame, (x1, y1), (x2, y2), colour, 2)
         cv2.putText(
-            placeholder,
-            "No video selected",
-            (150, 240),
+            frame,
+            label,
+            (x1, max(0, y1 - 6)),
             cv2.FONT_HERSHEY_SIMPLEX,
-            1.2,
-            (255, 255, 255),
+            0.5,
+            colour,
             2,
+            cv2.LINE_AA,
         )
-        _, buf = cv2.imencode(".jpg", placeholder)
-        while True:
-            yield (
-                b"--frame\r\nContent-Type: image/jpeg\r\n\r\n" + buf.tobytes() + b"\r\n"
-            )
-            time.sleep(0.1)
 
-    frame_count = 0
-    fps = video_frames.get(cv2.CAP_PROP_FPS) or 60  # Default to 30 fps if not available
-    frame_delay = 1.0 / fps
-    last_frame_time = time.time()
 
-    while True:
-        success, frame = video_frames.read()
-        if not success:
-            # If video ended, restart from beginning
-            video_frames.set(cv2.CAP_PROP_POS_FRAMES, 0)
-            frame_count = 0
-
-            # Save violations from completed loop
-            if tracking_loop_count == 0 and current_loop_violations:
-                violation_log = current_loop_violations.copy()
-                tracking_loop_count += 1
-                print(f"Saved violations: {violation_log}")
-
-            success, frame = video_frames.read()
-            if not success:
-                time.sleep(0.01)
-                continue
+def decode_screening_image(image_data):
+    """Decode a base64 (optionally data-URL) image and return (digest, img)."""
+    # Remove data URL prefix
+    image_data = image_data.split(",")[1] if "," in image_data else image_data
+    image_bytes = base64.b64decode(image_data)
+    digest = hashlib.sha1(image_bytes).hexdigest()
+    nparr = np.frombuffer(image_bytes, np.uint8)
+    return digest, cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+
+def detect_screening_image(digest, img):
+    """Raw detections for a screening image, reusing cached results."""
+    with screening_cache_lock:
+        if digest in screening_cache:
+            screening_cache.move_to_end(digest)
+            return screening_cache[digest]
+    detector = get_shared_detector(app.config["SCREENING_DETECTOR"])
+    raw_detections = detector.detect_raw(img)
+    with screening_cache_lock:
+        screening_cache[digest] = raw_detections
+        while len(screening_cache) > SCREENING_CACHE_SIZE:
+            screening_cache.popitem(last=False)
+    return raw_detections
+
+
+def placeholder_jpeg(text):
+    """JPEG bytes of a black frame with a status message."""
+    placeholder = np.zeros((480, 640, 3), dtype=np.uint8)
+    cv2.putText(
+        placeholder,
+        text,
+        (150, 240),
+        cv2.FONT_HERSHEY_SIMPLEX,
+        1.2,
+        (255, 255, 255),
+        2,
+    )
+    _, buf = cv2.imencode(".jpg", placeholder)
+    return buf.tobytes()
 
-        # Control frame rate
-        current_time = time.time()
-        time_since_last_frame = current_time - last_frame_time
-        if time_since_last_frame < frame_delay:
-            time.sleep(frame_delay - time_since_last_frame)
-        last_frame_time = time.time()
 
-        # Add frame to buffer with frame number
-        frame_count += 1
-        frames_buffer.append(frame.copy())
+def cached_source_jpeg(
+    source, processed=False, conf_=0.5, detector_names=None, variant="full"
+):
+    """Return ``(seq, jpeg, captured_at)`` if the variant needs no new
+    encode, else None.
+
+    An entry stays valid until a newer frame arrives and, for rate-limited
+    variants, until the variant's frame interval has passed.
+    """
+    key = (variant, processed, conf_, tuple(detector_names or ()))
+    cached = source.jpeg_cache.get(key)
+    if cached is None:
+        return None
+    seq, jpeg, encoded_at, captured_at = cached
+    if seq == source.frames_read:
+        return seq, jpeg, captured_at
+    max_fps = app.config["STREAM_VARIANTS"][variant]["fps"]
+    if max_fps and time.time() - encoded_at < 1.0 / max_fps:
+        return seq, jpeg, captured_at
+    return None
 
-        # Keep buffer size reasonable (max 60 frames for smoother playback)
-        if len(frames_buffer) > 60:
-            # Remove oldest frames
-            frames_buffer = frames_buffer[-60:]
 
-        _, buf = cv2.imencode(".jpg", frame)
-        yield (b"--frame\r\nContent-Type: image/jpeg\r\n\r\n" + buf.tobytes() + b"\r\n")
+def encode_source_frame(
+    source, processed=False, conf_=0.5, detector_names=None, variant="full"
+):
+    """Encode the newest frame once per distinct view and share the bytes.
+
+    Returns ``(seq, jpeg, captured_at)`` or None while the source has no
+    frames yet.
+    """
+    cached = cached_source_jpeg(source, processed, conf_, detector_names, variant)
+    if cached is not None:
+        return cached
+
+    settings = app.config["STREAM_VARIANTS"][variant]
+    seq = source.frames_read
+    captured_at = source.last_frame_at
+    try:
+        latest = source.frames_buffer[-1]
+    except IndexError:
+        return None
 
+    # Resize before drawing so small variants never touch full-size pixels
+    frame = downscale(latest, settings["width"]) if settings["width"] else latest
+    if processed and frame is latest:
+        frame = latest.copy()  # Never draw on the shared buffer
 
-def generate_processed_frames(
-    conf_: float = 0.25, detector_names: list[str] | None = None
-):
-    """Read frames, run multiple detectors, overlay boxes and yield MJPEG."""
-    global last_email_time
+    if processed:
+        # Detections are reported in native coordinates
+        scale = frame.shape[1] / source.frame_width if source.frame_width else 1.0
+        for name in detector_names or ["ppe"]:
+            raw_detections = source.detections.get(name)
+            if raw_detections is not None:
+                colour = DETECTOR_COLOURS.get(name, (0, 255, 0))
+                filtered = raw_detections.filter(conf_)
+                if scale != 1.0:
+                    filtered = filtered.scaled(scale)
+                draw_detections(frame, filtered, colour)
+
+    _, buf = cv2.imencode(
+        ".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, settings["quality"]]
+    )
+    key = (variant, processed, conf_, tuple(detector_names or ()))
+    if len(source.jpeg_cache) > 16:
+        source.jpeg_cache.clear()  # Bound the number of distinct views kept
+    jpeg = buf.tobytes()
+    source.jpeg_cache[key] = (seq, jpeg, time.time(), captured_at)
+    return seq, jpeg, captured_at
 
-    # If no video is loaded, yield a placeholder image
-    if video_frames is None or not video_frames.isOpened():
-        # Create a black frame with "No video selected" text
-        placeholder = np.zeros((480, 640, 3), dtype=np.uint8)
-        cv2.putText(
-            placeholder,
-            "No video selected",
-            (150, 240),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            1.2,
-            (255, 255, 255),
-            2,
-        )
-        _, buf = cv2.imencode(".jpg", placeholder)
+
+def generate_source_frames(
+    source_id, processed=False, conf_=0.5, detector_names=None, variant="full"
+):
+    """Generate frames for a specific source."""
+    source = sources.get(source_id)
+    if not source:
+        # Return placeholder
+        jpeg = placeholder_jpeg("Source not found")
         while True:
-            yield (
-                b"--frame\r\nContent-Type: image/jpeg\r\n\r\n" + buf.tobytes() + b"\r\n"
-            )
+            yield mjpeg_part(jpeg)
             time.sleep(0.1)
 
-    if detector_names is None:
+    if processed and detector_names is None:
         detector_names = ["ppe"]
 
-    # Instantiate each detector once
-    detectors = [get_detector(n)(conf=conf_) for n in detector_names]
+    max_fps = app.config["STREAM_VARIANTS"][variant]["fps"]
 
-    # Assign a colour per detector (BGR)
-    colour_map = {
-        "ppe": (255, 0, 0),  # Blue
-    }
+    # Viewers keep the source decoding at full rate
+    source.add_viewer()
+    try:
+        last_seq = 0
+        last_sent = None
+        while source_id in sources:
+            last_seq = source.frame_signal.wait(last_seq, timeout=1.0)
+            # Processed views overlay the background detector's latest raw
+            # results at this viewer's threshold - no inference happens here
+            encoded = encode_source_frame(
+                source, processed, conf_, detector_names, variant
+            )
+            if encoded is None or encoded[0] == last_sent:
+                continue
+            last_sent, jpeg, captured_at = encoded
+            yield mjpeg_part(jpeg, last_sent, captured_at)
+            if max_fps:
+                time.sleep(1.0 / max_fps)
+    finally:
+        source.remove_viewer()
 
-    processed_index = 0
-    while True:
-        if len(frames_buffer) == 0:
-            time.sleep(0.01)
-            continue
 
-        # Process frames sequentially to avoid skipping
-        buffer_len = len(frames_buffer)
+# Auto-select first available video after functions are defined
+def initialize_video():
+    """Pick the first available video for the legacy view.
 
-        # If we've processed all frames, wait for new ones
-        if processed_index >= buffer_len:
-            # If way ahead, reset to catch up with buffer
-            if processed_index > buffer_len + 30:
-                processed_index = max(0, buffer_len - 10)
-            else:
-                time.sleep(0.01)
-                continue
+    Only the name is chosen here; the video is opened and registered as a
+    source the first time the legacy view needs it.
+    """
+    global current_video_name
+    video_files = video_library.names()
+    if video_files:
+        current_video_name = video_files[0]
+        print(f"Auto-selected video: {current_video_name}")
 
-        # Get the frame at our current index
-        try:
-            frame = frames_buffer[processed_index].copy()
-            processed_index += 1
-        except IndexError:
-            # Buffer was trimmed, reset index
-            processed_index = max(0, buffer_len - 1)
-            continue
 
-        # Iterate over detectors
-        violations_detected = False
-        for name, det in zip(detector_names, detectors):
-            colour = colour_map.get(name, (0, 255, 0))
-            for box, label in det.detect(frame):
-                # Check if this is a violation
-                if name == "ppe" and any(
-                    v in label for v in ["NO-Hardhat", "NO-Mask", "NO-Safety Vest"]
-                ):
-                    violations_detected = True
-                    # Extract the class name from the label (e.g., "NO-Hardhat 0.95" -> "NO-Hardhat")
-                    violation_class = label.split()[0]
-                    record_violation(violation_class)
-
-                # PPE detector returns (x1, y1, x2, y2) for bounding box
-                x1, y1, x2, y2 = box
-                cv2.rectangle(frame, (x1, y1), (x2, y2), colour, 2)
-                text_origin = (x1, max(0, y1 - 6))
-
-                cv2.putText(
-                    frame,
-                    label,
-                    text_origin,
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    0.5,
-                    colour,
-                    2,
-                    cv2.LINE_AA,
-                )
+initialize_video()
+
+
+def get_legacy_source():
+    """Return the source backing the legacy view, registering it on demand."""
+    global legacy_source_id, current_video_name
+    with legacy_lock:
+        source = sources.get(legacy_source_id)
+        if source is not None or current_video_name is None:
+            return source
+
+        try:
+            source = add_source(current_video_name, "file", current_video_name)
+        except SourceLimitError as e:
+            print(f"Cannot open {current_video_name}: {e}")
+            return None
+        if source is None:
+            print(f"Error opening video {current_video_name}")
+            current_video_name = None
+            return None
+        legacy_source_id = source.id
+        return source
 
-        # Email alert: only if violations detected
-        if violations_detected and email_alert_enabled and email_recipient:
-            current_time = time.time()
-            if current_time - last_email_time > EMAIL_COOLDOWN_SEC:
-                # capture JPEG bytes
-                _, jpeg_buf = cv2.imencode(".jpg", frame)
-                try:
-                    prepare_and_send_email(
-                        sender="support.ai@giindia.com",
-                        recipient=email_recipient,
-                        subject="PPE Violation Detected",
-                        message_text="A PPE violation was detected at "
-                        + time.strftime("%Y-%m-%d %H:%M:%S"),
-                        im0=frame,
-                    )
-                    last_email_time = current_time
-                except Exception as e:
-                    print("Email send failed:", e)
 
-        _, buf = cv2.imencode(".jpg", frame)
-        yield (b"--frame\r\nContent-Type: image/jpeg\r\n\r\n" + buf.tobytes() + b"\r\n")
+def switch_legacy_video(video_name):
+    """Point the legacy view at another video, replacing its source."""
+    global legacy_source_id, current_video_name
+    with legacy_lock:
+        if legacy_source_id is not None:
+            remove_source(legacy_source_id)
+        legacy_source_id = None
+        current_video_name = video_name
+    return get_legacy_source()
 
 
 # New routes for multi-source dashboard
@@ -634,8 +1258,12 @@ def camera_view(source_id):
 @app.route("/source_video_raw/<source_id>")
 def source_video_raw(source_id):
     """Raw video stream for a specific source."""
+    variant = request.args.get("variant", "full")
+    if variant not in app.config["STREAM_VARIANTS"]:
+        return jsonify({"error": f"Unknown stream variant: {variant}"}), 400
+
     return Response(
-        generate_source_frames(source_id, processed=False),
+        generate_source_frames(source_id, processed=False, variant=variant),
         mimetype="multipart/x-mixed-replace; boundary=frame",
     )
 
@@ -643,18 +1271,143 @@ def source_video_raw(source_id):
 @app.route("/source_video_processed/<source_id>")
 def source_video_processed(source_id):
     """Processed video stream for a specific source."""
-    conf = float(request.args.get("conf", default_confidence))
+    conf = parse_confidence(request.args.get("conf", default_confidence))
+    if conf is None:
+        return jsonify({"error": "conf must be a number from 0 to 1"}), 400
     detector_param = request.args.get("detectors", "ppe")
     detector_names = [d.strip() for d in detector_param.split(",") if d.strip()]
+    variant = request.args.get("variant", "full")
+    if variant not in app.config["STREAM_VARIANTS"]:
+        return jsonify({"error": f"Unknown stream variant: {variant}"}), 400
 
     return Response(
         generate_source_frames(
-            source_id, processed=True, conf_=conf, detector_names=detector_names
+            source_id,
+            processed=True,
+            conf_=conf,
+            detector_names=detector_names,
+            variant=variant,
         ),
         mimetype="multipart/x-mixed-replace; boundary=frame",
     )
 
 
+@app.route("/source_detections/<source_id>")
+def source_detections(source_id):
+    """Detection metadata stream for drawing overlays in the browser.
+
+    ``format=ndjson`` streams newline-delimited JSON instead of SSE and
+    ``conf`` drops detections below a threshold on the server.
+    """
+    if source_id not in sources:
+        return jsonify({"error": "Source not found"}), 404
+    fmt = request.args.get("format", "sse")
+    if fmt not in ("sse", "ndjson"):
+        return jsonify({"error": f"Unknown format: {fmt}"}), 400
+    conf = parse_confidence(request.args.get("conf", 0))
+    if conf is None:
+        return jsonify({"error": "conf must be a number from 0 to 1"}), 400
+
+    return Response(
+        generate_detection_metadata(source_id, conf, fmt),
+        mimetype="text/event-stream" if fmt == "sse" else "application/x-ndjson",
+    )
+
+
+@app.route("/api/sources/<source_id>/snapshot.jpg")
+def api_source_snapshot(source_id):
+    """Latest annotated JPEG; encoded again only when a new frame arrives."""
+    source = sources.get(source_id)
+    if not source:
+        return jsonify({"error": "Source not found"}), 404
+
+    variant = request.args.get("variant", "full")
+    if variant not in app.config["STREAM_VARIANTS"]:
+        return jsonify({"error": f"Unknown stream variant: {variant}"}), 400
+    processed = request.args.get("processed", "1").lower() in ("1", "true", "on")
+    conf = parse_confidence(request.args.get("conf", default_confidence))
+    if conf is None:
+        return jsonify({"error": "conf must be a number from 0 to 1"}), 400
+
+    encoded = encode_source_frame(source, processed, conf, ["ppe"], variant)
+    if encoded is None:
+        return jsonify({"error": "No frame available yet"}), 503
+
+    seq, jpeg, _ = encoded
+    response = Response(jpeg, mimetype="image/jpeg")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Frame-Sequence"] = str(seq)
+    return response
+
+
+@app.route("/api/sources/<source_id>/heatmap")
+def api_source_heatmap(source_id):
+    """Where a source's violations happen, as PNG, .npy or JSON.
+
+    ``window`` is ``decayed`` (recent activity, the default), ``total`` (all
+    kept buckets) or a Unix time selecting the bucket that contains it.
+    """
+    source = sources.get(source_id)
+    if not source:
+        return jsonify({"error": "Source not found"}), 404
+
+    window = request.args.get("window", "decayed")
+    if window == "decayed":
+        grid = source.heatmap.decayed()
+    elif window == "total":
+        grid = source.heatmap.total()
+    else:
+        try:
+            grid = source.heatmap.bucket(float(window))
+        except ValueError:
+            return jsonify({"error": f"Invalid window: {window}"}), 400
+        if grid is None:
+            return jsonify({"error": "No heatmap for that time bucket"}), 404
+
+    fmt = request.args.get("format", "png")
+    if fmt == "json":
+        return jsonify(
+            {
+                "window": window,
+                "shape": list(grid.shape),
+                "grid": np.round(grid, 3).tolist(),
+                "buckets": source.heatmap.buckets(),
+            }
+        )
+    if fmt == "npy":
+        buffer = BytesIO()
+        np.save(buffer, grid)
+        buffer.seek(0)
+        return send_file(
+            buffer,
+            mimetype="application/octet-stream",
+            as_attachment=True,
+            download_name=f"heatmap_{source_id}_{window}.npy",
+        )
+    if fmt != "png":
+        return jsonify({"error": f"Unknown format: {fmt}"}), 400
+
+    # Rendered at the frame's aspect ratio, optionally over the latest frame
+    try:
+        width = int(request.args.get("width", 640))
+    except ValueError:
+        width = 0
+    if not 1 <= width <= 4096:
+        return jsonify({"error": "width must be an integer from 1 to 4096"}), 400
+    aspect = (
+        source.frame_height / source.frame_width if source.frame_width else 9 / 16
+    )
+    background = None
+    if request.args.get("overlay", "0").lower() in ("1", "true", "on"):
+        frames = source.frames_buffer
+        background = frames[-1] if frames else None
+    image = render_heatmap(grid, width, max(1, round(width * aspect)), background)
+    _, buffer = cv2.imencode(".png", image)
+    response = Response(buffer.tobytes(), mimetype="image/png")
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
 # API endpoints
 @app.route("/api/sources", methods=["GET", "POST"])
 def api_sources():
@@ -671,6 +1424,16 @@ def api_sources():
                     "path": source.path,
                     "status": source.status,
                     "fps": source.fps,
+                    "activity": source.activity,
+                    "viewers": source.viewers,
+                    "detection_cache": (
+                        round(source.detection_cache.coverage, 3)
+                        if source.detection_cache
+                        else None
+                    ),
+                    "health": source_health(source),
+                    "persistent": source.persistent,
+                    "config": source.config,
                 }
             )
         return jsonify(sources_list)
@@ -685,8 +1448,22 @@ def api_sources():
         if not all([source_type, path]):
             return jsonify({"error": "Missing required fields"}), 400
 
+        # Ids are normally generated; a coordinator assigns its own
+        source_id = data.get("id")
+        if source_id is not None:
+            if not re.fullmatch(r"[\w-]{1,64}", str(source_id)):
+                return jsonify({"error": "Invalid source id"}), 400
+            if source_id in sources:
+                return jsonify({"error": "Source already exists"}), 409
+
         if source_type == "file" and not allowed_video(path):
             return jsonify({"error": "Invalid video file type"}), 400
+        if source_type == "file" and os.path.basename(path) == path:
+            info = video_library.info(path)
+            if info is None:
+                return jsonify({"error": "Video not found"}), 404
+            if info["status"] != "ready":
+                return jsonify({"error": f"Unreadable video: {info['error']}"}), 400
 
         # Auto-generate name if not provided
         if not name:
@@ -701,8 +1478,33 @@ def api_sources():
                 else:
                     name = f"Stream {len(sources) + 1}"
 
-        source = add_source(name, source_type, path)
+        try:
+            schedule = {
+                "priority": int(data.get("priority", 1)),
+                "min_fps": float(data.get("min_fps", 1.0)),
+                "max_fps": float(data.get("max_fps", 10.0)),
+            }
+        except (TypeError, ValueError):
+            return jsonify({"error": "Invalid schedule parameters"}), 400
+
+        # Only a JSON boolean: bool("false") would enable detection
+        detection_enabled = data.get("detection_enabled", True)
+        if not isinstance(detection_enabled, bool):
+            return jsonify({"error": "detection_enabled must be a boolean"}), 400
+        try:
+            source = add_source(
+                name,
+                source_type,
+                path,
+                detection_enabled=detection_enabled,
+                source_id=source_id,
+                **schedule,
+            )
+        except SourceLimitError as e:
+            return jsonify({"error": str(e)}), 503
         if source:
+            source.persistent = True
+            save_sources_config()
             return jsonify(
                 {
                     "id": source.id,
@@ -721,11 +1523,201 @@ def api_sources():
 def api_source_delete(source_id):
     """Delete a source."""
     if remove_source(source_id):
+        save_sources_config()
         return jsonify({"success": True})
     else:
         return jsonify({"error": "Source not found"}), 404
 
 
+@app.route("/api/sources/<source_id>/schedule", methods=["PUT"])
+def api_source_schedule(source_id):
+    """Change a source's inference priority and analysis rate limits."""
+    data = request.get_json() or {}
+    try:
+        updated = inference_scheduler.update(
+            source_id,
+            priority=int(data["priority"]) if "priority" in data else None,
+            min_fps=float(data["min_fps"]) if "min_fps" in data else None,
+            max_fps=float(data["max_fps"]) if "max_fps" in data else None,
+        )
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid schedule parameters"}), 400
+
+    if not updated:
+        return jsonify({"error": "Source not found"}), 404
+
+    schedule = inference_scheduler.status()["sources"][source_id]
+    if source_id in sources:
+        for key in ("priority", "min_fps", "max_fps"):
+            sources[source_id].config[key] = schedule[key]
+        save_sources_config()
+    return jsonify(schedule)
+
+
+@app.route("/api/sources/<source_id>/detection", methods=["PUT"])
+def api_source_detection(source_id):
+    """Enable or disable background detection for a source."""
+    source = sources.get(source_id)
+    if not source:
+        return jsonify({"error": "Source not found"}), 404
+
+    data = request.get_json() or {}
+    enabled = data.get("enabled", True)
+    if not isinstance(enabled, bool):
+        return jsonify({"error": "enabled must be a boolean"}), 400
+    source.set_detection_enabled(enabled)
+    source.config["detection_enabled"] = source.detection_enabled
+    save_sources_config()
+    return jsonify({"detection_enabled": source.detection_enabled, "activity": source.activity})
+
+
+def source_health(source):
+    """Supervisor state plus frame freshness, memory and stage timings."""
+    health = supervisor.health(source.id) or {"state": "stopped"}
+    health["last_frame_age"] = (
+        round(time.time() - source.last_frame_at, 1) if source.last_frame_at else None
+    )
+    health["memory_mb"] = round(source.memory_bytes() / 2**20, 1)
+    health["pipeline"] = source.stages.as_dict()
+    return health
+
+
+@app.route("/api/supervisor", methods=["GET"])
+def api_supervisor():
+    """Source caps, process memory and per-source pipeline health."""
+    status = supervisor.status()
+    for source_id, health in status["sources"].items():
+        source = sources.get(source_id)
+        if source is not None:
+            health.update(source_health(source))
+    return jsonify(status)
+
+
+@app.route("/api/metrics", methods=["GET"])
+def api_metrics():
+    """Process-level counters polled by load tests and monitoring."""
+    return jsonify(
+        {
+            "time": time.time(),
+            "cpu_seconds": round(time.process_time(), 2),
+            "rss_mb": round(process_rss_bytes() / 2**20, 1),
+            "threads": threading.active_count(),
+            "sources": len(sources),
+            "viewers": sum(source.viewers for source in list(sources.values())),
+            "events_published": event_bus.published,
+            "events_dropped": event_bus.dropped,
+            "event_subscribers": event_bus.subscriber_count,
+        }
+    )
+
+
+@app.route("/api/traces", methods=["GET"])
+def api_traces():
+    """Latency percentiles and the slowest recent frames by stage."""
+    source_id = request.args.get("source")
+    if source_id is not None and source_id not in sources:
+        return jsonify({"error": "Source not found"}), 404
+    try:
+        window = float(request.args.get("window", 300))
+        limit = int(request.args.get("limit", 20))
+    except ValueError:
+        return jsonify({"error": "Invalid window or limit"}), 400
+    return jsonify(frame_traces.report(window, source_id, limit))
+
+
+@app.route("/api/models", methods=["GET"])
+def api_models():
+    """Live analysis model, candidate and shadow comparison."""
+    return jsonify(analysis_models.status())
+
+
+@app.route("/api/models/candidate", methods=["POST"])
+def api_load_candidate():
+    """Load a weights file from MODELS_DIR as the shadow-evaluated candidate."""
+    data = request.get_json(silent=True) or {}
+    name = os.path.basename(str(data.get("weights", "")))
+    if not name or name == "live.json":
+        return jsonify({"error": "Weights file required"}), 400
+    try:
+        shadow_fraction = float(data.get("shadow_fraction", 0.1))
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid shadow_fraction"}), 400
+    if not 0.0 <= shadow_fraction <= 1.0:
+        return jsonify({"error": "shadow_fraction must be between 0 and 1"}), 400
+
+    # Weights are unpickled, so only files already placed in MODELS_DIR load
+    weights = os.path.abspath(os.path.join(app.config["MODELS_DIR"], name))
+    if not os.path.isfile(weights):
+        return jsonify({"error": "Weights file not found"}), 404
+    candidate = analysis_models.load_candidate(
+        weights, shadow_fraction, conf=default_confidence
+    )
+    return jsonify(candidate.as_dict()), 202
+
+
+@app.route("/api/models/candidate", methods=["DELETE"])
+def api_discard_candidate():
+    if not analysis_models.discard_candidate():
+        return jsonify({"error": "No candidate model"}), 404
+    return jsonify({"success": True})
+
+
+@app.route("/api/models/promote", methods=["POST"])
+def api_promote_model():
+    """Atomically make the ready candidate the live analysis model."""
+    try:
+        live = analysis_models.promote()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 409
+    try:
+        os.makedirs(app.config["MODELS_DIR"], exist_ok=True)
+        with open(os.path.join(app.config["MODELS_DIR"], "live.json"), "w") as f:
+            json.dump({"weights": live.weights, "promoted_at": time.time()}, f)
+    except OSError as e:
+        print("Could not record the promoted model:", e)
+    return jsonify(live.as_dict())
+
+
+@app.route("/evidence/<name>")
+def evidence_file(name):
+    """A stored evidence file or thumbnail; served from memory until written."""
+    stored = evidence_store.open(name)
+    if stored is None:
+        return jsonify({"error": "Evidence not found"}), 404
+    if isinstance(stored, bytes):
+        return Response(stored, mimetype="image/jpeg")
+    # Content-addressed names never change content
+    return send_file(os.path.abspath(stored), max_age=365 * 86400)
+
+
+@app.route("/api/evidence", methods=["GET"])
+def api_evidence():
+    """Look up stored evidence by source, event, kind and time range."""
+    try:
+        since, until = (
+            float(request.args[key]) if key in request.args else None
+            for key in ("since", "until")
+        )
+        limit = min(int(request.args.get("limit", 100)), 1000)
+    except ValueError:
+        return jsonify({"error": "Invalid since, until or limit"}), 400
+    items = evidence_store.find(
+        source_id=request.args.get("source"),
+        event_id=request.args.get("event"),
+        kind=request.args.get("kind"),
+        since=since,
+        until=until,
+        limit=limit,
+    )
+    return jsonify({"items": items, "store": evidence_store.status()})
+
+
+@app.route("/api/scheduler", methods=["GET"])
+def api_scheduler():
+    """Inference budget, per-source allocation and under-served sources."""
+    return jsonify(dict(inference_scheduler.status(), threads=thread_budget.as_dict()))
+
+
 @app.route("/api/settings", methods=["POST"])
 def api_settings():
     """Update application settings."""
@@ -737,8 +1729,11 @@ def api_settings():
     if "email_alert_enabled" in data:
         email_alert_enabled = data["email_alert_enabled"]
     if "confidence_threshold" in data:
-        default_confidence = data["confidence_threshold"]
+        # Read live by every detection loop; no detector is rebuilt
+        default_confidence = float(data["confidence_threshold"])
 
+    # Other worker processes pick the change up from the file
+    save_settings()
     return jsonify({"success": True})
 
 
@@ -747,92 +1742,78 @@ def api_settings():
 def events():
     """Server-Sent Events endpoint for real-time updates."""
 
-    def generate():
-        # Send initial stats
-        stats = get_dashboard_stats()
-        yield f"event: stats\ndata: {json.dumps(stats)}\n\n"
-
-        # Send existing detection events from the last hour
-        cutoff_time = datetime.now() - timedelta(hours=1)
-        recent_events = [e for e in detection_events if e["timestamp"] > cutoff_time]
-
-        # Convert datetime objects to ISO format for JSON serialization
-        for event in recent_events:
-            event_data = {
-                "source_id": event["source_id"],
-                "timestamp": event["timestamp"].isoformat(),
-                "violation_type": event["violation_type"],
-                "confidence": event["confidence"],
-                "event_id": event.get("event_id", ""),
-                "frame_number": event.get("frame_number", 0),
-            }
-            yield f"event: detection\ndata: {json.dumps(event_data)}\n\n"
+    dashboard_stats.start_publishing(event_bus, interval=STATS_INTERVAL_SEC)
+    subscriber = event_bus.subscribe()
 
-        # Send periodic stats updates
-        last_stats_update = time.time()
+    def generate():
+        for event_type, event_data in initial_events():
+            yield sse_message(event_type, event_data)
 
-        while True:
-            try:
-                # Get event from queue with short timeout
-                event_type, event_data = event_queue.get(timeout=1)
-                yield f"event: {event_type}\ndata: {json.dumps(event_data)}\n\n"
-            except queue.Empty:
-                # Check if we should send stats update
-                current_time = time.time()
-                if current_time - last_stats_update > 5:  # Update stats every 5 seconds
-                    stats = get_dashboard_stats()
-                    yield f"event: stats\ndata: {json.dumps(stats)}\n\n"
-                    last_stats_update = current_time
-            except Exception as e:
-                print(f"SSE error: {e}")
-                break
+        # Stats snapshots arrive through the broadcaster once per tick
+        try:
+            while True:
+                try:
+                    event_type, event_data = subscriber.get(timeout=15)
+                    yield sse_message(event_type, event_data)
+                except queue.Empty:
+                    # Keep-alive comment so proxies don't drop idle streams
+                    yield ": keep-alive\n\n"
+        finally:
+            event_bus.unsubscribe(subscriber)
 
     return Response(generate(), mimetype="text/event-stream")
 
 
-def get_dashboard_stats():
-    """Get current dashboard statistics."""
-    active_sources = sum(1 for s in sources.values() if s.status == "active")
-    total_violations = sum(sum(s.violation_counts.values()) for s in sources.values())
-
-    # Calculate compliance rate based on frames without violations
-    total_frames = sum(s.total_frames_processed for s in sources.values())
-    frames_with_violations = sum(s.frames_with_violations for s in sources.values())
+def initial_events():
+    """Events replayed to a newly connected SSE client."""
+    # Send the latest published stats snapshot
+    stats = dashboard_stats.latest or get_dashboard_stats()
+    initial = [("stats", stats)]
 
-    if total_frames > 0:
-        compliance_rate = ((total_frames - frames_with_violations) / total_frames) * 100
-    else:
-        compliance_rate = 100
+    # Replay the violation episodes of the last hour
+    cutoff_time = datetime.now() - timedelta(hours=1)
+    with detection_events_lock:
+        recent_episodes = [e for e in detection_events if e.last_seen > cutoff_time]
+    for episode in recent_episodes:
+        event_type = "episode_ended" if episode.ended_at else "episode_updated"
+        initial.append((event_type, episode.as_dict()))
+    return initial
 
-    # Get last detection time
-    last_detections = [s.last_detection for s in sources.values() if s.last_detection]
-    last_detection = max(last_detections).isoformat() if last_detections else None
 
-    return {
-        "active_sources": active_sources,
-        "active_violations": total_violations,
-        "compliance_rate": compliance_rate,
-        "last_detection": last_detection,
-    }
+def get_dashboard_stats():
+    """Get current dashboard statistics."""
+    return dashboard_stats.snapshot()
 
 
 # Legacy routes (keeping for backward compatibility)
+def legacy_frames(processed=False, conf_=0.5, detector_names=None):
+    """MJPEG view of the legacy source, or a placeholder when none is loaded."""
+    source = get_legacy_source()
+    if source is None:
+        # If no video is loaded, yield a placeholder image
+        jpeg = placeholder_jpeg("No video selected")
+        while True:
+            yield mjpeg_part(jpeg)
+            time.sleep(0.1)
+    yield from generate_source_frames(source.id, processed, conf_, detector_names)
+
+
 @app.route("/video_raw")
 def video_raw():
-    return Response(
-        generate_raw_frames(), mimetype="multipart/x-mixed-replace; boundary=frame"
-    )
+    return Response(legacy_frames(), mimetype=MJPEG_MIMETYPE)
 
 
 @app.route("/video_processed")
 def video_processed():
-    conf = float(request.args.get("conf", 0.5))
+    conf = parse_confidence(request.args.get("conf", 0.5))
+    if conf is None:
+        return jsonify({"error": "conf must be a number from 0 to 1"}), 400
     detector_param = request.args.get("detectors", "ppe")
     detector_names = [d.strip() for d in detector_param.split(",") if d.strip()]
 
     return Response(
-        generate_processed_frames(conf_=conf, detector_names=detector_names),
-        mimetype="multipart/x-mixed-replace; boundary=frame",
+        legacy_frames(processed=True, conf_=conf, detector_names=detector_names),
+        mimetype=MJPEG_MIMETYPE,
     )
 
 
@@ -853,30 +1834,84 @@ def legacy_view():
 @app.route("/video_list", methods=["GET"])
 def video_list():
     """Return list of available videos in the video folder."""
-    video_dir = app.config["VIDEO_UPLOADS"]
-    videos = []
+    return json.dumps({"videos": video_library.names(), "current": current_video_name})
 
-    if os.path.exists(video_dir):
-        for filename in os.listdir(video_dir):
-            if allowed_video(filename):
-                videos.append(filename)
 
-    # Sort videos alphabetically
-    videos.sort()
+@app.route("/api/videos", methods=["GET"])
+def api_videos():
+    """Indexed videos and unfinished uploads; never opens a decoder."""
+    return jsonify(
+        {
+            "videos": video_library.summaries(),
+            "uploads": video_library.uploads(),
+            "current": current_video_name,
+        }
+    )
+
+
+@app.route("/api/videos/<name>", methods=["GET"])
+def api_video(name):
+    """Probed metadata of one video, keyframe positions included."""
+    info = video_library.info(name, wait=False)
+    if info is None:
+        return jsonify({"error": "Video not found"}), 404
+    return jsonify(info)
+
+
+@app.route("/api/videos/<name>/thumbnail.jpg", methods=["GET"])
+def api_video_thumbnail(name):
+    path = video_library.thumbnail_path(name)
+    if path is None:
+        return jsonify({"error": "Thumbnail not available"}), 404
+    return send_file(os.path.abspath(path), mimetype="image/jpeg")
+
 
-    return json.dumps({"videos": videos, "current": current_video_name})
+def upload_error(e: UploadError):
+    body = {"error": str(e)}
+    if e.offset is not None:
+        body["offset"] = e.offset  # Where the client should resume from
+    return jsonify(body), e.status
+
+
+@app.route("/api/videos/uploads", methods=["POST"])
+def api_create_upload():
+    """Start a resumable upload: {"filename", "size"} -> {"id", "offset", ...}."""
+    data = request.get_json(silent=True) or {}
+    try:
+        upload = video_library.create_upload(data.get("filename"), data.get("size"))
+    except UploadError as e:
+        return upload_error(e)
+    return jsonify(upload.as_dict()), 201
+
+
+@app.route("/api/videos/uploads/<upload_id>", methods=["GET", "PATCH", "DELETE"])
+def api_upload(upload_id):
+    """Resume point (GET), next chunk (PATCH at ``Upload-Offset``) or cancel.
+
+    A chunk is the raw request body, streamed to disk as it arrives. The
+    response to the last one names the saved video, which is then indexed in
+    the background.
+    """
+    try:
+        if request.method == "DELETE":
+            if not video_library.cancel(upload_id):
+                return jsonify({"error": "Upload not found"}), 404
+            return jsonify({"success": True})
+        if request.method == "GET":
+            return jsonify(video_library.upload(upload_id).as_dict())
+        try:
+            offset = int(request.headers["Upload-Offset"])
+        except (KeyError, ValueError):
+            return jsonify({"error": "Missing or invalid Upload-Offset"}), 400
+        upload, name = video_library.write(upload_id, offset, request.stream)
+    except UploadError as e:
+        return upload_error(e)
+    return jsonify(dict(upload.as_dict(), complete=name is not None, video=name))
 
 
 @app.route("/submit", methods=["POST"])
 def submit_form():
-    global \
-        video_frames, \
-        frames_buffer, \
-        vid_path, \
-        current_video_name, \
-        email_alert_enabled, \
-        email_recipient, \
-        violation_log
+    global email_alert_enabled, email_recipient
 
     # Change video source
     if "change_video" in request.form:
@@ -885,28 +1920,26 @@ def submit_form():
         if not video_name:
             return "No video specified", 400
 
-        new_path = os.path.join(app.config["VIDEO_UPLOADS"], video_name)
-        if not os.path.exists(new_path):
+        info = video_library.info(video_name)
+        if info is None:
             return f"Video {video_name} not found", 404
+        if info["status"] != "ready":
+            return f"Video {video_name} is unreadable: {info['error']}", 400
 
-        # Update globals
-        current_video_name = video_name
-        vid_path = new_path
-        video_frames = cv2.VideoCapture(vid_path)
-        frames_buffer.clear()
-        reset_violation_tracking()  # Reset violation tracking for new video
-
-        if not video_frames.isOpened():
+        # Replace the legacy source; violation tracking starts afresh
+        source = switch_legacy_video(video_name)
+        if source is None:
             return f"Error opening video {video_name}", 500
 
-        # Get the new video's FPS
-        fps = video_frames.get(cv2.CAP_PROP_FPS)
-        print(f"Loaded {video_name} with {fps:.2f} FPS")
+        print(f"Loaded {video_name} with {source.fps:.2f} FPS")
 
         return f"Switched to {video_name}"
 
     # Download report
     if "download_button" in request.form:
+        legacy_source = sources.get(legacy_source_id)
+        violation_log = legacy_source.violation_log if legacy_source else {}
+
         # Create detailed violation report
         violation_details = ""
         if violation_log:
@@ -955,6 +1988,7 @@ Note: Violations are tracked from video start until the first complete loop.
         enabled_str = request.form.get("alert_email_checkbox", "false")
         email_alert_enabled = enabled_str.lower() in ("true", "1", "on")
         email_recipient = request.form.get("alert_email_textbox", None)
+        save_settings()
         status_msg = f"Email alerts {'enabled' if email_alert_enabled else 'disabled'} for {email_recipient}"
         return status_msg
 
@@ -1028,29 +2062,15 @@ def api_screening_detect():
 
     # Decode base64 image
     try:
-        # Remove data URL prefix
-        image_data = image_data.split(",")[1] if "," in image_data else image_data
-        image_bytes = base64.b64decode(image_data)
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        digest, img = decode_screening_image(image_data)
     except Exception as e:
         return jsonify({"error": f"Invalid image data: {str(e)}"}), 400
 
-    # Run detection
-    detector = get_detector("ppe")(conf=default_confidence)
+    raw_detections = detect_screening_image(digest, img)
     detections = []
 
-    for box, label in detector.detect(img):
+    for box, class_name, confidence in raw_detections.filter(default_confidence):
         x1, y1, x2, y2 = box
-        # Extract class name and confidence - handle multi-word class names
-        parts = label.rsplit(" ", 1)  # Split from the right to get confidence
-        if len(parts) == 2:
-            class_name = parts[0]
-            confidence = float(parts[1])
-        else:
-            class_name = label
-            confidence = 1.0
-
         detections.append(
             {
                 "bbox": [int(x1), int(y1), int(x2), int(y2)],
@@ -1059,7 +2079,10 @@ def api_screening_detect():
             }
         )
 
-    return jsonify({"detections": detections})
+    # Per-person compliance (hardhat / vest / mask) from the same detections
+    persons = assess_compliance(raw_detections, default_confidence)
+
+    return jsonify({"detections": detections, "persons": persons})
 
 
 @app.route("/api/screening/check-position", methods=["POST"])
@@ -1073,26 +2096,22 @@ def api_screening_check_position():
 
     # Decode base64 image
     try:
-        image_data = image_data.split(",")[1] if "," in image_data else image_data
-        image_bytes = base64.b64decode(image_data)
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        digest, img = decode_screening_image(image_data)
     except Exception:
         return jsonify({"error": "Invalid image data"}), 400
 
-    # Run person detection
-    detector = get_detector("ppe")(conf=0.3)  # Lower confidence for person detection
+    # Run person detection (lower confidence for person detection)
+    raw_detections = detect_screening_image(digest, img)
     persons = []
 
-    for box, label in detector.detect(img):
-        if "Person" in label:
-            x1, y1, x2, y2 = box
-            persons.append(
-                {
-                    "bbox": [int(x1), int(y1), int(x2), int(y2)],
-                    "confidence": float(label.split()[-1]),
-                }
-            )
+    for box, _, confidence in raw_detections.filter(0.3, classes=("Person",)):
+        x1, y1, x2, y2 = box
+        persons.append(
+            {
+                "bbox": [int(x1), int(y1), int(x2), int(y2)],
+                "confidence": confidence,
+            }
+        )
 
     if not persons:
         return jsonify(
@@ -1211,12 +2230,147 @@ Missing PPE: {", ".join(missing_ppe) if missing_ppe else "None"}
         "passed": passed,
         "timestamp": timestamp,
     }
-    event_queue.put(("screening_result", event_data))
+    event_bus.publish("screening_result", event_data)
 
     return jsonify({"success": True, "screening_id": screening_log["id"]})
 
 
+# Startup and health probes
+def save_sources_config():
+    """Write the API-added sources to SOURCES_CONFIG."""
+    configs = [s.config for s in list(sources.values()) if s.persistent]
+    path = app.config["SOURCES_CONFIG"]
+    with sources_config_lock:
+        # Replaced whole, so a crash mid-write never loses the saved sources
+        with open(path + ".tmp", "w") as f:
+            json.dump(configs, f, indent=2)
+        os.replace(path + ".tmp", path)
+
+
+def save_settings():
+    """Write the API-changed settings to SETTINGS_CONFIG."""
+    global settings_mtime
+    path = app.config["SETTINGS_CONFIG"]
+    settings = {
+        "email_alert_enabled": email_alert_enabled,
+        "email_recipient": email_recipient,
+        "confidence_threshold": default_confidence,
+    }
+    try:
+        with open(path + ".tmp", "w") as f:
+            json.dump(settings, f, indent=2)
+        os.replace(path + ".tmp", path)
+        settings_mtime = os.stat(path).st_mtime_ns
+    except OSError as e:
+        print("Could not save settings:", e)
+
+
+def refresh_settings():
+    """Reload SETTINGS_CONFIG if another process has changed it since."""
+    global settings_mtime, email_alert_enabled, email_recipient, default_confidence
+    path = app.config["SETTINGS_CONFIG"]
+    try:
+        mtime = os.stat(path).st_mtime_ns
+        if mtime == settings_mtime:
+            return
+        with open(path) as f:
+            settings = json.load(f)
+    except (OSError, ValueError):
+        return
+    settings_mtime = mtime
+    email_alert_enabled = settings.get("email_alert_enabled", email_alert_enabled)
+    email_recipient = settings.get("email_recipient", email_recipient)
+    default_confidence = float(
+        settings.get("confidence_threshold", default_confidence)
+    )
+
+
+def restore_sources():
+    """Re-register the sources saved in SOURCES_CONFIG."""
+    path = app.config["SOURCES_CONFIG"]
+    if not os.path.exists(path):
+        return
+    with open(path) as f:
+        configs = json.load(f)
+    for config in configs:
+        config = dict(config)
+        try:
+            source = add_source(
+                config.pop("name"),
+                config.pop("type"),
+                config.pop("path"),
+                source_id=config.pop("id", None),
+                **config,
+            )
+        except SourceLimitError as e:
+            print(f"Stopped restoring sources: {e}")
+            return
+        if source:
+            source.persistent = True
+        else:
+            print(f"Could not restore source {config}")
+
+
+def run_startup():
+    """Warm the shared model and restore sources without blocking serving."""
+    try:
+        refresh_settings()  # Saved by an earlier run or by another worker
+        started = time.time()
+        get_shared_detector(app.config["SCREENING_DETECTOR"]).warm_up()
+        if app.config["OWNS_SOURCES"]:
+            # Warm the analysis model too, so no live frame waits for it
+            analysis_models.preload()
+        startup_state["model_ready"] = True
+        print(f"Models warmed up in {time.time() - started:.1f}s")
+
+        if app.config["OWNS_SOURCES"]:
+            video_library.scan()  # Index files copied in by hand meanwhile
+            restore_sources()
+        startup_state["sources_restored"] = True
+    except Exception as e:
+        startup_state["error"] = str(e)
+        print(f"Startup failed: {e}")
+
+
+def start_background_startup():
+    """Kick off run_startup() once; safe to call from every entry point."""
+    with startup_lock:
+        if startup_state["started"]:
+            return
+        startup_state["started"] = True
+    threading.Thread(target=run_startup, daemon=True).start()
+
+
+@app.before_request
+def ensure_startup():
+    # The ASGI lifespan and `python app.py` start up eagerly; under
+    # `flask run` or any WSGI server the first request does it
+    start_background_startup()
+
+
+@app.before_request
+def ensure_current_settings():
+    # Any worker process may have saved newer settings; one stat when unchanged
+    refresh_settings()
+
+
+@app.route("/healthz")
+def healthz():
+    """Liveness probe: the process is up and serving requests."""
+    return jsonify({"status": "ok"})
+
+
+@app.route("/readyz")
+def readyz():
+    """Readiness probe: 200 once the model is warm and sources are restored."""
+    ready = startup_state["model_ready"] and startup_state["sources_restored"]
+    return jsonify(dict(startup_state, ready=ready)), 200 if ready else 503
+
+
 if __name__ == "__main__":
     # Allow overriding the port via environment variable, default to 5000.
     port = int(os.getenv("PORT", 5001))
+    # With the debug reloader only the serving child process starts up
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_background_startup()
     app.run(debug=True, host="0.0.0.0", port=port)
@@ -0,0 +1,206 @@
+"""
+Asyncio (ASGI) serving mode.
+
+MJPEG and Server-Sent Events responses are streamed from async generators
+woken by the frame and event producers, so an open stream costs a coroutine
+instead of a dedicated WSGI thread. Every other route is served by the
+existing Flask application through the ASGI-to-WSGI bridge.
+
+Production entry point:
+
+    uvicorn asgi:application --host 0.0.0.0 --port 5001
+
+or simply ``python asgi.py``.
+"""
+
+import asyncio
+import os
+import re
+from urllib.parse import parse_qs
+
+from asgiref.wsgi import WsgiToAsgi
+
+import app as webapp
+from streaming import (
+    MJPEG_MIMETYPE,
+    json_response,
+    mjpeg_part,
+    ndjson_line,
+    sse_message,
+    stream_response,
+)
+
+SOURCE_STREAM_ROUTE = re.compile(r"^/source_video_(raw|processed)/([^/]+)$")
+LEGACY_STREAM_ROUTE = re.compile(r"^/video_(raw|processed)$")
+DETECTIONS_ROUTE = re.compile(r"^/source_detections/([^/]+)$")
+
+wsgi_bridge = WsgiToAsgi(webapp.app)
+
+
+async def application(scope, receive, send):
+    """ASGI entry point: stream natively, delegate everything else to Flask."""
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+    if scope["type"] != "http":
+        return await wsgi_bridge(scope, receive, send)
+
+    path = scope["path"]
+    query = parse_qs(scope.get("query_string", b"").decode())
+
+    match = SOURCE_STREAM_ROUTE.match(path)
+    if match:
+        variant = query.get("variant", ["full"])[0]
+        if variant not in webapp.app.config["STREAM_VARIANTS"]:
+            error = {"error": f"Unknown stream variant: {variant}"}
+            return await json_response(send, 400, error)
+        processed = match.group(1) == "processed"
+        conf = webapp.parse_confidence(
+            query.get("conf", [webapp.default_confidence])[0]
+        )
+        if conf is None:
+            error = {"error": "conf must be a number from 0 to 1"}
+            return await json_response(send, 400, error)
+        body = source_frames(
+            match.group(2), processed, conf, stream_detectors(query, processed), variant
+        )
+        return await stream_response(send, receive, MJPEG_MIMETYPE, body)
+
+    match = LEGACY_STREAM_ROUTE.match(path)
+    if match:
+        conf = webapp.parse_confidence(query.get("conf", [0.5])[0])
+        if conf is None:
+            error = {"error": "conf must be a number from 0 to 1"}
+            return await json_response(send, 400, error)
+        # The legacy view is a regular source registered on first use
+        source = await asyncio.to_thread(webapp.get_legacy_source)
+        if source is None:
+            body = placeholder_frames("No video selected")
+        else:
+            processed = match.group(1) == "processed"
+            body = source_frames(
+                source.id, processed, conf, stream_detectors(query, processed)
+            )
+        return await stream_response(send, receive, MJPEG_MIMETYPE, body)
+
+    match = DETECTIONS_ROUTE.match(path)
+    if match and match.group(1) in webapp.sources:
+        fmt = query.get("format", ["sse"])[0]
+        if fmt not in ("sse", "ndjson"):
+            return await json_response(send, 400, {"error": f"Unknown format: {fmt}"})
+        conf = webapp.parse_confidence(query.get("conf", [0])[0])
+        if conf is None:
+            error = {"error": "conf must be a number from 0 to 1"}
+            return await json_response(send, 400, error)
+        content_type = "text/event-stream" if fmt == "sse" else "application/x-ndjson"
+        body = detection_metadata(match.group(1), conf, fmt)
+        return await stream_response(send, receive, content_type, body)
+
+    if path == "/events":
+        return await stream_response(send, receive, "text/event-stream", events())
+
+    return await wsgi_bridge(scope, receive, send)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            # Serve immediately; /readyz reports when warm-up has finished
+            webapp.start_background_startup()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+def stream_detectors(query, processed):
+    if not processed:
+        return None
+    detector_param = query.get("detectors", ["ppe"])[0]
+    return [d.strip() for d in detector_param.split(",") if d.strip()]
+
+
+async def placeholder_frames(text):
+    jpeg = await asyncio.to_thread(webapp.placeholder_jpeg, text)
+    while True:
+        yield mjpeg_part(jpeg)
+        await asyncio.sleep(1.0)
+
+
+async def source_frames(source_id, processed, conf, detector_names, variant="full"):
+    """Yield MJPEG parts for each new frame of a source."""
+    source = webapp.sources.get(source_id)
+    if source is None:
+        async for part in placeholder_frames("Source not found"):
+            yield part
+
+    max_fps = webapp.app.config["STREAM_VARIANTS"][variant]["fps"]
+    view = (processed, conf, detector_names, variant)
+
+    # Viewers keep the source decoding at full rate
+    source.add_viewer()
+    try:
+        last_seq = 0
+        last_sent = None
+        while source_id in webapp.sources:
+            last_seq = await source.frame_signal.wait_async(last_seq, timeout=1.0)
+            # Every viewer of the same view shares one encode per frame
+            encoded = webapp.cached_source_jpeg(source, *view)
+            if encoded is None:
+                encoded = await asyncio.to_thread(
+                    webapp.encode_source_frame, source, *view
+                )
+            if encoded is None or encoded[0] == last_sent:
+                continue
+            last_sent, jpeg, captured_at = encoded
+            yield mjpeg_part(jpeg, last_sent, captured_at)
+            if max_fps:
+                await asyncio.sleep(1.0 / max_fps)
+    finally:
+        source.remove_viewer()
+
+
+async def detection_metadata(source_id, conf, fmt):
+    """Yield a source's detection records as they are produced."""
+    source = webapp.sources.get(source_id)
+    if source is None:
+        return  # Removed since the route checked
+    format_record = sse_message if fmt == "sse" else ndjson_line
+    yield format_record("meta", webapp.detection_meta(source))
+    last_seq = 0
+    while source_id in webapp.sources:
+        seq = await source.detection_signal.wait_async(last_seq, timeout=15)
+        if seq == last_seq:
+            yield ": keep-alive\n\n" if fmt == "sse" else "\n"
+            continue
+        last_seq = seq
+        yield format_record("detections", webapp.latest_detection_payload(source, conf))
+
+
+async def events():
+    """Yield Server-Sent Events pushed by the shared broadcaster."""
+    webapp.dashboard_stats.start_publishing(
+        webapp.event_bus, interval=webapp.STATS_INTERVAL_SEC
+    )
+    subscriber = webapp.event_bus.subscribe_async()
+    try:
+        for event_type, event_data in webapp.initial_events():
+            yield sse_message(event_type, event_data)
+        while True:
+            try:
+                event_type, event_data = await asyncio.wait_for(
+                    subscriber.get(), timeout=15
+                )
+                yield sse_message(event_type, event_data)
+            except asyncio.TimeoutError:
+                # Keep-alive comment so proxies don't drop idle streams
+                yield ": keep-alive\n\n"
+    finally:
+        webapp.event_bus.unsubscribe(subscriber)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    port = int(os.getenv("PORT", 5001))
+    uvicorn.run("asgi:application", host="0.0.0.0", port=port, workers=1)
@@ -0,0 +1,847 @@
+"""
+Sharding coordinator for running camera sources on several nodes.
+
+Every node is an ordinary instance of the application (``asgi.py`` or
+``serve.py``) with its own sources, models and event stream. The coordinator
+keeps the registry of sources and assigns each one to a node by consistent
+hashing of its id over the nodes that are up, so a node joining or leaving
+moves only the sources that hash to or from it. A background loop checks
+every node's ``/readyz`` and reconciles what the nodes run with the
+assignment. A moving source is started on its new node before it is stopped
+on the old one, so it briefly runs twice rather than not at all. State a node
+keeps per source (open episodes, heatmap, clip history) starts afresh after
+a move.
+
+Clients only talk to the coordinator. Requests for one source (streams,
+camera page, snapshot, heatmap, schedule) go to the node that runs it, either
+relayed or, with ``--streams redirect`` and nodes the clients can reach
+directly, redirected there. ``/events`` merges the event streams of all nodes
+and replaces their ``stats`` events with one combined snapshot, which
+``/api/stats`` also returns. ``/api/metrics`` adds up the nodes' counters.
+
+    python coordinator.py --port 5000 \\
+        --node http://127.0.0.1:5101 --node http://127.0.0.1:5102
+"""
+
+import argparse
+import asyncio
+import bisect
+import hashlib
+import itertools
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+import uvicorn
+
+from events import EventBroadcaster
+from streaming import json_response, relay, sse_message, stream_response
+
+# Pages and streams of one source, served by the node running it
+SOURCE_ROUTE = re.compile(
+    r"^/(source_video_raw|source_video_processed|source_detections|camera)/([^/]+)$"
+)
+SOURCE_API_ROUTE = re.compile(r"^/api/sources/([^/]+)(/[a-z._]+)?$")
+# Any path of one node, e.g. the best frames and clips linked from episodes
+NODE_PATH_ROUTE = re.compile(r"^/nodes/([^/]+)(/.*)$")
+NODE_ROUTE = re.compile(r"^/api/nodes/([^/]+)$")
+# Node-wide settings, applied to every node
+BROADCAST_ROUTE = re.compile(r"^/api/(settings|models(/candidate|/promote)?)$")
+# Resumable uploads: every chunk must reach the node holding the partial file
+UPLOAD_ROUTE = re.compile(r"^/api/videos/uploads(/[0-9a-f]+)?$")
+UPLOAD_KEY = "video-uploads"
+SOURCE_FIELDS = (
+    "name",
+    "type",
+    "path",
+    "priority",
+    "min_fps",
+    "max_fps",
+    "detection_enabled",
+)
+SUMMED_METRICS = (
+    "cpu_seconds",
+    "rss_mb",
+    "threads",
+    "sources",
+    "viewers",
+    "events_published",
+    "events_dropped",
+    "event_subscribers",
+)
+STATS_INTERVAL_SEC = 5
+EPISODE_RETENTION_SEC = 3600  # Episodes replayed to new /events clients
+
+
+def ring_hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent hashing of keys onto nodes, with virtual nodes for balance."""
+
+    def __init__(self, nodes=(), replicas: int = 128):
+        self.nodes = sorted(nodes)
+        points = sorted(
+            (ring_hash(f"{node}#{i}"), node)
+            for node in self.nodes
+            for i in range(replicas)
+        )
+        self._hashes = [h for h, _ in points]
+        self._owners = [node for _, node in points]
+
+    def node_for(self, key: str) -> str | None:
+        """The node owning ``key``: the first virtual node after its hash."""
+        if not self._hashes:
+            return None
+        i = bisect.bisect(self._hashes, ring_hash(key)) % len(self._hashes)
+        return self._owners[i]
+
+
+class NodeError(Exception):
+    """A node could not be reached or refused a request."""
+
+    def __init__(self, node, status, message):
+        super().__init__(f"{node.name}: {status or 'unreachable'} {message}")
+        self.status = status
+
+
+class Node:
+    """A worker node and what the coordinator last heard from it."""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        parts = urlsplit(self.url)
+        self.name = parts.netloc
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.up = False
+        self.leaving = False  # Removed; its sources are being moved away
+        self.failures = 0
+        self.last_seen = None
+        self.stats = None  # Latest "stats" event of the node
+        self.sources = set()  # Ids it ran at the last reconciliation
+        self.follower = None  # Thread reading its event stream
+
+    def connect(self):
+        return asyncio.open_connection(self.host, self.port)
+
+    def as_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "url": self.url,
+            "up": self.up,
+            "leaving": self.leaving,
+            "failures": self.failures,
+            "last_seen": self.last_seen,
+            "sources": len(self.sources),
+        }
+
+
+class Coordinator:
+    """Source registry, node membership and the merged event stream."""
+
+    def __init__(
+        self,
+        config_path: str = "coordinator.json",
+        replicas: int = 128,
+        interval: float = 2.0,
+        max_failures: int = 3,
+        timeout: float = 5.0,
+    ):
+        self.config_path = config_path
+        self.replicas = replicas
+        self.interval = interval  # Seconds between health checks
+        self.max_failures = max_failures  # Failed checks before a node is down
+        self.timeout = timeout
+        self.streams = "proxy"  # Or "redirect" clients to the owning node
+        self.nodes = {}  # {name: Node}
+        self.sources = {}  # {source_id: config}
+        self.removed = set()  # Ids deleted here, stopped wherever they reappear
+        self.ring = HashRing(replicas=replicas)
+        self.event_bus = EventBroadcaster()
+        self.episodes = OrderedDict()  # {event_id: (event_type, data, received)}
+        self.moves = 0  # Sources started elsewhere by rebalancing
+        self._round_robin = itertools.count()
+        self._lock = threading.RLock()
+        self._reconcile_lock = threading.Lock()  # Serialises source changes
+        self._wake = threading.Event()
+        self._started = False
+        self.load()
+
+    # Persistence
+
+    def load(self):
+        try:
+            with open(self.config_path) as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return
+        for url in saved.get("nodes", []):
+            node = Node(url)
+            self.nodes[node.name] = node
+        self.sources = {config["id"]: config for config in saved.get("sources", [])}
+        self.removed = set(saved.get("removed", []))
+
+    def save(self):
+        with self._lock:
+            saved = {
+                "nodes": [n.url for n in self.nodes.values() if not n.leaving],
+                "sources": list(self.sources.values()),
+                "removed": sorted(self.removed),
+            }
+            with open(self.config_path + ".tmp", "w") as f:
+                json.dump(saved, f, indent=2)
+            os.replace(self.config_path + ".tmp", self.config_path)
+
+    # Membership
+
+    def start(self):
+        """Start health checks, reconciliation and stats publishing (idempotent)."""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._run, daemon=True).start()
+        threading.Thread(target=self._publish_stats, daemon=True).start()
+
+    def add_node(self, url: str) -> Node:
+        node = Node(url)
+        with self._lock:
+            existing = self.nodes.get(node.name)
+            if existing is not None and not existing.leaving:
+                return existing
+            self.nodes[node.name] = node
+            self.save()
+        self._wake.set()
+        return node
+
+    def remove_node(self, name: str) -> bool:
+        """Take a node out of the ring; it is dropped once its sources moved."""
+        with self._lock:
+            node = self.nodes.get(name)
+            if node is None or node.leaving:
+                return False
+            node.leaving = True
+            if not node.up:
+                del self.nodes[name]
+            self.save()
+        self._rebuild_ring()
+        self._wake.set()
+        return True
+
+    def _rebuild_ring(self):
+        with self._lock:
+            members = sorted(
+                n.name for n in self.nodes.values() if n.up and not n.leaving
+            )
+            if members != self.ring.nodes:
+                self.ring = HashRing(members, self.replicas)
+                print(f"Hash ring: {', '.join(members) or 'no nodes'}")
+
+    def owner(self, source_id: str) -> Node | None:
+        with self._lock:
+            return self.nodes.get(self.ring.node_for(source_id))
+
+    def any_node(self) -> Node | None:
+        """An up node, in turn, for requests that do not depend on sources."""
+        with self._lock:
+            up = [n for n in self.nodes.values() if n.up and not n.leaving]
+        return up[next(self._round_robin) % len(up)] if up else None
+
+    def _run(self):
+        while True:
+            try:
+                self.check_nodes()
+                self.reconcile()
+            except Exception as e:
+                print("Coordinator loop failed:", e)
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def check_nodes(self):
+        """Poll every node's readiness and update the ring."""
+        for node in list(self.nodes.values()):
+            try:
+                response = requests.get(node.url + "/readyz", timeout=self.timeout)
+                ready = response.status_code == 200
+            except requests.RequestException:
+                ready = False
+            if ready:
+                node.failures = 0
+                node.last_seen = time.time()
+            else:
+                node.failures += 1
+            # A node leaves the ring after several failed checks in a row and
+            # rejoins as soon as it is ready again
+            up = ready or (node.up and node.failures < self.max_failures)
+            if up != node.up:
+                node.up = up
+                print(f"Node {node.name} is {'up' if up else 'down'}")
+                if up:
+                    self._follow_events(node)
+        self._rebuild_ring()
+
+    # Sources
+
+    def _request(self, node, method, path, payload=None):
+        """``(status, body)`` of a request to ``node``; raises ``NodeError``."""
+        try:
+            response = requests.request(
+                method, node.url + path, json=payload, timeout=self.timeout
+            )
+        except requests.RequestException as e:
+            raise NodeError(node, None, str(e)) from e
+        try:
+            body = response.json()
+        except ValueError:
+            body = {"error": response.text[:200]}
+        return response.status_code, body
+
+    def _call(self, node, method, path, payload=None):
+        status, body = self._request(node, method, path, payload)
+        if status >= 400:
+            raise NodeError(node, status, body.get("error", ""))
+        return body
+
+    def _each(self, nodes, method, path, payload=None) -> dict:
+        """Send one request to several nodes at once: ``{name: (status, body)}``.
+
+        Nodes that cannot be reached map to their ``NodeError``.
+        """
+
+        def call(node):
+            try:
+                return self._request(node, method, path, payload)
+            except NodeError as e:
+                return e
+
+        if not nodes:
+            return {}
+        with ThreadPoolExecutor(max_workers=len(nodes)) as pool:
+            return dict(zip([n.name for n in nodes], pool.map(call, nodes)))
+
+    def _start_source(self, node, config) -> bool:
+        try:
+            self._call(node, "POST", "/api/sources", config)
+        except NodeError as e:
+            if e.status != 409:  # Already running there
+                print(f"Could not start source {config['id']}:", e)
+                return False
+        return True
+
+    def _stop_source(self, node, source_id) -> bool:
+        try:
+            self._call(node, "DELETE", f"/api/sources/{source_id}")
+        except NodeError as e:
+            if e.status != 404:
+                print(f"Could not stop source {source_id}:", e)
+                return False
+        return True
+
+    def reconcile(self):
+        """Start and stop sources on the nodes until they match the ring."""
+        with self._reconcile_lock:
+            with self._lock:
+                nodes = {n.name: n for n in self.nodes.values() if n.up}
+            running = {}  # {node name: {source_id: listing}}
+            listings = self._each(list(nodes.values()), "GET", "/api/sources")
+            for name, result in listings.items():
+                if isinstance(result, NodeError) or result[0] != 200:
+                    continue
+                running[name] = {s["id"]: s for s in result[1]}
+
+            with self._lock:
+                # Sources added to a node directly are taken over
+                adopted = [
+                    dict(s["config"], id=source_id)
+                    for listing in running.values()
+                    for source_id, s in listing.items()
+                    if s.get("persistent")
+                    and s.get("config")
+                    and source_id not in self.sources
+                    and source_id not in self.removed
+                ]
+                for config in adopted:
+                    self.sources[config["id"]] = config
+                if adopted:
+                    self.save()
+                desired = {sid: self.ring.node_for(sid) for sid in self.sources}
+                configs = dict(self.sources)
+                removed = set(self.removed)
+
+            # Start first, so a moving source is never down
+            for source_id, name in desired.items():
+                if name not in running or source_id in running[name]:
+                    continue
+                if self._start_source(nodes[name], configs[source_id]):
+                    running[name][source_id] = {"id": source_id}
+                    self.moves += 1
+                    print(f"Started source {source_id} on {name}")
+
+            for name, listing in running.items():
+                for source_id in list(listing):
+                    target = desired.get(source_id)
+                    moved = (
+                        target is not None
+                        and target != name
+                        and source_id in running.get(target, ())
+                    )
+                    if (source_id in removed or moved) and self._stop_source(
+                        nodes[name], source_id
+                    ):
+                        del listing[source_id]
+
+            with self._lock:
+                for node in nodes.values():
+                    node.sources = set(running.get(node.name, ()))
+                    if node.leaving and (not node.sources or not node.up):
+                        self.nodes.pop(node.name, None)
+                        print(f"Node {node.name} left")
+
+    def add_source(self, data: dict):
+        """Start a new source on its node; ``(status, body)`` of the node."""
+        config = {key: data[key] for key in SOURCE_FIELDS if key in data}
+        config["id"] = str(uuid.uuid4())
+        node = self.owner(config["id"])
+        if node is None:
+            return 503, {"error": "No nodes available"}
+        with self._reconcile_lock:
+            try:
+                status, body = self._request(node, "POST", "/api/sources", config)
+            except NodeError as e:
+                return 503, {"error": str(e)}
+            if status == 200:
+                config["name"] = body.get("name", config.get("name"))
+                with self._lock:
+                    self.sources[config["id"]] = config
+                    self.save()
+                node.sources.add(config["id"])
+                body = dict(body, node=node.name)
+        return status, body
+
+    def remove_source(self, source_id: str) -> bool:
+        with self._reconcile_lock:
+            with self._lock:
+                if self.sources.pop(source_id, None) is None:
+                    return False
+                self.removed.add(source_id)
+                self.save()
+                owner = self.ring.node_for(source_id)
+                nodes = [
+                    n
+                    for n in self.nodes.values()
+                    if n.up and (source_id in n.sources or n.name == owner)
+                ]
+            # Nodes that are down now stop it at reconciliation once back
+            for node in nodes:
+                if self._stop_source(node, source_id):
+                    node.sources.discard(source_id)
+        return True
+
+    def update_source(self, source_id: str, setting: str, data: dict):
+        """Change a source's schedule or detection on its node and remember it."""
+        node = self.owner(source_id)
+        if source_id not in self.sources:
+            return 404, {"error": "Source not found"}
+        if node is None:
+            return 503, {"error": "No nodes available"}
+        with self._reconcile_lock:
+            try:
+                status, body = self._request(
+                    node, "PUT", f"/api/sources/{source_id}/{setting}", data
+                )
+            except NodeError as e:
+                return 503, {"error": str(e)}
+            if status == 200 and source_id in self.sources:
+                with self._lock:
+                    config = self.sources[source_id]
+                    if setting == "detection":
+                        config["detection_enabled"] = body["detection_enabled"]
+                    else:
+                        for key in ("priority", "min_fps", "max_fps"):
+                            config[key] = body[key]
+                    self.save()
+        return status, body
+
+    def list_sources(self) -> list:
+        """Every registered source with the node running it."""
+        with self._lock:
+            nodes = [n for n in self.nodes.values() if n.up]
+            configs = dict(self.sources)
+        listed = {}
+        for name, result in self._each(nodes, "GET", "/api/sources").items():
+            if isinstance(result, NodeError) or result[0] != 200:
+                continue
+            for source in result[1]:
+                source_id = source["id"]
+                # While a source moves, report the copy on its new node
+                if source_id in listed and self.ring.node_for(source_id) != name:
+                    continue
+                listed[source_id] = dict(source, node=name)
+        for source_id, config in configs.items():
+            if source_id not in listed:
+                listed[source_id] = {
+                    "id": source_id,
+                    "name": config.get("name"),
+                    "type": config.get("type"),
+                    "path": config.get("path"),
+                    "status": "unassigned",
+                    "node": None,
+                }
+        return list(listed.values())
+
+    def broadcast(self, method: str, path: str, payload) -> tuple:
+        """Apply a node-wide request to every up node."""
+        with self._lock:
+            nodes = [n for n in self.nodes.values() if n.up and not n.leaving]
+        if not nodes:
+            return 503, {"error": "No nodes available"}
+        results = {}
+        for name, result in self._each(nodes, method, path, payload).items():
+            if isinstance(result, NodeError):
+                results[name] = {"status": None, "body": {"error": str(result)}}
+            else:
+                results[name] = {"status": result[0], "body": result[1]}
+        failed = any(
+            r["status"] is None or r["status"] >= 400 for r in results.values()
+        )
+        return 502 if failed else 200, {"nodes": results}
+
+    def status(self) -> dict:
+        with self._lock:
+            assigned = Counter(self.ring.node_for(sid) for sid in self.sources)
+            return {
+                "nodes": [
+                    dict(node.as_dict(), assigned=assigned.get(node.name, 0))
+                    for node in self.nodes.values()
+                ],
+                "sources": len(self.sources),
+                "unassigned": assigned.get(None, 0),
+                "moves": self.moves,
+                "streams": self.streams,
+            }
+
+    # Events and stats
+
+    def _follow_events(self, node):
+        if node.follower is None or not node.follower.is_alive():
+            node.follower = threading.Thread(
+                target=self._read_events, args=(node,), daemon=True
+            )
+            node.follower.start()
+
+    def _read_events(self, node):
+        """Relay a node's event stream while it is up, reconnecting as needed."""
+        while node.up and self.nodes.get(node.name) is node:
+            try:
+                with requests.get(
+                    node.url + "/events", stream=True, timeout=(self.timeout, 60)
+                ) as response:
+                    response.raise_for_status()
+                    event_type, data = None, []
+                    for line in response.iter_lines(decode_unicode=True):
+                        if not node.up:
+                            break
+                        if line.startswith("event:"):
+                            event_type = line[6:].strip()
+                        elif line.startswith("data:"):
+                            data.append(line[5:].strip())
+                        elif not line:
+                            if event_type and data:
+                                payload = json.loads("\n".join(data))
+                                self._on_event(node, event_type, payload)
+                            event_type, data = None, []
+            except (requests.RequestException, ValueError) as e:
+                print(f"Event stream of {node.name} interrupted:", e)
+            time.sleep(1.0)
+
+    def _on_event(self, node, event_type: str, data):
+        if event_type == "stats":
+            node.stats = data  # Merged into the coordinator's own snapshots
+            return
+        if isinstance(data, dict):
+            data = dict(data, node=node.name)
+            # Best frames and clips are files on the node
+            for key in ("best_frame", "thumbnail", "clip"):
+                if isinstance(data.get(key), str) and data[key].startswith("/"):
+                    data[key] = f"/nodes/{node.name}{data[key]}"
+        if event_type.startswith("episode_") and isinstance(data, dict):
+            key = data.get("event_id")
+            now = time.time()
+            with self._lock:
+                cached = self.episodes.get(key)
+                if cached is not None and cached[:2] == (event_type, data):
+                    return  # Replayed by the node after a reconnect
+                self.episodes[key] = (event_type, data, now)
+                self.episodes.move_to_end(key)
+                cutoff = now - EPISODE_RETENTION_SEC
+                while self.episodes and next(iter(self.episodes.values()))[2] < cutoff:
+                    self.episodes.popitem(last=False)
+        self.event_bus.publish(event_type, data)
+
+    def stats(self) -> dict:
+        """Dashboard stats of all up nodes combined."""
+        with self._lock:
+            nodes = list(self.nodes.values())
+        snapshots = [n.stats for n in nodes if n.up and n.stats]
+
+        def total(key):
+            return sum(s.get(key, 0) for s in snapshots)
+
+        frames = total("total_frames")
+        people = total("people_checked")
+        detections = [s["last_detection"] for s in snapshots if s.get("last_detection")]
+        return {
+            "active_sources": total("active_sources"),
+            "active_violations": total("active_violations"),
+            "compliance_rate": (
+                (frames - total("frames_with_violations")) / frames * 100
+                if frames
+                else 100
+            ),
+            "person_compliance_rate": (
+                total("people_compliant") / people * 100 if people else 100
+            ),
+            "last_detection": max(detections, default=None),
+            "total_frames": frames,
+            "frames_with_violations": total("frames_with_violations"),
+            "people_checked": people,
+            "people_compliant": total("people_compliant"),
+            "nodes_up": sum(1 for n in nodes if n.up),
+            "nodes": len(nodes),
+        }
+
+    def _publish_stats(self):
+        while True:
+            time.sleep(STATS_INTERVAL_SEC)
+            if self.event_bus.subscriber_count:
+                self.event_bus.publish("stats", self.stats())
+
+    def initial_events(self) -> list:
+        """Events replayed to a newly connected SSE client."""
+        cutoff = time.time() - EPISODE_RETENTION_SEC
+        with self._lock:
+            episodes = [
+                (event_type, data)
+                for event_type, data, received in self.episodes.values()
+                if received >= cutoff
+            ]
+        return [("stats", self.stats())] + episodes
+
+    def metrics(self) -> dict:
+        """The nodes' process counters added up, plus each node's own."""
+        with self._lock:
+            nodes = [n for n in self.nodes.values() if n.up]
+        merged = dict.fromkeys(SUMMED_METRICS, 0)
+        by_node = {}
+        for name, result in self._each(nodes, "GET", "/api/metrics").items():
+            if isinstance(result, NodeError) or result[0] != 200:
+                continue
+            by_node[name] = result[1]
+            for key in SUMMED_METRICS:
+                merged[key] += result[1].get(key, 0)
+        # Deliveries of the merged stream, on top of the nodes' own
+        merged["events_published"] += self.event_bus.published
+        merged["events_dropped"] += self.event_bus.dropped
+        merged["event_subscribers"] += self.event_bus.subscriber_count
+        return dict(merged, time=time.time(), nodes=by_node)
+
+
+coordinator = Coordinator(os.getenv("COORDINATOR_CONFIG", "coordinator.json"))
+coordinator.streams = os.getenv("COORDINATOR_STREAMS", "proxy")
+for url in filter(None, os.getenv("COORDINATOR_NODES", "").split(",")):
+    coordinator.add_node(url)
+
+
+async def application(scope, receive, send):
+    """ASGI entry point of the coordinator."""
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+    if scope["type"] != "http":
+        return
+
+    path, method = scope["path"], scope["method"]
+    if path == "/healthz":
+        return await json_response(send, 200, {"status": "ok"})
+    if path == "/events":
+        return await stream_response(send, receive, "text/event-stream", events())
+    if path == "/api/stats":
+        by_node = {name: node.stats for name, node in list(coordinator.nodes.items())}
+        stats = dict(coordinator.stats(), by_node=by_node)
+        return await json_response(send, 200, stats)
+    if path == "/api/metrics":
+        metrics = await asyncio.to_thread(coordinator.metrics)
+        return await json_response(send, 200, metrics)
+
+    if path == "/api/nodes":
+        if method != "POST":
+            return await json_response(send, 200, coordinator.status())
+        url = str((await read_json(receive)).get("url", ""))
+        if not re.match(r"^http://[^/]+$", url.rstrip("/")):
+            error = {"error": "Node url must be http://host:port"}
+            return await json_response(send, 400, error)
+        node = await asyncio.to_thread(coordinator.add_node, url)
+        return await json_response(send, 201, node.as_dict())
+    match = NODE_ROUTE.match(path)
+    if match and method == "DELETE":
+        if not await asyncio.to_thread(coordinator.remove_node, match.group(1)):
+            return await json_response(send, 404, {"error": "Node not found"})
+        return await json_response(send, 200, {"success": True})
+
+    if path == "/api/sources":
+        if method == "POST":
+            data = await read_json(receive)
+            status, body = await asyncio.to_thread(coordinator.add_source, data)
+            return await json_response(send, status, body)
+        listing = await asyncio.to_thread(coordinator.list_sources)
+        return await json_response(send, 200, listing)
+    match = SOURCE_API_ROUTE.match(path)
+    if match:
+        source_id, suffix = match.groups()
+        if suffix is None and method == "DELETE":
+            if not await asyncio.to_thread(coordinator.remove_source, source_id):
+                return await json_response(send, 404, {"error": "Source not found"})
+            return await json_response(send, 200, {"success": True})
+        if suffix in ("/schedule", "/detection") and method == "PUT":
+            data = await read_json(receive)
+            status, body = await asyncio.to_thread(
+                coordinator.update_source, source_id, suffix[1:], data
+            )
+            return await json_response(send, status, body)
+        return await to_owner(source_id, scope, receive, send)
+    match = SOURCE_ROUTE.match(path)
+    if match:
+        return await to_owner(match.group(2), scope, receive, send)
+
+    match = NODE_PATH_ROUTE.match(path)
+    if match:
+        node = coordinator.nodes.get(match.group(1))
+        if node is None:
+            return await json_response(send, 404, {"error": "Node not found"})
+        rest = match.group(2)
+        scope = dict(scope, path=rest, raw_path=rest.encode())
+        return await relay(
+            node.connect, scope, receive, send, unavailable="Node unavailable"
+        )
+
+    if UPLOAD_ROUTE.match(path):
+        node = coordinator.owner(UPLOAD_KEY)
+        if node is None:
+            return await json_response(send, 503, {"error": "No nodes available"})
+        return await relay(
+            node.connect, scope, receive, send, unavailable="Node unavailable"
+        )
+
+    if BROADCAST_ROUTE.match(path):
+        data = await read_json(receive) if method in ("POST", "PUT") else None
+        status, body = await asyncio.to_thread(
+            coordinator.broadcast, method, path, data
+        )
+        return await json_response(send, status, body)
+
+    # Pages, static files and screening: any node will do
+    node = coordinator.any_node()
+    if node is None:
+        return await json_response(send, 503, {"error": "No nodes available"})
+    return await relay(
+        node.connect, scope, receive, send, unavailable="Node unavailable"
+    )
+
+
+async def to_owner(source_id, scope, receive, send):
+    """Relay or redirect a request for one source to the node running it."""
+    node = coordinator.owner(source_id)
+    if node is None:
+        if source_id in coordinator.sources:
+            return await json_response(send, 503, {"error": "No nodes available"})
+        return await json_response(send, 404, {"error": "Source not found"})
+    if coordinator.streams == "redirect" and scope["method"] == "GET":
+        location = node.url.encode() + (scope.get("raw_path") or scope["path"].encode())
+        if scope.get("query_string"):
+            location += b"?" + scope["query_string"]
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 307,
+                "headers": [(b"location", location), (b"cache-control", b"no-store")],
+            }
+        )
+        return await send({"type": "http.response.body", "body": b""})
+    return await relay(
+        node.connect, scope, receive, send, unavailable="Node unavailable"
+    )
+
+
+async def read_json(receive) -> dict:
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+    try:
+        data = json.loads(body or b"{}")
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            coordinator.start()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def events():
+    """Yield the merged Server-Sent Events of every node."""
+    subscriber = coordinator.event_bus.subscribe_async()
+    try:
+        for event_type, event_data in coordinator.initial_events():
+            yield sse_message(event_type, event_data)
+        while True:
+            try:
+                event_type, event_data = await asyncio.wait_for(
+                    subscriber.get(), timeout=15
+                )
+                yield sse_message(event_type, event_data)
+            except asyncio.TimeoutError:
+                # Keep-alive comment so proxies don't drop idle streams
+                yield ": keep-alive\n\n"
+    finally:
+        coordinator.event_bus.unsubscribe(subscriber)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Source sharding coordinator")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", 5000)))
+    parser.add_argument(
+        "--node",
+        action="append",
+        default=[],
+        help="Base URL of a worker node, e.g. http://10.0.0.5:5001 (repeatable)",
+    )
+    parser.add_argument(
+        "--streams",
+        choices=("proxy", "redirect"),
+        default=coordinator.streams,
+        help="Relay per-source requests, or redirect clients to the node",
+    )
+    args = parser.parse_args()
+    coordinator.streams = args.streams
+    for url in args.node:
+        coordinator.add_node(url)
+    uvicorn.run(application, host=args.host, port=args.port)
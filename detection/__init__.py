@@ -1,9 +1,27 @@
-from .ppe_detector import Detector as PPEDetector
+import threading
+
+from .ppe_detector import Detector as PPEDetector, CONF_FLOOR
+from .cascade import CascadeDetector, CroppedCascadeDetector
+from .fake import FakeDetector
+from .results import Detections
+from .compliance import assess_compliance, PPE_ITEMS
+from .cache import DetectionCache, open_detection_cache
+from .deployment import ModelDeployment
+from .runtime import ThreadBudget, configure_runtime, get_runtime
 
 DETECTOR_REGISTRY = {
     "ppe": PPEDetector,
+    # Person gate first, full model only when someone is in view
+    "ppe_cascade": CascadeDetector,
+    # ...and only on the padded person crops
+    "ppe_cascade_crops": CroppedCascadeDetector,
+    # Deterministic, model-free stand-in for load tests
+    "fake": FakeDetector,
 }
 
+_shared_detectors = {}
+_shared_lock = threading.Lock()
+
 
 def get_detector(name: str):
     """Retrieve a detector class by name."""
@@ -11,4 +29,27 @@ def get_detector(name: str):
         raise KeyError(f"Unknown detector: {name}")
     return DETECTOR_REGISTRY[name]
 
-__all__ = ["get_detector", "DETECTOR_REGISTRY"]
+
+def get_shared_detector(name: str):
+    """Return a process-wide detector instance running at the floor threshold."""
+    with _shared_lock:
+        if name not in _shared_detectors:
+            _shared_detectors[name] = get_detector(name)(conf=CONF_FLOOR)
+        return _shared_detectors[name]
+
+
+__all__ = [
+    "get_detector",
+    "get_shared_detector",
+    "DETECTOR_REGISTRY",
+    "Detections",
+    "CONF_FLOOR",
+    "assess_compliance",
+    "PPE_ITEMS",
+    "DetectionCache",
+    "open_detection_cache",
+    "ModelDeployment",
+    "ThreadBudget",
+    "configure_runtime",
+    "get_runtime",
+]
@@ -0,0 +1,140 @@
+"""
+Persistent per-frame detection cache for video files.
+
+Looping file sources analyse the same frames over and over. Raw detections
+are stored on disk keyed by the video's content hash, the weights' hash, the
+inference floor and the frame index, so every pass after the first is served
+from the cache without running the model.
+
+Each cache is a pair of ``.npy`` files opened as memory maps:
+
+- ``<key>.counts.npy``: ``int16[frames]``, detections per frame, -1 = unknown
+- ``<key>.dets.npy``: ``float32[frames, MAX_DETECTIONS, 6]`` rows of
+  ``x1, y1, x2, y2, confidence, class_id``
+
+A five-minute 30 fps clip takes about 7 MB and only touched pages are read.
+"""
+
+import hashlib
+import os
+import threading
+
+import numpy as np
+
+from .results import Detections
+
+MAX_DETECTIONS = 32  # Highest-confidence detections kept per frame
+FLUSH_EVERY = 100  # Writes between flushes to disk
+
+_digests = {}  # {(path, size, mtime): sha1}
+_caches = {}  # {cache path prefix: DetectionCache}
+_cache_lock = threading.Lock()
+
+
+def file_digest(path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-1 of a file's contents, memoised while the file is unchanged."""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime)
+    if key not in _digests:
+        digest = hashlib.sha1()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(chunk_size), b""):
+                digest.update(block)
+        _digests[key] = digest.hexdigest()
+    return _digests[key]
+
+
+class DetectionCache:
+    """Memory-mapped raw detections for every frame of one video."""
+
+    def __init__(self, prefix: str, frame_count: int, names: dict):
+        self.names = names
+        self.frame_count = frame_count
+        counts_path = prefix + ".counts.npy"
+        dets_path = prefix + ".dets.npy"
+        if os.path.exists(counts_path) and os.path.exists(dets_path):
+            self.counts = np.load(counts_path, mmap_mode="r+")
+            self.dets = np.load(dets_path, mmap_mode="r+")
+            self.frame_count = len(self.counts)
+        else:
+            self.dets = np.lib.format.open_memmap(
+                dets_path,
+                mode="w+",
+                dtype=np.float32,
+                shape=(frame_count, MAX_DETECTIONS, 6),
+            )
+            self.counts = np.lib.format.open_memmap(
+                counts_path, mode="w+", dtype=np.int16, shape=(frame_count,)
+            )
+            self.counts[:] = -1
+            self.flush()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def get(self, index: int, tolerance: int = 0) -> Detections | None:
+        """Detections for frame ``index``, or the nearest cached frame within
+        ``tolerance`` frames; ``None`` on a miss."""
+        for offset in sorted(range(-tolerance, tolerance + 1), key=abs):
+            i = index + offset
+            if 0 <= i < self.frame_count and self.counts[i] >= 0:
+                rows = np.array(self.dets[i, : self.counts[i]])
+                return Detections(rows[:, :4], rows[:, 4], rows[:, 5], self.names)
+        return None
+
+    def put(self, index: int, detections: Detections):
+        if not 0 <= index < self.frame_count:
+            return
+        keep = np.argsort(-detections.confidences)[:MAX_DETECTIONS]
+        rows = np.column_stack(
+            (
+                detections.boxes[keep],
+                detections.confidences[keep],
+                detections.class_ids[keep],
+            )
+        )
+        with self._lock:
+            self.dets[index, : len(rows)] = rows
+            self.counts[index] = len(rows)  # Written last: marks the frame valid
+            self._writes += 1
+            if self._writes % FLUSH_EVERY == 0:
+                self.flush()
+
+    def flush(self):
+        self.dets.flush()
+        self.counts.flush()
+
+    @property
+    def coverage(self) -> float:
+        """Fraction of frames with cached detections."""
+        if self.frame_count == 0:
+            return 0.0
+        cached = np.count_nonzero(np.asarray(self.counts) >= 0)
+        return float(cached) / self.frame_count
+
+
+def open_detection_cache(
+    directory: str,
+    video_path: str,
+    weights_path: str,
+    conf: float,
+    frame_count: int,
+    names: dict,
+    tag: str = "",
+) -> DetectionCache | None:
+    """Open (or create) the shared cache for a video, model and floor.
+
+    ``tag`` distinguishes detectors that share weights but not results.
+    """
+    if frame_count <= 0:
+        return None
+    key = "-".join(
+        (file_digest(video_path)[:16], file_digest(weights_path)[:16], f"{conf:g}")
+    )
+    if tag:
+        key += f"-{tag}"
+    prefix = os.path.join(directory, key)
+    with _cache_lock:
+        if prefix not in _caches:
+            os.makedirs(directory, exist_ok=True)
+            _caches[prefix] = DetectionCache(prefix, frame_count, names)
+        return _caches[prefix]
@@ -0,0 +1,131 @@
+"""
+Two-stage cascade: a cheap person gate in front of the full PPE model.
+
+Most analysed frames have nobody in them, yet the 10-class model runs on all
+of them. The cascade first runs the same model at low resolution, restricted
+to the ``Person`` class. Frames without people return no detections at that
+cost; otherwise the full model runs either on the whole frame or, with
+``crops=True``, only on the padded person regions, batched together.
+
+Note that PPE boxes are only reported where a person was found, which is what
+the per-person compliance logic needs anyway. The gate runs at the same
+confidence floor as the full model unless ``gate_conf`` raises it; a higher
+gate drops every frame whose people all score below it, at any threshold.
+"""
+
+import numpy as np
+
+from .compliance import pairwise_iou
+from .ppe_detector import Detector
+from .results import Detections
+
+
+def suppress_duplicates(detections: Detections, iou: float = 0.5) -> Detections:
+    """Class-aware greedy NMS, used when overlapping crops see the same object."""
+    if len(detections) < 2:
+        return detections
+    overlaps = pairwise_iou(detections.boxes, detections.boxes)
+    same_class = detections.class_ids[:, None] == detections.class_ids[None, :]
+    suppressed = np.zeros(len(detections), dtype=bool)
+    keep = []
+    for i in np.argsort(-detections.confidences):
+        if suppressed[i]:
+            continue
+        keep.append(i)
+        suppressed |= (overlaps[i] > iou) & same_class[i]
+    return Detections(
+        detections.boxes[keep],
+        detections.confidences[keep],
+        detections.class_ids[keep],
+        detections.names,
+    )
+
+
+class CascadeDetector(Detector):
+    """PPE detector that only runs the full model when people are present."""
+
+    def __init__(
+        self,
+        conf: float = 0.25,
+        weights: str | None = None,
+        gate_imgsz: int = 320,
+        gate_conf: float | None = None,
+        crops: bool = False,
+        padding: float = 0.2,
+        max_crop_area: float = 0.5,
+    ):
+        super().__init__(conf, weights)
+        self.gate_imgsz = gate_imgsz
+        self.gate_conf = gate_conf  # None: the inference floor
+        self.crops = crops
+        self.padding = padding
+        self.max_crop_area = max_crop_area  # Above this share, run the full frame
+        self.person_class = next(
+            i for i, name in self.model.names.items() if name == "Person"
+        )
+        self.frames_total = 0
+        self.frames_gated = 0  # Frames where the gate found nobody
+
+    def gate(self, frame) -> np.ndarray:
+        """Person boxes (xyxy) from a low-resolution, person-only pass."""
+        kwargs = {} if self.gate_conf is None else {"conf": self.gate_conf}
+        result = self._predict(
+            frame, imgsz=self.gate_imgsz, classes=[self.person_class], **kwargs
+        )[0]
+        return result.boxes.xyxy.cpu().numpy()
+
+    def crop_regions(self, people: np.ndarray, shape) -> np.ndarray:
+        """Person boxes padded by ``padding`` and clipped to the frame."""
+        height, width = shape[:2]
+        pad = (people[:, 2:] - people[:, :2]) * self.padding
+        regions = np.hstack((people[:, :2] - pad, people[:, 2:] + pad))
+        regions = np.clip(regions, 0, [width, height, width, height])
+        return regions.astype(np.int32)
+
+    def detect_raw(self, frame) -> Detections:
+        self.frames_total += 1
+        people = self.gate(frame)
+        if len(people) == 0:
+            self.frames_gated += 1
+            return Detections.empty(self.model.names)
+        if not self.crops:
+            return super().detect_raw(frame)
+
+        regions = self.crop_regions(people, frame.shape)
+        crop_area = np.prod(regions[:, 2:] - regions[:, :2], axis=1).sum()
+        if crop_area > self.max_crop_area * frame.shape[0] * frame.shape[1]:
+            return super().detect_raw(frame)
+
+        # One batched call over all crops, boxes shifted back to the frame
+        crops = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in regions]
+        parts = [self._to_detections(result) for result in self._predict(crops)]
+        offsets = np.concatenate(
+            [np.tile(np.r_[r[:2], r[:2]], (len(p), 1)) for r, p in zip(regions, parts)]
+        ).reshape(-1, 4)
+        merged = Detections(
+            np.concatenate([p.boxes for p in parts]) + offsets,
+            np.concatenate([p.confidences for p in parts]),
+            np.concatenate([p.class_ids for p in parts]),
+            self.model.names,
+        )
+        return suppress_duplicates(merged)
+
+    def warm_up(self, runs: int = 2, imgsz: int = 640):
+        """Warm both stages; a blank frame never gets past the gate."""
+        dummy = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+        for _ in range(runs):
+            self.gate(dummy)
+            super().detect_raw(dummy)
+
+    @property
+    def gate_skip_rate(self) -> float:
+        """Share of frames that never reached the full model."""
+        return self.frames_gated / self.frames_total if self.frames_total else 0.0
+
+
+class CroppedCascadeDetector(CascadeDetector):
+    """Cascade whose second stage only sees the padded person crops."""
+
+    def __init__(self, conf: float = 0.25, weights: str | None = None, **kwargs):
+        kwargs.setdefault("crops", True)
+        super().__init__(conf, weights, **kwargs)
@@ -0,0 +1,112 @@
+"""
+Person-to-PPE association.
+
+Relates every PPE box (``Hardhat``, ``NO-Hardhat``, ``Safety Vest``, ...) to
+the person box that contains it, in one vectorised pass over a containment
+matrix, and produces one compliance record per person.
+"""
+
+import numpy as np
+
+# PPE item -> (class seen when worn, class seen when missing)
+PPE_ITEMS = {
+    "hardhat": ("Hardhat", "NO-Hardhat"),
+    "vest": ("Safety Vest", "NO-Safety Vest"),
+    "mask": ("Mask", "NO-Mask"),
+}
+
+
+def box_areas(boxes: np.ndarray) -> np.ndarray:
+    return np.clip(boxes[:, 2] - boxes[:, 0], 0, None) * np.clip(
+        boxes[:, 3] - boxes[:, 1], 0, None
+    )
+
+
+def intersection_areas(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """(N, M) matrix of intersection areas between two sets of xyxy boxes."""
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    return np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+
+
+def pairwise_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """(N, M) IoU matrix between two sets of xyxy boxes."""
+    inter = intersection_areas(a, b)
+    union = box_areas(a)[:, None] + box_areas(b)[None, :] - inter
+    return inter / np.maximum(union, 1)
+
+
+def containment(outer: np.ndarray, inner: np.ndarray) -> np.ndarray:
+    """(N, M) fraction of each inner box's area lying inside each outer box."""
+    return intersection_areas(outer, inner) / np.maximum(box_areas(inner)[None, :], 1)
+
+
+def assess_compliance(detections, conf: float = 0.0, min_overlap: float = 0.5):
+    """Build per-person compliance records from raw detections.
+
+    Each PPE box is assigned to the person box containing most of it (at
+    least ``min_overlap`` of its area). For every PPE item a person is
+    ``True`` (worn), ``False`` (missing) or ``None`` (not determined).
+    ``NO-*`` boxes that fall inside no detected person still produce a
+    record of their own so that no violation is lost.
+
+    Returns a list of dicts with ``bbox``, ``confidence``, one key per item
+    in ``PPE_ITEMS`` and ``violations`` as ``[(class_name, confidence)]``.
+    """
+    detections = detections.filter(conf)
+    names = np.array(detections.class_names(), dtype=object)
+    is_person = names == "Person"
+    person_boxes = detections.boxes[is_person]
+    item_boxes = detections.boxes[~is_person]
+    item_names = names[~is_person]
+    item_conf = detections.confidences[~is_person]
+
+    # One-hot (persons x items) assignment of each item to its best person
+    assigned = np.zeros((len(person_boxes), len(item_boxes)), dtype=bool)
+    if len(person_boxes) and len(item_boxes):
+        contained = containment(person_boxes, item_boxes)
+        best = contained.argmax(axis=0)
+        matched = contained[best, np.arange(len(item_boxes))] >= min_overlap
+        assigned[best[matched], np.flatnonzero(matched)] = True
+
+    records = []
+    for i, box in enumerate(person_boxes):
+        records.append(
+            {
+                "bbox": [int(v) for v in box],
+                "confidence": float(detections.confidences[is_person][i]),
+                "violations": [],
+            }
+        )
+
+    for item, (worn_class, missing_class) in PPE_ITEMS.items():
+        worn = np.where(assigned & (item_names == worn_class), item_conf, 0).max(
+            axis=1, initial=0
+        )
+        missing = np.where(assigned & (item_names == missing_class), item_conf, 0).max(
+            axis=1, initial=0
+        )
+        for i, record in enumerate(records):
+            if missing[i] > worn[i]:
+                record[item] = False
+                record["violations"].append((missing_class, float(missing[i])))
+            else:
+                record[item] = True if worn[i] > 0 else None
+
+    # Violations with no person around them are reported on their own
+    missing_classes = {missing: item for item, (_, missing) in PPE_ITEMS.items()}
+    orphans = ~assigned.any(axis=0) & np.isin(item_names, list(missing_classes))
+    for j in np.flatnonzero(orphans):
+        record = {
+            "bbox": [int(v) for v in item_boxes[j]],
+            "confidence": None,
+            "violations": [(item_names[j], float(item_conf[j]))],
+        }
+        for item in PPE_ITEMS:
+            record[item] = None
+        record[missing_classes[item_names[j]]] = False
+        records.append(record)
+
+    return records
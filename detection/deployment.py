@@ -0,0 +1,354 @@
+"""
+Live analysis model with a hot-swappable, shadow-evaluated candidate.
+
+A candidate weights file is loaded and warmed next to the live model. While
+it is loaded, a configurable fraction of the frames the live model analyses
+is mirrored to it on a background thread, and its latency and detections are
+compared with the live model's on exactly the same frames. Promotion swaps
+the live version under a lock: every frame analysed afterwards uses the new
+model, in-flight inferences finish on the old one, and nothing waits for a
+model load. Sources keep a private detector per model version; after a swap
+they share the warm candidate instance until their own copy has been loaded
+in the background.
+"""
+
+import queue
+import random
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+import numpy as np
+
+from .compliance import pairwise_iou
+from .ppe_detector import CONF_FLOOR
+
+LOAD_RETRY_SECONDS = 30  # Before loading a source's instance again after a failure
+
+
+def match_detections(live, candidate, iou: float = 0.5):
+    """Greedy class-aware matching; returns the IoUs of the matched pairs."""
+    if len(live) == 0 or len(candidate) == 0:
+        return np.empty(0)
+    overlaps = pairwise_iou(live.boxes, candidate.boxes)
+    overlaps[live.class_ids[:, None] != candidate.class_ids[None, :]] = 0
+    matched = []
+    while True:
+        i, j = np.unravel_index(np.argmax(overlaps), overlaps.shape)
+        if overlaps[i, j] < iou:
+            return np.array(matched)
+        matched.append(overlaps[i, j])
+        overlaps[i, :] = 0
+        overlaps[:, j] = 0
+
+
+class ShadowComparison:
+    """Latency and agreement of a candidate against the live model."""
+
+    def __init__(self, conf: float = 0.5, iou: float = 0.5, window: int = 1000):
+        self.conf = conf  # Threshold both models are compared at
+        self.iou = iou
+        self.frames = 0
+        self.live_latencies = deque(maxlen=window)
+        self.candidate_latencies = deque(maxlen=window)
+        self.matched = 0
+        self.live_only = 0
+        self.candidate_only = 0
+        self.matched_iou = 0.0
+        self.violations_agree = 0  # Frames with the same set of NO-* classes
+        self._lock = threading.Lock()
+
+    def record(self, live, candidate, live_latency: float, candidate_latency: float):
+        live = live.filter(self.conf)
+        candidate = candidate.filter(self.conf)
+        ious = match_detections(live, candidate, self.iou)
+
+        def violations(detections):
+            return {
+                detections.names[int(c)]
+                for c in detections.class_ids
+                if detections.names[int(c)].startswith("NO-")
+            }
+
+        with self._lock:
+            self.frames += 1
+            self.live_latencies.append(live_latency)
+            self.candidate_latencies.append(candidate_latency)
+            self.matched += len(ious)
+            self.live_only += len(live) - len(ious)
+            self.candidate_only += len(candidate) - len(ious)
+            self.matched_iou += float(ious.sum())
+            self.violations_agree += violations(live) == violations(candidate)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            live = np.array(self.live_latencies)
+            candidate = np.array(self.candidate_latencies)
+            boxes = 2 * self.matched + self.live_only + self.candidate_only
+
+            def latency(values):
+                if len(values) == 0:
+                    return None
+                return {
+                    "mean_ms": round(1000 * float(values.mean()), 2),
+                    "p95_ms": round(1000 * float(np.percentile(values, 95)), 2),
+                }
+
+            return {
+                "frames": self.frames,
+                "conf": self.conf,
+                "live_latency": latency(live),
+                "candidate_latency": latency(candidate),
+                "latency_ratio": (
+                    round(float(candidate.mean() / live.mean()), 3)
+                    if len(live) and live.mean() > 0
+                    else None
+                ),
+                # Dice coefficient of the two box sets: 1.0 = identical output
+                "box_agreement": round(2 * self.matched / boxes, 3) if boxes else None,
+                "matched": self.matched,
+                "live_only": self.live_only,
+                "candidate_only": self.candidate_only,
+                "mean_matched_iou": (
+                    round(self.matched_iou / self.matched, 3) if self.matched else None
+                ),
+                "violation_agreement": (
+                    round(self.violations_agree / self.frames, 3)
+                    if self.frames
+                    else None
+                ),
+            }
+
+
+class ModelVersion:
+    """One weights file and the detector instances built from it."""
+
+    def __init__(self, weights: str, generation: int):
+        self.weights = weights
+        self.generation = generation
+        self.loaded_at = time.time()
+        self.status = "loading"
+        self.error = None
+        self.shared = None  # Warm instance used for shadowing, then as a fallback
+        self.instances = {}  # {source_id: private detector}
+        self.loading = set()  # Sources whose private instance is queued or building
+        self.failed = {}  # {source_id: time.time() of the last failed load}
+
+    def as_dict(self) -> dict:
+        return {
+            "weights": self.weights,
+            "generation": self.generation,
+            "status": self.status,
+            "error": self.error,
+            "loaded_at": self.loaded_at,
+            "sources": len(self.instances),
+        }
+
+
+class ModelDeployment:
+    """The live model of one detector class, plus an optional candidate."""
+
+    def __init__(self, detector_cls, weights: str | None = None, lane=None):
+        self.detector_cls = detector_cls
+        # Context manager factory held around shadow inference, e.g. the
+        # scheduler's lanes, so mirrored frames queue behind live ones
+        self.lane = lane or nullcontext
+        self.live = ModelVersion(weights or detector_cls.DEFAULT_WEIGHTS, 1)
+        self.live.status = "live"
+        self.candidate = None
+        self.shadow_fraction = 0.0
+        self.comparison = None
+        self.promotions = []  # [{"weights", "generation", "at"}]
+        self._shadow_queue = queue.Queue(maxsize=4)
+        self._shadow_worker = None
+        self._loads = queue.Queue()  # (version, source_id) instances to build
+        self._load_worker = None
+        self._lock = threading.Lock()
+
+    @property
+    def generation(self) -> int:
+        return self.live.generation
+
+    def _build(self, weights: str):
+        detector = self.detector_cls(conf=CONF_FLOOR, weights=weights)
+        detector.warm_up()
+        return detector
+
+    def preload(self):
+        """Load and warm the live model now instead of on the first frame.
+
+        Sources then share this instance until their own copy is loaded.
+        """
+        version = self.live
+        if version.shared is not None:
+            return
+        detector = self._build(version.weights)
+        with self._lock:
+            if version.shared is None:
+                version.shared = detector
+
+    def detector_for(self, source_id: str):
+        """``(generation, detector)`` a source should use for its next frame."""
+        with self._lock:
+            version = self.live
+            detector = version.instances.get(source_id)
+            if detector is not None:
+                return version.generation, detector
+            if version.shared is not None:
+                # Preloaded or promoted model: share the warm instance meanwhile
+                failed_at = version.failed.get(source_id, 0)
+                if (
+                    source_id not in version.loading
+                    and time.time() - failed_at >= LOAD_RETRY_SECONDS
+                ):
+                    version.loading.add(source_id)
+                    self._loads.put((version, source_id))
+                    if self._load_worker is None:
+                        # One loader: after a promotion sources load in turn
+                        self._load_worker = threading.Thread(
+                            target=self._run_loads, daemon=True
+                        )
+                        self._load_worker.start()
+                return version.generation, version.shared
+
+        # The process's first model is loaded inline, on the first cache miss
+        detector = self._build(version.weights)
+        with self._lock:
+            detector = version.instances.setdefault(source_id, detector)
+        return version.generation, detector
+
+    def _run_loads(self):
+        while True:
+            version, source_id = self._loads.get()
+            # Skip loads for a model since replaced or a source since released
+            with self._lock:
+                wanted = version is self.live and source_id in version.loading
+            detector = None
+            try:
+                if wanted:
+                    detector = self._build(version.weights)
+            except Exception as e:
+                # The source keeps using the shared instance and retries later
+                print(f"Loading {version.weights} for source {source_id} failed:", e)
+                version.failed[source_id] = time.time()
+            finally:
+                with self._lock:
+                    # A source released during the load is no longer in
+                    # loading; its instance is dropped here, not leaked
+                    if (
+                        detector is not None
+                        and version is self.live
+                        and source_id in version.loading
+                    ):
+                        version.instances[source_id] = detector
+                    version.loading.discard(source_id)
+
+    def release(self, source_id: str):
+        """Forget a removed source's detector, including one still loading."""
+        with self._lock:
+            self.live.instances.pop(source_id, None)
+            self.live.loading.discard(source_id)
+            self.live.failed.pop(source_id, None)
+
+    def load_candidate(
+        self, weights: str, shadow_fraction: float = 0.1, conf: float = 0.5
+    ):
+        """Start loading ``weights`` as the candidate, replacing any previous one.
+
+        Shadow results are compared with the live model's above ``conf``.
+        """
+        version = ModelVersion(weights, self.live.generation + 1)
+        with self._lock:
+            self.candidate = version
+            self.shadow_fraction = shadow_fraction
+            self.comparison = ShadowComparison(conf)
+            if self._shadow_worker is None:
+                self._shadow_worker = threading.Thread(
+                    target=self._run_shadow, daemon=True
+                )
+                self._shadow_worker.start()
+        loader = threading.Thread(
+            target=self._load_candidate, args=(version,), daemon=True
+        )
+        loader.start()
+        return version
+
+    def _load_candidate(self, version: ModelVersion):
+        try:
+            version.shared = self._build(version.weights)
+            version.status = "ready"
+        except Exception as e:
+            version.status = "error"
+            version.error = f"{type(e).__name__}: {e}"
+
+    def discard_candidate(self) -> bool:
+        with self._lock:
+            discarded = self.candidate is not None
+            self.candidate = None
+            self.shadow_fraction = 0.0
+        return discarded
+
+    def promote(self) -> ModelVersion:
+        """Make the ready candidate live; raises ``ValueError`` otherwise."""
+        with self._lock:
+            candidate = self.candidate
+            if candidate is None or candidate.status != "ready":
+                raise ValueError("No candidate model is ready")
+            candidate.generation = self.live.generation + 1
+            candidate.status = "live"
+            self.live.status = "retired"
+            self.live = candidate
+            self.candidate = None
+            self.shadow_fraction = 0.0
+            self.promotions.append(
+                {
+                    "weights": candidate.weights,
+                    "generation": candidate.generation,
+                    "at": time.time(),
+                }
+            )
+        return candidate
+
+    def mirror(self, frame, live_detections, live_latency: float):
+        """Offer a live-analysed frame to the candidate (sampled, never blocks)."""
+        candidate = self.candidate
+        if (
+            candidate is None
+            or candidate.status != "ready"
+            or random.random() >= self.shadow_fraction
+        ):
+            return
+        try:
+            self._shadow_queue.put_nowait(
+                (candidate, frame, live_detections, live_latency)
+            )
+        except queue.Full:
+            pass  # Shadowing is best effort; the live path never waits
+
+    def _run_shadow(self):
+        while True:
+            candidate, frame, live_detections, live_latency = self._shadow_queue.get()
+            if candidate is not self.candidate:
+                continue  # Discarded or promoted meanwhile
+            try:
+                with self.lane():
+                    start = time.perf_counter()
+                    detections = candidate.shared.detect_raw(frame)
+                    latency = time.perf_counter() - start
+            except Exception as e:
+                print("Shadow inference failed:", e)
+                continue
+            self.comparison.record(live_detections, detections, live_latency, latency)
+
+    def status(self) -> dict:
+        with self._lock:
+            candidate = self.candidate
+            return {
+                "detector": self.detector_cls.__name__,
+                "live": self.live.as_dict(),
+                "candidate": candidate.as_dict() if candidate else None,
+                "shadow_fraction": self.shadow_fraction if candidate else 0.0,
+                "comparison": self.comparison.as_dict() if self.comparison else None,
+                "promotions": list(self.promotions),
+            }
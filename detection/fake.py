@@ -0,0 +1,53 @@
+"""
+Deterministic stand-in for the PPE model, for load tests and demos on boxes
+without torch or a GPU.
+
+Detections are derived from the frame contents only, so the same video
+always yields the same boxes, and every call sleeps for a fixed latency to
+mimic inference cost (``FAKE_DETECTOR_LATENCY_MS``, default 30).
+"""
+
+import os
+import time
+
+import numpy as np
+
+from .ppe_detector import CONF_FLOOR, Detector
+from .results import Detections
+
+
+class FakeDetector:
+    """Cheap, reproducible detector with the PPE model's classes."""
+
+    CLASSES = Detector.CLASSES
+    DEFAULT_WEIGHTS = __file__  # Hashed by the detection cache like real weights
+
+    def __init__(self, conf: float = 0.25, weights: str | None = None):
+        self.conf = conf
+        self.weights = self.DEFAULT_WEIGHTS if weights is None else weights
+        self.latency = float(os.getenv("FAKE_DETECTOR_LATENCY_MS", 30)) / 1000
+        self.names = dict(enumerate(self.CLASSES))
+        self._class_ids = {name: i for i, name in self.names.items()}
+
+    def detect_raw(self, frame) -> Detections:
+        time.sleep(self.latency)
+        height, width = frame.shape[:2]
+        # Coarse brightness keeps results stable across re-encodes
+        level = int(frame[::16, ::16].mean()) // 8
+
+        # One centred person, missing a hardhat on every third brightness level
+        person = [width * 0.35, height * 0.15, width * 0.65, height * 0.95]
+        head = [width * 0.44, height * 0.15, width * 0.56, height * 0.3]
+        helmet = "NO-Hardhat" if level % 3 == 0 else "Hardhat"
+        boxes = np.array([person, head])
+        confidences = np.array([0.9, 0.5 + (level % 5) / 10])
+        class_ids = np.array([self._class_ids["Person"], self._class_ids[helmet]])
+
+        detections = Detections(boxes, confidences, class_ids, self.names)
+        return detections.filter(min(self.conf, CONF_FLOOR))
+
+    def warm_up(self, runs: int = 2, imgsz: int = 640):
+        pass
+
+    def detect(self, frame):
+        return self.detect_raw(frame).filter(self.conf).to_labelled()
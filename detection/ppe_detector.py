@@ -1,11 +1,20 @@
+import threading
+
 import numpy as np
 from pathlib import Path
-from ultralytics import YOLO  # v8 predictor
+
+from .results import Detections
+from .runtime import get_runtime
+
+# Inference always runs at this floor; consumers filter upwards from here.
+CONF_FLOOR = 0.1
 
 
 class Detector:
     """YOLOv8 detector using the ppe.pt weights."""
 
+    DEFAULT_WEIGHTS = str(Path(__file__).resolve().parent / "ppe.pt")
+
     CLASSES = [
         "Hardhat",
         "Mask",
@@ -21,21 +30,42 @@ class Detector:
 
     def __init__(self, conf: float = 0.25, weights: str | None = None):
         self.conf = conf
-        self.weights = (
-            str(Path(__file__).resolve().parent / "ppe.pt")
-            if weights is None
-            else weights
-        )
+        self.weights = self.DEFAULT_WEIGHTS if weights is None else weights
+        # Imported here so that importing the package does not pull in torch
+        from ultralytics import YOLO  # v8 predictor
+
         self.model = YOLO(self.weights)
+        self._lock = threading.Lock()  # the predictor is not re-entrant
+
+    def _predict(self, source, **kwargs):
+        """Run the model on a frame or a list of frames (one batch)."""
+        get_runtime().bind_current_thread()
+        kwargs.setdefault("conf", min(self.conf, CONF_FLOOR))
+        with self._lock:
+            return self.model.predict(source=source, verbose=False, **kwargs)
+
+    def _to_detections(self, result) -> Detections:
+        boxes = result.boxes
+        if len(boxes) == 0:
+            return Detections.empty(self.model.names)
+        return Detections(
+            boxes.xyxy.cpu().numpy(),
+            boxes.conf.cpu().numpy(),
+            boxes.cls.cpu().numpy(),
+            self.model.names,
+        )
+
+    def detect_raw(self, frame) -> Detections:
+        """Run inference once at the floor threshold and keep the raw scores."""
+        return self._to_detections(self._predict(frame)[0])
+
+    def warm_up(self, runs: int = 2, imgsz: int = 640):
+        """Run dummy frames through the model so graph set-up and layer fusing
+        are paid before the first live frame."""
+        dummy = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+        for _ in range(runs):
+            self.detect_raw(dummy)
 
     def detect(self, frame):
         """Run detection on a single frame with YOLOv8."""
-        results = self.model.predict(source=frame, conf=self.conf, verbose=False)[0]
-        detections = []
-        for box in results.boxes:
-            x1, y1, x2, y2 = map(int, box.xyxy[0].tolist())
-            cls_idx = int(box.cls[0])
-            conf = float(box.conf[0])
-            label = f"{self.model.names[cls_idx]} {conf:.2f}"
-            detections.append(((x1, y1, x2, y2), label))
-        return detections
+        return self.detect_raw(frame).filter(self.conf).to_labelled()
@@ -0,0 +1,55 @@
+import numpy as np
+
+
+class Detections:
+    """Raw detections for a single frame stored as parallel NumPy arrays.
+
+    Inference runs once at a low floor threshold; every consumer then applies
+    its own confidence threshold with :meth:`filter`, which is a cheap boolean
+    mask rather than another pass through the model.
+    """
+
+    __slots__ = ("boxes", "confidences", "class_ids", "names")
+
+    def __init__(self, boxes, confidences, class_ids, names):
+        self.boxes = np.asarray(boxes, dtype=np.int32).reshape(-1, 4)
+        self.confidences = np.asarray(confidences, dtype=np.float32).reshape(-1)
+        self.class_ids = np.asarray(class_ids, dtype=np.int32).reshape(-1)
+        self.names = names  # {class_id: class_name}
+
+    @classmethod
+    def empty(cls, names):
+        return cls(np.empty((0, 4)), np.empty(0), np.empty(0), names)
+
+    def __len__(self):
+        return len(self.confidences)
+
+    def filter(self, conf: float = 0.0, classes=None):
+        """Return the subset above ``conf``, optionally limited to class names."""
+        mask = self.confidences >= conf
+        if classes is not None:
+            wanted = [i for i, n in self.names.items() if n in classes]
+            mask &= np.isin(self.class_ids, wanted)
+        return Detections(
+            self.boxes[mask], self.confidences[mask], self.class_ids[mask], self.names
+        )
+
+    def scaled(self, factor: float):
+        """Boxes rescaled by ``factor``, e.g. back to the full-size frame."""
+        return Detections(
+            np.rint(self.boxes * factor), self.confidences, self.class_ids, self.names
+        )
+
+    def class_names(self) -> list[str]:
+        return [self.names[int(i)] for i in self.class_ids]
+
+    def __iter__(self):
+        """Yield ``(box, class_name, confidence)`` tuples."""
+        for box, cls_idx, conf in zip(
+            self.boxes.tolist(), self.class_ids.tolist(), self.confidences.tolist()
+        ):
+            yield tuple(box), self.names[cls_idx], conf
+
+    def to_labelled(self):
+        """Legacy ``[((x1, y1, x2, y2), "Class 0.93"), ...]`` representation."""
+        return [(box, f"{name} {conf:.2f}") for box, name, conf in self]
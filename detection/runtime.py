@@ -0,0 +1,222 @@
+"""
+Thread budget for inference.
+
+torch, OpenCV and BLAS all default to one thread per core. Every source's
+detection thread, screening request and viewer that runs a model is a
+concurrent inference lane, so with ten sources a 16-core box ends up with
+ten pools of sixteen threads fighting over the CPU. This module owns those
+settings and splits the cores between lanes according to a policy:
+
+- ``latency``: one lane using every core
+- ``throughput``: as many lanes as possible with two threads each
+- ``balanced``: roughly sqrt(cores) threads per lane
+- ``"<lanes>x<threads>"``: an explicit split, e.g. ``"4x4"``
+- ``auto``: the best split measured by ``python -m detection.runtime``,
+  falling back to ``balanced`` until a benchmark has been run
+
+Usage from the command line:
+
+    python -m detection.runtime --frames 20
+"""
+
+import argparse
+import json
+import math
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+BENCHMARK_FILE = Path(__file__).resolve().parent / "runtime_benchmark.json"
+POLICIES = ("latency", "balanced", "throughput", "auto")
+
+
+def split_cores(cores: int, policy: str) -> tuple[int, int]:
+    """Return ``(lanes, threads_per_lane)`` for a policy on ``cores`` cores."""
+    if "x" in policy:
+        lanes, threads = (int(n) for n in policy.split("x", 1))
+        return max(1, lanes), max(1, threads)
+    if policy == "latency":
+        return 1, cores
+    if policy == "throughput":
+        threads = 2 if cores >= 4 else 1
+        return max(1, cores // threads), threads
+    if policy == "balanced":
+        threads = max(1, round(math.sqrt(cores)))
+        return max(1, cores // threads), threads
+    raise ValueError(f"Unknown thread policy: {policy}")
+
+
+def candidate_splits(cores: int) -> list[tuple[int, int]]:
+    """Splits that use every core: 1 x cores, 2 x cores/2, ... cores x 1."""
+    splits = []
+    threads = cores
+    while threads >= 1:
+        splits.append((max(1, cores // threads), threads))
+        threads //= 2
+    return splits
+
+
+class ThreadBudget:
+    """Split the machine's cores between concurrent inference lanes."""
+
+    def __init__(self, policy: str = "balanced", cores: int | None = None):
+        self.cores = cores or os.cpu_count() or 1
+        self.policy = policy
+        if policy == "auto":
+            self.lanes, self.threads_per_lane = self._benchmarked_split()
+        else:
+            self.lanes, self.threads_per_lane = split_cores(self.cores, policy)
+        self._process_applied = False
+        self._torch_applied = False
+
+    def _benchmarked_split(self) -> tuple[int, int]:
+        if BENCHMARK_FILE.exists():
+            with open(BENCHMARK_FILE) as f:
+                result = json.load(f)
+            if result.get("cores") == self.cores:
+                best = result["best"]
+                return best["lanes"], best["threads"]
+        return split_cores(self.cores, "balanced")
+
+    def apply_process_settings(self):
+        """Set the process-wide thread knobs (environment, OpenCV, torch)."""
+        if self._process_applied:
+            return
+        self._process_applied = True
+
+        # Only honoured by libraries loaded after this point (torch is lazy)
+        for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+            os.environ.setdefault(var, str(self.threads_per_lane))
+
+        try:
+            import cv2
+
+            cv2.setNumThreads(self.threads_per_lane)
+        except ImportError:
+            pass
+
+    def bind_current_thread(self):
+        """Apply torch's thread limits before the calling thread's inference.
+
+        Called by detectors right before inference, by which point torch has
+        been imported by the model anyway. torch's intra-op thread count is
+        process-wide, not per thread: it is set once to ``threads_per_lane``,
+        which every lane shares, so sources are not isolated from each other
+        and only the number of concurrent lanes keeps the total within the
+        cores.
+        """
+        if self._torch_applied:
+            return
+        self.apply_process_settings()
+        try:
+            import torch
+        except ImportError:
+            return
+
+        with _runtime_lock:
+            if self._torch_applied:
+                return
+            self._torch_applied = True
+            try:
+                torch.set_num_interop_threads(1)
+            except RuntimeError:
+                pass  # Inter-op pool already started, keep its size
+            torch.set_num_threads(self.threads_per_lane)
+
+    def as_dict(self) -> dict:
+        return {
+            "policy": self.policy,
+            "cores": self.cores,
+            "lanes": self.lanes,
+            "threads_per_lane": self.threads_per_lane,
+        }
+
+
+def benchmark(detector_factory, cores=None, frames=20, imgsz=640, splits=None):
+    """Measure inference throughput for each lanes x threads split.
+
+    ``detector_factory`` builds one detector per lane. Returns results sorted
+    from highest to lowest throughput.
+    """
+    import torch
+
+    cores = cores or os.cpu_count() or 1
+    frame = np.random.randint(0, 255, (imgsz, imgsz, 3), dtype=np.uint8)
+    results = []
+
+    for lanes, threads in splits or candidate_splits(cores):
+        detectors = [detector_factory() for _ in range(lanes)]
+        barrier = threading.Barrier(lanes + 1)
+        latencies = []
+
+        def run_lane(detector):
+            detector.detect_raw(frame)  # warm-up outside the timed section
+            torch.set_num_threads(threads)  # after the runtime's own binding
+            barrier.wait()
+            for _ in range(frames):
+                start = time.time()
+                detector.detect_raw(frame)
+                latencies.append(time.time() - start)
+
+        workers = [
+            threading.Thread(target=run_lane, args=(d,), daemon=True) for d in detectors
+        ]
+        for worker in workers:
+            worker.start()
+        barrier.wait()
+        started = time.time()
+        for worker in workers:
+            worker.join()
+        elapsed = time.time() - started
+
+        results.append(
+            {
+                "lanes": lanes,
+                "threads": threads,
+                "throughput_fps": round(lanes * frames / elapsed, 2),
+                "latency_ms": round(1000 * sum(latencies) / len(latencies), 1),
+            }
+        )
+        print(f"{lanes} lanes x {threads} threads: {results[-1]}")
+
+    return sorted(results, key=lambda r: r["throughput_fps"], reverse=True)
+
+
+_runtime = None
+_runtime_lock = threading.Lock()
+
+
+def configure_runtime(policy: str = "balanced", cores: int | None = None) -> ThreadBudget:
+    """Install the process-wide thread budget."""
+    global _runtime
+    with _runtime_lock:
+        _runtime = ThreadBudget(policy, cores)
+        _runtime.apply_process_settings()
+        return _runtime
+
+
+def get_runtime() -> ThreadBudget:
+    """Return the installed thread budget, defaulting to ``balanced``."""
+    global _runtime
+    with _runtime_lock:
+        if _runtime is None:
+            _runtime = ThreadBudget()
+        return _runtime
+
+
+if __name__ == "__main__":
+    from .ppe_detector import Detector
+
+    parser = argparse.ArgumentParser(description="Benchmark lanes x threads splits")
+    parser.add_argument("--frames", type=int, default=20, help="frames per lane")
+    parser.add_argument("--imgsz", type=int, default=640, help="dummy frame size")
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    ranked = benchmark(Detector, cores=cores, frames=args.frames, imgsz=args.imgsz)
+    with open(BENCHMARK_FILE, "w") as f:
+        json.dump({"cores": cores, "best": ranked[0], "results": ranked}, f, indent=2)
+    print(f"Best split: {ranked[0]['lanes']} lanes x {ranked[0]['threads']} threads")
@@ -0,0 +1,160 @@
+"""
+Violation episodes.
+
+A violation that stays in view for thirty seconds is one incident, not one
+event per analysed frame. :class:`EpisodeBuilder` coalesces the per-frame
+violations of a source into episodes, one per violation type, with debounce
+windows on both ends:
+
+- an episode starts once a violation has been seen on ``start_hits``
+  analysed frames without an ending gap in between, so single-frame false
+  positives never surface
+- it ends once the violation has been absent for ``end_window`` seconds and
+  at least ``end_misses`` analysed frames, so a slowly scheduled source does
+  not split one incident into many
+
+Each transition is reported as ``episode_started``, ``episode_updated``
+(only when the peak confidence improves, at most every ``update_interval``
+seconds) or ``episode_ended``.
+"""
+
+import uuid
+from datetime import datetime
+
+
+class Episode:
+    """One continuous violation of a single type on a single source."""
+
+    def __init__(self, source_id: str, violation_type: str, started_at: datetime):
+        self.id = uuid.uuid4().hex[:12]
+        self.source_id = source_id
+        self.violation_type = violation_type
+        self.started_at = started_at
+        self.last_seen = started_at
+        self.ended_at = None
+        self.started = False  # False while still inside the start debounce
+        self.hits = 0  # Analysed frames with this violation
+        self.misses = 0  # Consecutive analysed frames without it
+        self.first_frame = None
+        self.peak_confidence = 0.0
+        self.peak_frame = None  # Frame number of the peak
+        self.bbox = None  # Box at the peak, in best_frame pixels
+        self.best_frame = None  # Image at the peak (not serialised)
+        self.best_frame_dirty = False  # Peak image changed since it was saved
+        self.best_frame_url = None
+        self.best_frame_thumbnail = None
+        self.clip_url = None  # Pre/post-event clip, once encoded
+        self.clip_offset = None  # Seconds into the clip where the episode starts
+        self.last_reported = None  # When the last event was emitted
+        self.reported_peak = 0.0  # Peak confidence carried by that event
+
+    @property
+    def duration(self) -> float:
+        return ((self.ended_at or self.last_seen) - self.started_at).total_seconds()
+
+    def observe(self, timestamp, frame_number, confidence, bbox, frame):
+        self.hits += 1
+        self.misses = 0
+        self.last_seen = timestamp
+        if self.first_frame is None:
+            self.first_frame = frame_number
+        if confidence > self.peak_confidence:
+            self.peak_confidence = confidence
+            self.peak_frame = frame_number
+            self.bbox = bbox
+            self.best_frame = frame
+            self.best_frame_dirty = True
+
+    def as_dict(self) -> dict:
+        return {
+            "event_id": self.id,
+            "source_id": self.source_id,
+            "violation_type": self.violation_type,
+            "timestamp": self.started_at.isoformat(),
+            "last_seen": self.last_seen.isoformat(),
+            "ended_at": self.ended_at.isoformat() if self.ended_at else None,
+            "duration": round(self.duration, 1),
+            "frames": self.hits,
+            "confidence": self.peak_confidence,
+            "frame_number": self.peak_frame,
+            "first_frame": self.first_frame,
+            "bbox": self.bbox,
+            "best_frame": self.best_frame_url,
+            "thumbnail": self.best_frame_thumbnail,
+            "clip": self.clip_url,
+            "clip_offset": self.clip_offset,
+            "status": "ended" if self.ended_at else "active",
+        }
+
+
+class EpisodeBuilder:
+    """Turn one source's per-frame violations into episode events."""
+
+    def __init__(
+        self,
+        source_id: str,
+        start_hits: int = 2,
+        end_window: float = 3.0,
+        end_misses: int = 2,
+        update_interval: float = 10.0,
+    ):
+        self.source_id = source_id
+        self.start_hits = start_hits
+        self.end_window = end_window
+        self.end_misses = end_misses
+        self.update_interval = update_interval
+        self.open = {}  # {violation_type: Episode}, including unconfirmed ones
+
+    def observe(self, timestamp, frame_number, violations, frame=None):
+        """Feed one analysed frame.
+
+        ``violations`` maps each violation type seen on the frame to
+        ``(confidence, bbox)``. Returns a list of ``(event_type, Episode)``.
+        """
+        events = []
+        for violation_type, (confidence, bbox) in violations.items():
+            episode = self.open.get(violation_type)
+            if episode is None:
+                episode = Episode(self.source_id, violation_type, timestamp)
+                self.open[violation_type] = episode
+            episode.observe(timestamp, frame_number, confidence, bbox, frame)
+
+            if not episode.started:
+                if episode.hits >= self.start_hits:
+                    episode.started = True
+                    self._reported(episode, timestamp)
+                    events.append(("episode_started", episode))
+            elif episode.peak_confidence > episode.reported_peak and (
+                (timestamp - episode.last_reported).total_seconds()
+                >= self.update_interval
+            ):
+                self._reported(episode, timestamp)
+                events.append(("episode_updated", episode))
+
+        for violation_type, episode in list(self.open.items()):
+            if violation_type in violations:
+                continue
+            episode.misses += 1
+            gap = (timestamp - episode.last_seen).total_seconds()
+            if episode.misses >= self.end_misses and gap >= self.end_window:
+                events.extend(self._close(violation_type))
+        return events
+
+    @staticmethod
+    def _reported(episode, timestamp):
+        episode.last_reported = timestamp
+        episode.reported_peak = episode.peak_confidence
+
+    def close_all(self):
+        """End every open episode, e.g. when the source stops."""
+        events = []
+        for violation_type in list(self.open):
+            events.extend(self._close(violation_type))
+        return events
+
+    def _close(self, violation_type):
+        episode = self.open.pop(violation_type)
+        if not episode.started:
+            return []  # Never confirmed, nothing was reported
+        episode.ended_at = episode.last_seen
+        return [("episode_ended", episode)]
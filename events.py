@@ -0,0 +1,217 @@
+"""
+Real-time event distribution and dashboard statistics.
+
+Events are fanned out to every connected Server-Sent Events client instead of
+being pulled off a single shared queue, and dashboard aggregates are kept up to
+date at write time so that a stats snapshot costs the same no matter how many
+sources or dashboards are open.
+"""
+
+import asyncio
+import queue
+import threading
+import time
+
+
+class EventBroadcaster:
+    """Publish events to every subscriber queue."""
+
+    def __init__(self, maxsize: int = 1000):
+        self.maxsize = maxsize
+        self._subscribers = set()
+        self._async_subscribers = {}  # {asyncio.Queue: event loop}
+        self._lock = threading.Lock()
+        self.published = 0  # Events published
+        self.dropped = 0  # Deliveries skipped because a subscriber was full
+
+    def subscribe(self) -> queue.Queue:
+        """Register a new subscriber and return its queue."""
+        q = queue.Queue(maxsize=self.maxsize)
+        with self._lock:
+            self._subscribers.add(q)
+        return q
+
+    def subscribe_async(self) -> asyncio.Queue:
+        """Register a subscriber living on the running event loop."""
+        q = asyncio.Queue(maxsize=self.maxsize)
+        with self._lock:
+            self._async_subscribers[q] = asyncio.get_running_loop()
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+            self._async_subscribers.pop(q, None)
+
+    def publish(self, event_type: str, data: dict):
+        """Push an event to all subscribers, dropping it for slow consumers."""
+        with self._lock:
+            self.published += 1
+            subscribers = list(self._subscribers)
+            async_subscribers = list(self._async_subscribers.items())
+        dropped = 0
+        for q in subscribers:
+            try:
+                q.put_nowait((event_type, data))
+            except queue.Full:
+                dropped += 1
+        for q, loop in async_subscribers:
+            loop.call_soon_threadsafe(self._put_async, q, (event_type, data))
+        if dropped:
+            self._count_dropped(dropped)
+
+    def _put_async(self, q: asyncio.Queue, item):
+        try:
+            q.put_nowait(item)
+        except asyncio.QueueFull:
+            self._count_dropped(1)
+
+    def _count_dropped(self, count: int):
+        # Publishers and event loops count from different threads
+        with self._lock:
+            self.dropped += count
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers) + len(self._async_subscribers)
+
+
+class DashboardStats:
+    """Incrementally maintained per-source counters and global rollups."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sources = {}  # {source_id: SourceInfo}
+        self.active_sources = 0
+        self.total_violations = 0
+        self.total_frames = 0
+        self.frames_with_violations = 0
+        self.people_checked = 0
+        self.people_compliant = 0
+        self.last_detection = None
+        self.latest = None  # Most recent published snapshot
+        self._ticker = None
+
+    def register_source(self, source):
+        with self._lock:
+            self._sources[source.id] = source
+            if source.status == "active":
+                self.active_sources += 1
+            self.total_violations += sum(source.violation_counts.values())
+            self.total_frames += source.total_frames_processed
+            self.frames_with_violations += source.frames_with_violations
+            self.people_checked += source.people_checked
+            self.people_compliant += source.people_compliant
+            if source.last_detection and (
+                self.last_detection is None or source.last_detection > self.last_detection
+            ):
+                self.last_detection = source.last_detection
+
+    def unregister_source(self, source):
+        """Remove a source's contribution from the rollups."""
+        with self._lock:
+            if self._sources.pop(source.id, None) is None:
+                return
+            if source.status == "active":
+                self.active_sources -= 1
+            self.total_violations -= sum(source.violation_counts.values())
+            self.total_frames -= source.total_frames_processed
+            self.frames_with_violations -= source.frames_with_violations
+            self.people_checked -= source.people_checked
+            self.people_compliant -= source.people_compliant
+            if source.last_detection and source.last_detection == self.last_detection:
+                # Rare path: only a removal can lower the global maximum
+                remaining = [
+                    s.last_detection for s in self._sources.values() if s.last_detection
+                ]
+                self.last_detection = max(remaining) if remaining else None
+
+    def status_changed(self, source, old_status, new_status):
+        with self._lock:
+            if source.id not in self._sources or old_status == new_status:
+                return
+            if old_status == "active":
+                self.active_sources -= 1
+            elif new_status == "active":
+                self.active_sources += 1
+
+    def record_frame(self, source, has_violation: bool, people=()):
+        """Count an analysed frame and its per-person compliance records."""
+        # Records without a person confidence are orphan violations
+        checked = sum(1 for p in people if p["confidence"] is not None)
+        compliant = sum(
+            1 for p in people if p["confidence"] is not None and not p["violations"]
+        )
+        with self._lock:
+            source.total_frames_processed += 1
+            source.people_checked += checked
+            source.people_compliant += compliant
+            if has_violation:
+                source.frames_with_violations += 1
+            if source.id in self._sources:
+                self.total_frames += 1
+                self.people_checked += checked
+                self.people_compliant += compliant
+                if has_violation:
+                    self.frames_with_violations += 1
+
+    def record_violation(self, source, violation_class: str, timestamp):
+        with self._lock:
+            source.violation_counts[violation_class] = (
+                source.violation_counts.get(violation_class, 0) + 1
+            )
+            source.last_detection = timestamp
+            if source.id in self._sources:
+                self.total_violations += 1
+                if self.last_detection is None or timestamp > self.last_detection:
+                    self.last_detection = timestamp
+
+    def snapshot(self) -> dict:
+        """Build the stats payload from the rollups in constant time."""
+        with self._lock:
+            if self.total_frames > 0:
+                compliance_rate = (
+                    (self.total_frames - self.frames_with_violations) / self.total_frames
+                ) * 100
+            else:
+                compliance_rate = 100
+            if self.people_checked > 0:
+                person_compliance_rate = (
+                    self.people_compliant / self.people_checked
+                ) * 100
+            else:
+                person_compliance_rate = 100
+            return {
+                "active_sources": self.active_sources,
+                "active_violations": self.total_violations,
+                "compliance_rate": compliance_rate,
+                "person_compliance_rate": person_compliance_rate,
+                "last_detection": (
+                    self.last_detection.isoformat() if self.last_detection else None
+                ),
+                # Raw counts, so that snapshots of several nodes can be merged
+                "total_frames": self.total_frames,
+                "frames_with_violations": self.frames_with_violations,
+                "people_checked": self.people_checked,
+                "people_compliant": self.people_compliant,
+            }
+
+    def start_publishing(self, broadcaster: EventBroadcaster, interval: float = 5.0):
+        """Publish one snapshot per tick to every subscriber (idempotent)."""
+        with self._lock:
+            if self._ticker is not None:
+                return
+            self._ticker = threading.Thread(
+                target=self._publish_loop, args=(broadcaster, interval), daemon=True
+            )
+        self.latest = self.snapshot()
+        self._ticker.start()
+
+    def _publish_loop(self, broadcaster: EventBroadcaster, interval: float):
+        while True:
+            time.sleep(interval)
+            if broadcaster.subscriber_count == 0:
+                continue
+            self.latest = self.snapshot()
+            broadcaster.publish("stats", self.latest)
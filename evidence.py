@@ -0,0 +1,449 @@
+"""
+Violation evidence store.
+
+Best frames, alert snapshots and clips are stored under content-addressed
+names (a hash of their bytes), so two snapshots taken in the same second
+never collide and identical images, such as an episode's best frame and the
+snapshot attached to its alert email, are written once. Files are spread
+over 256 subdirectories by the first two hex digits of their name.
+
+:meth:`EvidenceStore.put` only encodes and hashes the image, which gives its
+URL at once; writing the file, producing the thumbnail and updating the
+index happen on a background thread. Until it is on disk the image is served
+from memory. The index is a SQLite database of what was stored for which
+source and event, and when, so lookups never scan the directory. Retention
+deletes evidence older than ``max_age`` and then, oldest first, whatever
+exceeds ``max_bytes``; a file is removed once no index entry refers to it.
+"""
+
+import hashlib
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+
+import cv2
+import numpy as np
+
+NAME_PATTERN = re.compile(r"^[0-9a-f]{32}(\.thumb)?\.(jpg|webm|mp4)$")
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    name TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    thumb_size INTEGER NOT NULL DEFAULT 0,
+    stored_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS evidence (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    source_id TEXT,
+    event_id TEXT,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS evidence_source ON evidence (source_id, created);
+CREATE INDEX IF NOT EXISTS evidence_event ON evidence (event_id);
+CREATE INDEX IF NOT EXISTS evidence_created ON evidence (created);
+CREATE INDEX IF NOT EXISTS evidence_name ON evidence (name);
+"""
+RETENTION_INTERVAL = 600  # Seconds between age checks while idle
+
+
+def content_name(data: bytes, ext: str) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest() + ext
+
+
+class Evidence:
+    """A stored (or about to be stored) file and the URLs it is served from."""
+
+    __slots__ = ("name", "url", "thumbnail", "data")
+
+    def __init__(self, name: str, url: str, thumbnail: str | None, data=None):
+        self.name = name
+        self.url = url
+        self.thumbnail = thumbnail
+        self.data = data  # Encoded bytes, for attaching without a re-read
+
+
+class EvidenceStore:
+    """Content-addressed evidence files with a SQLite index and retention."""
+
+    def __init__(
+        self,
+        directory: str = "evidence",
+        url_prefix: str = "/evidence",
+        max_age: float = 30 * 86400,
+        max_bytes: float = 5 * 2**30,
+        thumb_width: int = 320,
+        quality: int = 90,
+        max_pending: int = 256,
+    ):
+        self.directory = directory
+        self.url_prefix = url_prefix
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.thumb_width = thumb_width
+        self.quality = quality
+        self.bytes = 0  # Files and thumbnails on disk
+        self.stored = 0
+        self.deduplicated = 0
+        self.dropped = 0  # Items refused because the writer was too far behind
+        self.deleted = 0
+        self._jobs = queue.Queue(maxsize=max_pending)
+        self._pending = {}  # {name: bytes or path} not yet in the store
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._worker = None
+
+    # Paths and URLs
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name[:2], name)
+
+    def thumb_name(self, name: str) -> str | None:
+        digest, ext = os.path.splitext(name)
+        return f"{digest}.thumb.jpg" if ext == ".jpg" else None
+
+    def _record(self, name: str, data=None) -> Evidence:
+        thumb = self.thumb_name(name)
+        return Evidence(
+            name,
+            f"{self.url_prefix}/{name}",
+            f"{self.url_prefix}/{thumb}" if thumb else None,
+            data,
+        )
+
+    # Writing
+
+    def put(
+        self,
+        image,
+        source_id: str | None,
+        event_id: str | None,
+        kind: str,
+        timestamp: float | None = None,
+    ) -> Evidence | None:
+        """Queue a frame (BGR array or JPEG bytes); returns None if dropped.
+
+        Only the JPEG encode and hash run on the caller's thread.
+        """
+        width = None
+        if isinstance(image, np.ndarray):
+            width = image.shape[1]
+            _, buffer = cv2.imencode(
+                ".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.quality]
+            )
+            image = buffer.tobytes()
+        name = content_name(image, ".jpg")
+        job = (name, image, width, source_id, event_id, kind, timestamp or time.time())
+        if not self._submit(name, image, job):
+            return None
+        return self._record(name, image)
+
+    def put_file(
+        self,
+        path: str,
+        source_id: str | None,
+        event_id: str | None,
+        kind: str,
+        timestamp: float | None = None,
+    ) -> Evidence:
+        """Move a finished file (e.g. a clip) into the store in the background."""
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        name = digest.hexdigest() + os.path.splitext(path)[1]
+        job = (name, path, None, source_id, event_id, kind, timestamp or time.time())
+        # Files are already on disk, so they are never dropped
+        with self._lock:
+            self._pending.setdefault(name, path)
+            self._start()
+        self._jobs.put(job)
+        return self._record(name)
+
+    def _submit(self, name, data, job) -> bool:
+        with self._lock:
+            self._start()
+            try:
+                self._jobs.put_nowait(job)
+            except queue.Full:
+                self.dropped += 1
+                return False
+            self._pending.setdefault(name, data)
+        return True
+
+    def _start(self):
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, daemon=True)
+            self._worker.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        with self._db_lock:
+            if self._db is None:
+                os.makedirs(self.directory, exist_ok=True)
+                db = sqlite3.connect(
+                    os.path.join(self.directory, "index.db"),
+                    check_same_thread=False,
+                    isolation_level=None,
+                )
+                db.execute("PRAGMA journal_mode=WAL")
+                db.executescript(SCHEMA)
+                self.bytes = db.execute(
+                    "SELECT COALESCE(SUM(size + thumb_size), 0) FROM blobs"
+                ).fetchone()[0]
+                self._db = db
+            return self._db
+
+    def _run(self):
+        self._connect()
+        last_retention = 0.0
+        while True:
+            try:
+                jobs = [self._jobs.get(timeout=RETENTION_INTERVAL)]
+            except queue.Empty:
+                jobs = []
+            while len(jobs) < 64:
+                try:
+                    jobs.append(self._jobs.get_nowait())
+                except queue.Empty:
+                    break
+            for job in jobs:
+                try:
+                    self._store(*job)
+                except Exception as e:
+                    print(f"Storing evidence {job[0]} failed:", e)
+                finally:
+                    with self._lock:
+                        self._pending.pop(job[0], None)
+            now = time.time()
+            if (
+                self.bytes > self.max_bytes
+                or now - last_retention > RETENTION_INTERVAL
+            ):
+                try:
+                    self.enforce_retention(now)
+                except Exception as e:
+                    print("Evidence retention failed:", e)
+                last_retention = now
+
+    def _store(self, name, data, width, source_id, event_id, kind, created):
+        db = self._connect()
+        with self._db_lock:
+            exists = db.execute(
+                "SELECT 1 FROM blobs WHERE name = ?", (name,)
+            ).fetchone()
+        if exists:
+            self.deduplicated += 1
+            if isinstance(data, str):
+                os.remove(data)  # The same file is stored already
+        else:
+            path = self.path(name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if isinstance(data, str):
+                os.replace(data, path)  # A finished file from put_file
+                size = os.path.getsize(path)
+            else:
+                write_atomic(path, data)
+                size = len(data)
+            thumb_size = self._write_thumbnail(name, data, width)
+            with self._db_lock:
+                db.execute(
+                    "INSERT OR IGNORE INTO blobs VALUES (?, ?, ?, ?)",
+                    (name, size, thumb_size, time.time()),
+                )
+            self.bytes += size + thumb_size
+            self.stored += 1
+
+        superseded = []
+        with self._db_lock:
+            if kind == "best_frame" and event_id is not None:
+                # An episode keeps only its latest best frame
+                superseded = db.execute(
+                    "SELECT name FROM evidence WHERE event_id = ? AND kind = ?",
+                    (event_id, kind),
+                ).fetchall()
+                db.execute(
+                    "DELETE FROM evidence WHERE event_id = ? AND kind = ?",
+                    (event_id, kind),
+                )
+            db.execute(
+                "INSERT INTO evidence (name, kind, source_id, event_id, created)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (name, kind, source_id, event_id, created),
+            )
+        if superseded:
+            self._delete_unreferenced([old for (old,) in superseded])
+
+    def _write_thumbnail(self, name, data, width) -> int:
+        thumb = self.thumb_name(name)
+        if thumb is None or isinstance(data, str):
+            return 0
+        # Let libjpeg decode at 1/2, 1/4 or 1/8 scale when the thumbnail allows
+        flags = cv2.IMREAD_COLOR
+        for factor, reduced in (
+            (8, cv2.IMREAD_REDUCED_COLOR_8),
+            (4, cv2.IMREAD_REDUCED_COLOR_4),
+            (2, cv2.IMREAD_REDUCED_COLOR_2),
+        ):
+            if width and width // factor >= self.thumb_width:
+                flags = reduced
+                break
+        image = cv2.imdecode(np.frombuffer(data, np.uint8), flags)
+        if image is None:
+            return 0
+        if image.shape[1] > self.thumb_width:
+            height = round(image.shape[0] * self.thumb_width / image.shape[1])
+            image = cv2.resize(
+                image, (self.thumb_width, height), interpolation=cv2.INTER_AREA
+            )
+        _, buffer = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 80])
+        write_atomic(self.path(thumb), buffer.tobytes())
+        return len(buffer)
+
+    # Retention
+
+    def enforce_retention(self, now: float | None = None):
+        """Drop evidence older than ``max_age``, then the oldest over ``max_bytes``."""
+        db = self._connect()
+        now = time.time() if now is None else now
+        if self.max_age:
+            with self._db_lock:
+                cutoff = now - self.max_age
+                db.execute("DELETE FROM evidence WHERE created < ?", (cutoff,))
+            self._delete_unreferenced()
+        while self.max_bytes and self.bytes > self.max_bytes:
+            excess = self.bytes - self.max_bytes
+            with self._db_lock:
+                # Oldest first, just enough records to cover the excess
+                oldest = db.execute(
+                    "SELECT evidence.id, blobs.size + blobs.thumb_size"
+                    " FROM evidence JOIN blobs ON blobs.name = evidence.name"
+                    " ORDER BY evidence.created LIMIT 100"
+                ).fetchall()
+                ids = []
+                for record_id, size in oldest:
+                    ids.append((record_id,))
+                    excess -= size
+                    if excess <= 0:
+                        break
+                db.executemany("DELETE FROM evidence WHERE id = ?", ids)
+            freed = self._delete_unreferenced()
+            if not ids and not freed:
+                break
+
+    def _delete_unreferenced(self, names=None) -> int:
+        """Remove files no index entry refers to; returns how many.
+
+        Only ``names`` are considered when given, otherwise every file.
+        """
+        query = (
+            "SELECT name, size, thumb_size FROM blobs WHERE NOT EXISTS"
+            " (SELECT 1 FROM evidence WHERE evidence.name = blobs.name)"
+        )
+        params = []
+        if names is not None:
+            query += f" AND name IN ({', '.join('?' * len(names))})"
+            params = list(names)
+        db = self._connect()
+        with self._db_lock:
+            orphans = db.execute(query, params).fetchall()
+            db.executemany(
+                "DELETE FROM blobs WHERE name = ?", [(name,) for name, _, _ in orphans]
+            )
+        for name, size, thumb_size in orphans:
+            for file_name in (name, self.thumb_name(name)):
+                if file_name is None:
+                    continue
+                try:
+                    os.remove(self.path(file_name))
+                except FileNotFoundError:
+                    pass
+            self.bytes -= size + thumb_size
+            self.deleted += 1
+        return len(orphans)
+
+    # Reading
+
+    def open(self, name: str):
+        """``bytes`` or a file path for ``name``, or None if unknown."""
+        if not NAME_PATTERN.match(name):
+            return None
+        with self._lock:
+            pending = self._pending.get(name)
+        if pending is not None:
+            return pending
+        path = self.path(name)
+        return path if os.path.isfile(path) else None
+
+    def find(
+        self,
+        source_id: str | None = None,
+        event_id: str | None = None,
+        kind: str | None = None,
+        since: float | None = None,
+        until: float | None = None,
+        limit: int = 100,
+    ) -> list:
+        """Index entries matching all the given filters, newest first."""
+        clauses, params = [], []
+        for column, op, value in (
+            ("source_id", "=", source_id),
+            ("event_id", "=", event_id),
+            ("kind", "=", kind),
+            ("created", ">=", since),
+            ("created", "<", until),
+        ):
+            if value is not None:
+                clauses.append(f"e.{column} {op} ?")
+                params.append(value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        db = self._connect()
+        with self._db_lock:
+            rows = db.execute(
+                "SELECT e.name, e.kind, e.source_id, e.event_id, e.created, b.size"
+                f" FROM evidence e LEFT JOIN blobs b ON b.name = e.name {where}"
+                " ORDER BY e.created DESC LIMIT ?",
+                params + [limit],
+            ).fetchall()
+        items = []
+        for name, kind, source, event, created, size in rows:
+            record = self._record(name)
+            items.append(
+                {
+                    "name": name,
+                    "url": record.url,
+                    "thumbnail": record.thumbnail,
+                    "kind": kind,
+                    "source_id": source,
+                    "event_id": event,
+                    "time": created,
+                    "size": size,
+                }
+            )
+        return items
+
+    def status(self) -> dict:
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "max_age_days": round(self.max_age / 86400, 2) if self.max_age else None,
+            "pending": pending,
+            "stored": self.stored,
+            "deduplicated": self.deduplicated,
+            "dropped": self.dropped,
+            "deleted": self.deleted,
+        }
+
+
+def write_atomic(path: str, data: bytes):
+    """Write ``data`` so that readers never see a partial file."""
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
@@ -0,0 +1,140 @@
+"""
+Per-source violation heatmaps.
+
+Every source accumulates the boxes of people with a PPE violation on a coarse
+grid over the frame (64 x 36 cells by default). A cell counts the analysed
+frames in which a violating person covered it. Two views are kept:
+
+- fixed time buckets (hourly by default) holding raw counts, so any recent
+  hour can be inspected on its own or summed;
+- a decayed grid with a configurable half-life showing where violations have
+  been happening lately.
+
+An update is a handful of vectorised operations on the small grid, a few
+microseconds regardless of box size or count, so it runs for every analysed
+frame.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+class ViolationHeatmap:
+    """Time-bucketed and time-decayed grids of violation coverage."""
+
+    def __init__(
+        self,
+        cols: int = 64,
+        rows: int = 36,
+        bucket_seconds: float = 3600,
+        buckets: int = 24,
+        half_life: float = 3600,
+    ):
+        self.shape = (rows, cols)
+        self.bucket_seconds = bucket_seconds
+        self.max_buckets = buckets
+        self.half_life = half_life
+        self._buckets = OrderedDict()  # {bucket start: grid}
+        self._decayed = np.zeros(self.shape, dtype=np.float32)
+        self._decayed_at = time.time()
+        self._rows = np.arange(rows)
+        self._cols = np.arange(cols)
+        self._lock = threading.Lock()
+
+    def bucket_start(self, timestamp: float) -> int:
+        return int(timestamp // self.bucket_seconds * self.bucket_seconds)
+
+    def footprint(self, boxes, frame_width: int, frame_height: int) -> np.ndarray:
+        """Number of ``boxes`` (xyxy, frame pixels) covering each grid cell.
+
+        A box covers the outer product of its row and column ranges, so all
+        boxes together reduce to one small (rows x n) @ (n x cols) product.
+        """
+        rows, cols = self.shape
+        scaled = np.asarray(boxes, dtype=np.float32).reshape(-1, 4) * np.array(
+            [cols / frame_width, rows / frame_height] * 2, dtype=np.float32
+        )
+        low = scaled[:, :2].astype(np.intp)
+        high = np.maximum(np.ceil(scaled[:, 2:]).astype(np.intp), low + 1)
+        in_cols = (self._cols >= low[:, :1]) & (self._cols < high[:, :1])
+        in_rows = (self._rows >= low[:, 1:]) & (self._rows < high[:, 1:])
+        return in_rows.T.astype(np.float32) @ in_cols.astype(np.float32)
+
+    def add(self, boxes, frame_width: int, frame_height: int, timestamp=None):
+        """Accumulate the violation boxes of one analysed frame."""
+        if len(boxes) == 0 or not frame_width or not frame_height:
+            return
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            covered = self.footprint(boxes, frame_width, frame_height)
+
+            start = self.bucket_start(timestamp)
+            grid = self._buckets.get(start)
+            if grid is None:
+                grid = self._buckets[start] = np.zeros(self.shape, dtype=np.float32)
+                while len(self._buckets) > self.max_buckets:
+                    self._buckets.popitem(last=False)
+            grid += covered
+
+            self._decayed *= self._decay(timestamp)
+            self._decayed_at = max(self._decayed_at, timestamp)
+            self._decayed += covered
+
+    def _decay(self, timestamp: float) -> float:
+        elapsed = max(0.0, timestamp - self._decayed_at)
+        return 0.5 ** (elapsed / self.half_life) if self.half_life else 1.0
+
+    def decayed(self) -> np.ndarray:
+        """The decayed grid as of now."""
+        with self._lock:
+            return self._decayed * self._decay(time.time())
+
+    def bucket(self, timestamp: float) -> np.ndarray | None:
+        """Counts of the bucket containing ``timestamp``, or None if not kept."""
+        with self._lock:
+            grid = self._buckets.get(self.bucket_start(timestamp))
+            return None if grid is None else grid.copy()
+
+    def total(self) -> np.ndarray:
+        """Counts summed over every kept bucket."""
+        with self._lock:
+            return sum(self._buckets.values(), np.zeros(self.shape, np.float32))
+
+    def buckets(self) -> list:
+        """``[{"start", "end", "total"}]`` of the kept buckets, oldest first."""
+        with self._lock:
+            return [
+                {
+                    "start": start,
+                    "end": int(start + self.bucket_seconds),
+                    "total": round(float(grid.sum()), 1),
+                }
+                for start, grid in self._buckets.items()
+            ]
+
+    @property
+    def size_bytes(self) -> int:
+        return (len(self._buckets) + 1) * self._decayed.nbytes
+
+
+def render_heatmap(grid: np.ndarray, width: int, height: int, background=None):
+    """Colour-map a grid to a ``width`` x ``height`` BGR image.
+
+    With a ``background`` frame the heat is blended over it, weighted by
+    intensity so cold areas stay visible.
+    """
+    peak = float(grid.max())
+    normalised = grid / peak if peak > 0 else grid
+    normalised = cv2.resize(
+        normalised.astype(np.float32), (width, height), interpolation=cv2.INTER_LINEAR
+    )
+    heat = cv2.applyColorMap((normalised * 255).astype(np.uint8), cv2.COLORMAP_JET)
+    if background is None:
+        return heat
+    background = cv2.resize(background, (width, height), interpolation=cv2.INTER_AREA)
+    alpha = (0.6 * normalised)[..., None]
+    return (background * (1 - alpha) + heat * alpha).astype(np.uint8)
@@ -0,0 +1,317 @@
+"""
+Synthetic multi-camera, multi-viewer load generator.
+
+Registers N file sources through /api/sources, opens M MJPEG viewers and K
+/events subscribers, posts screening images at a fixed rate, and reports
+delivered fps and end-to-end frame latency per viewer, screening latency,
+events received and dropped, and the server's CPU and RSS.
+
+For reproducible runs without torch or a GPU, start the server with the fake
+detector:
+
+    ANALYSIS_DETECTOR=fake SCREENING_DETECTOR=fake python asgi.py
+    python loadtest.py --sources 8 --viewers 16 --subscribers 4 --kiosk-rps 2
+
+Frame latency uses the server's X-Frame-Time part header, so it is only
+meaningful when the client and server clocks agree (e.g. the same box).
+"""
+
+import argparse
+import base64
+import json
+import os
+import statistics
+import threading
+import time
+
+import cv2
+import numpy as np
+import requests
+
+SYNTHETIC_VIDEO = "loadtest_synthetic.mp4"
+
+
+def generate_video(path, seconds=10, fps=15, size=(1280, 720)):
+    """Write a moving test pattern whose brightness drifts over time."""
+    width, height = size
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    for i in range(int(seconds * fps)):
+        frame = np.full((height, width, 3), (i * 3) % 200 + 30, dtype=np.uint8)
+        x = (i * 12) % width
+        top = height // 3
+        cv2.rectangle(frame, (x, top), (x + 120, top + 240), (0, 0, 255), -1)
+        cv2.putText(
+            frame, str(i), (20, 60), cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 255), 3
+        )
+        writer.write(frame)
+    writer.release()
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * pct / 100))], 4)
+
+
+class Viewer(threading.Thread):
+    """Read an MJPEG stream and record frame arrivals and latency."""
+
+    def __init__(self, url, stop):
+        super().__init__(daemon=True)
+        self.url = url
+        self.stop = stop
+        self.frames = 0
+        self.latencies = []
+        self.error = None
+        self.started = None
+
+    def run(self):
+        try:
+            with requests.get(self.url, stream=True, timeout=(5, 5)) as response:
+                response.raise_for_status()
+                self.started = time.time()
+                stream = response.raw
+                while not self.stop.is_set():
+                    headers = self._read_headers(stream)
+                    if headers is None:
+                        break
+                    stream.read(int(headers.get("content-length", 0)) + 2)
+                    self.frames += 1
+                    captured_at = headers.get("x-frame-time")
+                    if captured_at:
+                        self.latencies.append(time.time() - float(captured_at))
+        except Exception as e:
+            self.error = str(e)
+
+    @staticmethod
+    def _read_headers(stream):
+        line = stream.readline()
+        while line and line.strip() != b"--frame":
+            line = stream.readline()
+        if not line:
+            return None
+        headers = {}
+        for line in iter(stream.readline, b"\r\n"):
+            if not line:
+                return None
+            name, _, value = line.decode().partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return headers
+
+    def summary(self, elapsed):
+        return {
+            "url": self.url,
+            "frames": self.frames,
+            "fps": round(self.frames / elapsed, 2) if elapsed else 0,
+            "latency_p50": percentile(self.latencies, 50),
+            "latency_p95": percentile(self.latencies, 95),
+            "error": self.error,
+        }
+
+
+class Subscriber(threading.Thread):
+    """Count Server-Sent Events by type."""
+
+    def __init__(self, url, stop):
+        super().__init__(daemon=True)
+        self.url = url
+        self.stop = stop
+        self.counts = {}
+        self.error = None
+
+    def run(self):
+        try:
+            with requests.get(self.url, stream=True, timeout=(5, 30)) as response:
+                for line in response.iter_lines():
+                    if self.stop.is_set():
+                        break
+                    if line.startswith(b"event:"):
+                        event_type = line[6:].strip().decode()
+                        self.counts[event_type] = self.counts.get(event_type, 0) + 1
+        except Exception as e:
+            self.error = str(e)
+
+
+class Kiosk(threading.Thread):
+    """Post distinct screening images at a fixed rate."""
+
+    def __init__(self, url, rate, stop, seed):
+        super().__init__(daemon=True)
+        self.url = url
+        self.interval = 1.0 / rate
+        self.stop = stop
+        self.rng = np.random.default_rng(seed)
+        self.latencies = []
+        self.errors = 0
+
+    def run(self):
+        next_due = time.time()
+        while not self.stop.is_set():
+            # Fresh noise every time so the server's image cache never hits
+            image = self.rng.integers(0, 255, (480, 640, 3), dtype=np.uint8)
+            _, jpeg = cv2.imencode(".jpg", image)
+            payload = {"image": base64.b64encode(jpeg.tobytes()).decode()}
+            started = time.time()
+            try:
+                response = requests.post(self.url, json=payload, timeout=30)
+                if response.ok:
+                    self.latencies.append(time.time() - started)
+                else:
+                    self.errors += 1
+            except requests.RequestException:
+                self.errors += 1
+            next_due += self.interval
+            self.stop.wait(max(0.0, next_due - time.time()))
+
+
+class MetricsPoller(threading.Thread):
+    """Sample the server's /api/metrics once per second."""
+
+    def __init__(self, url, stop):
+        super().__init__(daemon=True)
+        self.url = url
+        self.stop = stop
+        self.samples = []
+
+    def run(self):
+        while not self.stop.is_set():
+            try:
+                self.samples.append(requests.get(self.url, timeout=5).json())
+            except (requests.RequestException, ValueError):
+                pass
+            self.stop.wait(1.0)
+
+    def summary(self):
+        if len(self.samples) < 2:
+            return {}
+        cpu = [
+            100
+            * (b["cpu_seconds"] - a["cpu_seconds"])
+            / max(b["time"] - a["time"], 1e-3)
+            for a, b in zip(self.samples, self.samples[1:])
+        ]
+        first, last = self.samples[0], self.samples[-1]
+        return {
+            "cpu_percent_mean": round(statistics.mean(cpu), 1),
+            "cpu_percent_max": round(max(cpu), 1),
+            "rss_mb_max": max(s["rss_mb"] for s in self.samples),
+            "threads_max": max(s["threads"] for s in self.samples),
+            "events_published": last["events_published"] - first["events_published"],
+            "events_dropped": last["events_dropped"] - first["events_dropped"],
+        }
+
+
+def run(args):
+    base = args.url.rstrip("/")
+    video = args.video
+    if video is None:
+        video = SYNTHETIC_VIDEO
+        path = os.path.join(args.video_dir, video)
+        if not os.path.exists(path):
+            print(f"Generating {path}")
+            generate_video(path)
+
+    source_ids = []
+    for i in range(args.sources):
+        response = requests.post(
+            f"{base}/api/sources",
+            json={"name": f"load-{i}", "type": "file", "path": video},
+            timeout=30,
+        )
+        if not response.ok:
+            print(f"Source {i} rejected: {response.text.strip()}")
+            break
+        source_ids.append(response.json()["id"])
+    print(f"Registered {len(source_ids)} sources")
+
+    stop = threading.Event()
+    viewers = [
+        Viewer(
+            f"{base}/source_video_raw/{source_ids[i % len(source_ids)]}"
+            f"?variant={args.variant}",
+            stop,
+        )
+        for i in range(args.viewers if source_ids else 0)
+    ]
+    subscribers = [Subscriber(f"{base}/events", stop) for _ in range(args.subscribers)]
+    kiosks = [
+        Kiosk(f"{base}/api/screening/detect", args.kiosk_rps / args.kiosks, stop, seed)
+        for seed in range(args.kiosks if args.kiosk_rps > 0 else 0)
+    ]
+    poller = MetricsPoller(f"{base}/api/metrics", stop)
+
+    workers = [poller, *viewers, *subscribers, *kiosks]
+    for worker in workers:
+        worker.start()
+    started = time.time()
+    try:
+        time.sleep(args.duration)
+    except KeyboardInterrupt:
+        pass
+    stop.set()
+    elapsed = time.time() - started
+    for worker in workers:
+        worker.join(timeout=10)
+
+    if not args.keep_sources:
+        for source_id in source_ids:
+            requests.delete(f"{base}/api/sources/{source_id}", timeout=30)
+
+    kiosk_latencies = [latency for kiosk in kiosks for latency in kiosk.latencies]
+    viewer_fps = [v.frames / elapsed for v in viewers]
+    return {
+        "config": vars(args),
+        "duration": round(elapsed, 1),
+        "sources": len(source_ids),
+        "viewers": {
+            "fps_mean": round(statistics.mean(viewer_fps), 2) if viewer_fps else None,
+            "fps_min": round(min(viewer_fps), 2) if viewer_fps else None,
+            "latency_p50": percentile([x for v in viewers for x in v.latencies], 50),
+            "latency_p95": percentile([x for v in viewers for x in v.latencies], 95),
+            "per_viewer": [v.summary(elapsed) for v in viewers],
+        },
+        "events": {
+            "per_subscriber": [s.counts for s in subscribers],
+            "errors": [s.error for s in subscribers if s.error],
+        },
+        "screening": {
+            "requests": len(kiosk_latencies),
+            "errors": sum(k.errors for k in kiosks),
+            "latency_p50": percentile(kiosk_latencies, 50),
+            "latency_p95": percentile(kiosk_latencies, 95),
+        },
+        "server": poller.summary(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multi-camera load generator")
+    parser.add_argument("--url", default="http://localhost:5001", help="server URL")
+    parser.add_argument("--sources", type=int, default=4, help="synthetic sources")
+    parser.add_argument("--viewers", type=int, default=4, help="MJPEG viewers")
+    parser.add_argument("--subscribers", type=int, default=2, help="/events clients")
+    parser.add_argument("--kiosks", type=int, default=1, help="screening clients")
+    parser.add_argument(
+        "--kiosk-rps", type=float, default=0.0, help="total screening requests/sec"
+    )
+    parser.add_argument("--variant", default="full", help="stream variant for viewers")
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument(
+        "--video", help="file in the server's video folder (default: generated)"
+    )
+    parser.add_argument(
+        "--video-dir", default="static/video", help="where to write generated video"
+    )
+    parser.add_argument(
+        "--keep-sources", action="store_true", help="don't delete sources afterwards"
+    )
+    parser.add_argument("--output", help="also write the JSON report here")
+    args = parser.parse_args()
+
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
@@ -0,0 +1,176 @@
+"""
+Staged per-source processing pipeline.
+
+A source's work is split into stages (capture, detection, events, alerts,
+history) that each run in their own supervised worker and hand items to the
+next stage through a bounded queue. A consumer blocks on a condition variable
+until an item arrives, so hand-offs cost no polling interval, and a slow
+stage (an email, a JPEG encode) never stalls the stages before it beyond its
+queue's bound. What happens when a queue is full is chosen per stage:
+
+- ``block``: the producer waits (bookkeeping that must not lose items)
+- ``drop_oldest``: the oldest queued item is discarded (latest frame wins)
+- ``drop_newest``: the new item is discarded (best-effort side work)
+
+Every stage records how long items waited in its queue and how long it spent
+processing them.
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+DROP_POLICIES = ("block", "drop_oldest", "drop_newest")
+STOP_POLL = 0.25  # Bounds how long a blocked stage takes to notice a stop
+
+
+class StageQueue:
+    """Bounded FIFO with a drop policy; items carry their enqueue time."""
+
+    def __init__(self, maxsize: int = 1, policy: str = "drop_oldest"):
+        if policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy: {policy}")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.dropped = 0
+        self._items = deque()
+        self._cond = threading.Condition()
+
+    def _wait_for(self, predicate, should_stop) -> bool:
+        """Wait (holding the condition) until ``predicate()`` or ``should_stop()``.
+
+        Producers and consumers notify each other, so only stopping relies
+        on the poll interval.
+        """
+        while not predicate():
+            if should_stop is not None and should_stop():
+                return False
+            self._cond.wait(STOP_POLL if should_stop is not None else None)
+        return True
+
+    def put(self, item, should_stop=None) -> bool:
+        """Enqueue ``item``; returns False if it was dropped instead."""
+        with self._cond:
+            if self.policy == "block":
+                self._wait_for(lambda: len(self._items) < self.maxsize, should_stop)
+            if len(self._items) >= self.maxsize:
+                self.dropped += 1
+                if self.policy != "drop_oldest":
+                    return False
+                self._items.popleft()
+            self._items.append((item, time.perf_counter()))
+            self._cond.notify_all()
+        return True
+
+    def get(self, should_stop=None):
+        """Return ``(item, seconds queued)``; raises ``queue.Empty`` if stopped."""
+        with self._cond:
+            if not self._wait_for(lambda: self._items, should_stop):
+                raise queue.Empty
+            item, enqueued_at = self._items.popleft()
+            self._cond.notify_all()  # Wake producers blocked on a full queue
+        return item, time.perf_counter() - enqueued_at
+
+    def clear(self):
+        with self._cond:
+            self._items.clear()
+            self._cond.notify_all()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class Stage:
+    """One pipeline stage: an optional inbox plus timing counters."""
+
+    def __init__(self, name: str, inbox: StageQueue | None = None):
+        self.name = name
+        self.inbox = inbox
+        self.items = 0
+        self.busy_seconds = 0.0  # Time spent processing items
+        self.queued_seconds = 0.0  # Time items spent waiting in the inbox
+        self.last_busy = 0.0
+        self.max_busy = 0.0
+
+    def put(self, item, should_stop=None) -> bool:
+        """Hand ``item`` to this stage, subject to its inbox's drop policy."""
+        return self.inbox.put(item, should_stop)
+
+    def get(self, should_stop):
+        """Block until an item arrives; returns None once ``should_stop()``."""
+        try:
+            item, queued = self.inbox.get(should_stop)
+        except queue.Empty:
+            return None
+        self.queued_seconds += queued
+        return item
+
+    @contextmanager
+    def timed(self):
+        """Account the enclosed block as the processing of one item."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.items += 1
+            self.busy_seconds += elapsed
+            self.last_busy = elapsed
+            self.max_busy = max(self.max_busy, elapsed)
+
+    def as_dict(self, uptime: float) -> dict:
+        stats = {
+            "items": self.items,
+            "busy_ms": round(1000 * self.busy_seconds / self.items, 2)
+            if self.items
+            else None,
+            "last_busy_ms": round(1000 * self.last_busy, 2),
+            "max_busy_ms": round(1000 * self.max_busy, 2),
+            "utilisation": round(self.busy_seconds / uptime, 3) if uptime else 0.0,
+        }
+        if self.inbox is not None:
+            stats.update(
+                queue_depth=len(self.inbox),
+                queue_size=self.inbox.maxsize,
+                policy=self.inbox.policy,
+                dropped=self.inbox.dropped,
+                queued_ms=round(1000 * self.queued_seconds / self.items, 2)
+                if self.items
+                else None,
+            )
+        return stats
+
+
+class StagedPipeline:
+    """The stages of one source, in order."""
+
+    def __init__(self, layout: dict):
+        """``layout`` maps stage names to ``(maxsize, policy)`` or None (no inbox)."""
+        self.stages = {
+            name: Stage(name, StageQueue(*spec) if spec else None)
+            for name, spec in layout.items()
+        }
+        self.started = time.perf_counter()
+        self.end_to_end = None  # EWMA of capture-to-event latency in seconds
+
+    def __getitem__(self, name: str) -> Stage:
+        return self.stages[name]
+
+    def record_latency(self, captured_at: float):
+        """Feed the end-to-end latency of an item captured at ``captured_at``."""
+        latency = time.time() - captured_at
+        if self.end_to_end is None:
+            self.end_to_end = latency
+        else:
+            self.end_to_end = 0.8 * self.end_to_end + 0.2 * latency
+
+    def as_dict(self) -> dict:
+        uptime = time.perf_counter() - self.started
+        return {
+            "stages": {name: s.as_dict(uptime) for name, s in self.stages.items()},
+            "end_to_end_ms": round(1000 * self.end_to_end, 1)
+            if self.end_to_end is not None
+            else None,
+        }
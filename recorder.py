@@ -0,0 +1,173 @@
+"""
+Pre/post-event violation clips.
+
+Every source keeps a short history of recent frames as JPEG bytes rather than
+raw arrays: a 960 px frame costs ~50 KB instead of ~1.6 MB, so twenty seconds
+at 5 fps fit in about 5 MB per camera. When a violation episode starts, a
+background encoder waits for the post-event window to fill, decodes the
+matching slice of the history and writes it as a playable clip.
+"""
+
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+# Extra seconds of history beyond pre+post: the single encoder may start a
+# clip late (sleep jitter, a queue of earlier clips), and a history of exactly
+# pre+post seconds would already have dropped the first pre-event frames
+HISTORY_MARGIN_SECONDS = 5.0
+
+# (fourcc, extension) in order of preference; VP8/WebM plays in every browser
+CLIP_CODECS = (("VP80", ".webm"), ("avc1", ".mp4"), ("mp4v", ".mp4"))
+
+
+class FrameHistory:
+    """Ring buffer of ``(timestamp, frame_number, jpeg)`` covering ``seconds``."""
+
+    def __init__(
+        self, seconds: float, fps: float, width: int = 960, quality: int = 70
+    ):
+        self.seconds = seconds
+        self.interval = 1.0 / fps
+        self.width = width
+        self.quality = quality
+        self._frames = deque()
+        self._bytes = 0
+        self._last_added = 0.0
+        self._lock = threading.Lock()
+
+    def wants_frame(self, timestamp: float) -> bool:
+        """Whether a frame at ``timestamp`` is due for recording."""
+        return timestamp - self._last_added >= self.interval
+
+    def claim(self, timestamp: float) -> bool:
+        """Reserve the slot for a frame at ``timestamp`` if one is due.
+
+        Lets the capture loop pick frames cheaply and hand the encoding to
+        :meth:`store` on another thread.
+        """
+        if not self.wants_frame(timestamp):
+            return False
+        self._last_added = timestamp
+        return True
+
+    def add(self, frame, frame_number: int, timestamp: float | None = None):
+        """Encode and store a frame, evicting those older than the window."""
+        timestamp = timestamp or time.time()
+        if self.claim(timestamp):
+            self.store(frame, frame_number, timestamp)
+
+    def store(self, frame, frame_number: int, timestamp: float):
+        """Encode and store a claimed frame."""
+        height, width = frame.shape[:2]
+        if width > self.width:
+            frame = cv2.resize(
+                frame,
+                (self.width, round(height * self.width / width)),
+                interpolation=cv2.INTER_AREA,
+            )
+        ok, buffer = cv2.imencode(
+            ".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), self.quality]
+        )
+        if not ok:
+            return
+
+        jpeg = buffer.tobytes()
+        with self._lock:
+            self._frames.append((timestamp, frame_number, jpeg))
+            self._bytes += len(jpeg)
+            while self._frames and self._frames[0][0] < timestamp - self.seconds:
+                self._bytes -= len(self._frames.popleft()[2])
+
+    def between(self, start: float, end: float):
+        """Frames recorded in ``[start, end]``, oldest first."""
+        with self._lock:
+            return [f for f in self._frames if start <= f[0] <= end]
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+
+def write_clip(frames, path_without_ext: str, fps: float) -> str | None:
+    """Decode JPEG frames and write them as a video; returns the file path."""
+    images = [
+        cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+        for _, _, jpeg in frames
+    ]
+    images = [img for img in images if img is not None]
+    if not images:
+        return None
+    height, width = images[0].shape[:2]
+
+    for fourcc, ext in CLIP_CODECS:
+        path = path_without_ext + ext
+        writer = cv2.VideoWriter(
+            path, cv2.VideoWriter_fourcc(*fourcc), fps, (width, height)
+        )
+        if not writer.isOpened():
+            continue
+        for img in images:
+            if img.shape[:2] != (height, width):
+                img = cv2.resize(img, (width, height))
+            writer.write(img)
+        writer.release()
+        return path
+    return None
+
+
+class ClipRecorder:
+    """Background encoder writing ``pre`` + ``post`` second clips around events."""
+
+    def __init__(
+        self, directory: str, pre_seconds: float = 10.0, post_seconds: float = 10.0
+    ):
+        self.directory = directory
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self._jobs = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def record(self, history: FrameHistory, event_time: float, name: str, on_done):
+        """Queue a clip of ``history`` around ``event_time``.
+
+        ``on_done(filename, offset)`` is called from the encoder thread once
+        the clip is written, with the seconds from clip start to the event.
+        """
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, daemon=True)
+                self._worker.start()
+        self._jobs.put((history, event_time, name, on_done))
+
+    def _run(self):
+        # Every job waits the same post window, so FIFO order is due order
+        while True:
+            history, event_time, name, on_done = self._jobs.get()
+            due = event_time + self.post_seconds
+            time.sleep(max(0.0, due - time.time()))
+
+            frames = history.between(event_time - self.pre_seconds, due)
+            if not frames:
+                continue
+            # Play back in real time even if fewer frames were recorded
+            span = frames[-1][0] - frames[0][0]
+            fps = (len(frames) - 1) / span if span > 0 else 1.0 / history.interval
+            # This is the only encoder thread: no failure may end it
+            try:
+                path = write_clip(frames, os.path.join(self.directory, name), fps)
+            except Exception as e:
+                print("Clip encoding failed:", e)
+                continue
+            if path is not None:
+                filename = os.path.basename(path)
+                try:
+                    on_done(filename, round(max(0.0, event_time - frames[0][0]), 1))
+                except Exception as e:
+                    print(f"Storing clip {filename} failed:", e)
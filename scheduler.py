@@ -0,0 +1,217 @@
+"""
+Global inference budget scheduler.
+
+The scheduler knows roughly how many inferences per second the machine can
+sustain (measured from observed latency, or configured) and shares that
+budget between sources by priority. Every source is guaranteed its minimum
+analysis rate first, then spare capacity goes to the highest priority sources
+up to their maximum rate. When inference slows down because the CPU is
+saturated, capacity shrinks and the low priority cameras are throttled first.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+EPSILON = 1e-6
+# Sources starved of budget still get an occasional look
+TRICKLE_FPS = 0.2
+
+
+class SourceBudget:
+    """Scheduling parameters and bookkeeping for one source."""
+
+    def __init__(self, priority: int = 1, min_fps: float = 1.0, max_fps: float = 10.0):
+        self.priority = priority
+        self.min_fps = min_fps
+        self.max_fps = max(max_fps, min_fps)
+        self.allocated_fps = self.max_fps
+        self.next_due = 0.0
+        self.completed = deque(maxlen=64)  # timestamps of finished inferences
+        self.under_served = False
+
+    def achieved_fps(self, now: float, window: float = 5.0) -> float:
+        recent = [t for t in self.completed if now - t <= window]
+        if len(recent) < 2:
+            return 0.0
+        return (len(recent) - 1) / max(recent[-1] - recent[0], EPSILON)
+
+    def as_dict(self, now: float) -> dict:
+        return {
+            "priority": self.priority,
+            "min_fps": self.min_fps,
+            "max_fps": self.max_fps,
+            "allocated_fps": round(self.allocated_fps, 2),
+            "achieved_fps": round(self.achieved_fps(now), 2),
+            "under_served": self.under_served,
+        }
+
+
+class InferenceScheduler:
+    """Share a global inference budget between sources by priority."""
+
+    def __init__(
+        self,
+        lanes: int = 1,
+        capacity_fps: float | None = None,
+        headroom: float = 0.9,
+        rebalance_interval: float = 1.0,
+    ):
+        self.lanes = lanes
+        self.fixed_capacity = capacity_fps
+        self.headroom = headroom
+        self.rebalance_interval = rebalance_interval
+        self.avg_latency = None  # EWMA of inference time in seconds
+        self._budgets = {}  # {source_id: SourceBudget}
+        self._lock = threading.Lock()
+        self._lanes = threading.BoundedSemaphore(lanes)
+        self._last_rebalance = 0.0
+
+    def register(self, source_id, priority=1, min_fps=1.0, max_fps=10.0):
+        with self._lock:
+            self._budgets[source_id] = SourceBudget(priority, min_fps, max_fps)
+            self._rebalance_locked()
+
+    def unregister(self, source_id):
+        with self._lock:
+            self._budgets.pop(source_id, None)
+            self._rebalance_locked()
+
+    def update(self, source_id, priority=None, min_fps=None, max_fps=None):
+        """Change a source's priority or rate limits; returns False if unknown."""
+        with self._lock:
+            budget = self._budgets.get(source_id)
+            if budget is None:
+                return False
+            if priority is not None:
+                budget.priority = priority
+            if min_fps is not None:
+                budget.min_fps = min_fps
+            if max_fps is not None:
+                budget.max_fps = max_fps
+            budget.max_fps = max(budget.max_fps, budget.min_fps)
+            self._rebalance_locked()
+            return True
+
+    def allocated_fps(self, source_id, default: float = TRICKLE_FPS) -> float:
+        """Analysis rate currently granted to a source."""
+        with self._lock:
+            budget = self._budgets.get(source_id)
+            if budget is None:
+                return default
+            return max(budget.allocated_fps, TRICKLE_FPS)
+
+    def capacity(self) -> float:
+        """Sustainable inferences per second across all lanes."""
+        if self.fixed_capacity:
+            return self.fixed_capacity
+        if not self.avg_latency:
+            # Nothing measured yet, let every source run at its maximum
+            return sum(b.max_fps for b in self._budgets.values())
+        return self.lanes / self.avg_latency * self.headroom
+
+    def wait_turn(self, source_id, should_stop=lambda: False) -> bool:
+        """Block until the source's next analysis slot is due.
+
+        Returns False if the source was unregistered or asked to stop.
+        """
+        while not should_stop():
+            with self._lock:
+                budget = self._budgets.get(source_id)
+                if budget is None:
+                    return False
+                interval = 1.0 / max(budget.allocated_fps, TRICKLE_FPS)
+                now = time.time()
+                if now >= budget.next_due:
+                    # Never burst to catch up on slots missed while behind
+                    budget.next_due = max(budget.next_due, now - interval) + interval
+                    return True
+                delay = budget.next_due - now
+            time.sleep(min(delay, 0.25))
+        return False
+
+    @contextmanager
+    def lane(self):
+        """Hold one inference lane without charging it to any source.
+
+        For work that shares the CPU with live inference without being part
+        of it, such as shadow inference of a candidate model.
+        """
+        with self._lanes:
+            yield
+
+    @contextmanager
+    def slot(self, source_id):
+        """Hold one inference lane and record how long the inference took."""
+        with self.lane():
+            start = time.time()
+            yield
+            latency = time.time() - start
+        self.record(source_id, latency)
+
+    def record(self, source_id, latency: float):
+        with self._lock:
+            if self.avg_latency is None:
+                self.avg_latency = latency
+            else:
+                self.avg_latency = 0.8 * self.avg_latency + 0.2 * latency
+            budget = self._budgets.get(source_id)
+            if budget is not None:
+                budget.completed.append(time.time())
+            if time.time() - self._last_rebalance >= self.rebalance_interval:
+                self._rebalance_locked()
+
+    def _rebalance_locked(self):
+        """Allocate capacity: minimums by priority, then fill up to maximums."""
+        self._last_rebalance = now = time.time()
+        budgets = sorted(
+            self._budgets.items(), key=lambda item: item[1].priority, reverse=True
+        )
+        remaining = self.capacity()
+
+        for _, budget in budgets:
+            budget.allocated_fps = min(budget.min_fps, remaining)
+            remaining -= budget.allocated_fps
+
+        # Water-fill the spare capacity one priority level at a time
+        levels = {}
+        for _, budget in budgets:
+            levels.setdefault(budget.priority, []).append(budget)
+        for priority in sorted(levels, reverse=True):
+            hungry = [b for b in levels[priority] if b.allocated_fps < b.max_fps]
+            while remaining > EPSILON and hungry:
+                share = remaining / len(hungry)
+                for budget in hungry:
+                    extra = min(share, budget.max_fps - budget.allocated_fps)
+                    budget.allocated_fps += extra
+                    remaining -= extra
+                hungry = [b for b in hungry if b.allocated_fps < b.max_fps - EPSILON]
+
+        for source_id, budget in budgets:
+            achieved = budget.achieved_fps(now)
+            under_served = budget.allocated_fps < budget.min_fps - EPSILON or (
+                len(budget.completed) >= budget.completed.maxlen // 2
+                and achieved < 0.8 * min(budget.allocated_fps, budget.min_fps)
+            )
+            if under_served and not budget.under_served:
+                print(
+                    f"Scheduler: under-serving source {source_id} "
+                    f"({achieved:.1f} fps achieved, {budget.min_fps:.1f} fps minimum)"
+                )
+            budget.under_served = under_served
+
+    def status(self) -> dict:
+        with self._lock:
+            now = time.time()
+            return {
+                "lanes": self.lanes,
+                "capacity_fps": round(self.capacity(), 2),
+                "avg_latency_ms": (
+                    round(self.avg_latency * 1000, 1) if self.avg_latency else None
+                ),
+                "sources": {sid: b.as_dict(now) for sid, b in self._budgets.items()},
+                "under_served": [
+                    sid for sid, b in self._budgets.items() if b.under_served
+                ],
+            }
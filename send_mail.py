@@ -5,11 +5,8 @@ Reference - https://developers.google.com/gmail/api/quickstart/python
 In order to run this module, you need to enable Gmail API and download client_secrets.json file
 """
 
-from email import encoders
-from email.mime.base import MIMEBase
 from email.mime.image import MIMEImage
 from email.mime.multipart import MIMEMultipart
-import mimetypes
 import os
 import time
 
@@ -52,7 +49,7 @@ def authentication():
     return creds
 
 
-def prepare_and_send_email(sender, recipient, subject, message_text, im0: bytes):
+def prepare_and_send_email(sender, recipient, subject, message_text, im0, filename=None):
     """Prepares and send email with attachment to the participants 
 
     Args:
@@ -60,7 +57,8 @@ def prepare_and_send_email(sender, recipient, subject, message_text, im0: bytes)
         recipient: Email address of the receiver.
         subject: The subject of the email message.
         message_text: The text of the email message.
-        im0: The image to be attached 
+        im0: The image to be attached (BGR array or JPEG bytes)
+        filename: Name of the attachment
     
     Returns:
         None
@@ -73,7 +71,7 @@ def prepare_and_send_email(sender, recipient, subject, message_text, im0: bytes)
         service = build('gmail', 'v1', credentials=creds)
 
         # create message using a custom, function create_message()
-        msg = create_message(sender, recipient, subject, message_text, im0)
+        msg = create_message(sender, recipient, subject, message_text, im0, filename)
         # send the message using a custom function send_message()
         send_message(service, 'me', msg)  # here 'me' is the user_id of the authenticated user
 
@@ -82,15 +80,19 @@ def prepare_and_send_email(sender, recipient, subject, message_text, im0: bytes)
         print(f'An error occurred: {error}')
 
 
-def create_message(sender, to, subject, message_text, img_file):
+def create_message(sender, to, subject, message_text, img_file, filename=None):
     """Create a message for an email.
 
+    The image is attached from memory; keeping a copy of it is up to the
+    caller (the app stores it in its evidence store).
+
     Args:
         sender: Email address of the sender.
         to: Email address of the receiver.
         subject: The subject of the email message.
         message_text: The text of the email message.
-        img_file: The image to be attached
+        img_file: The image to be attached (BGR array or JPEG bytes)
+        filename: Name of the attachment, by default violation_<time>.jpg
 
     Returns:
         An object containing a base64url encoded email object.
@@ -102,61 +104,20 @@ def create_message(sender, to, subject, message_text, img_file):
     message['to'] = to
     message['subject'] = subject
 
-    # create a directory to store the images that are attached to the email
-    base_loc = '.\\static/violations\\'
-    location = 'ABESIT'
-
-    # get current date and time
-    current_date_time = time.time()
-    formatted_date_time = time.strftime("%H-%M-%S_%d-%m-%Y", time.localtime(current_date_time))
-
-    # if base_loc doesn't exist, create it
-    if not os.path.exists(base_loc):
-        os.makedirs(base_loc)
-
-    file_name = base_loc + 'violation_' + str(location) + '_' + str(formatted_date_time) + '.jpg'
-
-    # convert img_file into jpeg format and save it in the file_name
-    cv2.imencode('.jpg', img_file)[1].tofile(file_name)
-
     msg = MIMEText(message_text)
     message.attach(msg)
 
-    content_type, encoding = mimetypes.guess_type(file_name)
-    main_type, sub_type = content_type.split('/', 1)
-
-    print(f'Attachment main_type = {main_type}, subtype= {sub_type}, and encoding = {encoding}')
-
-    # code to attach text, image, pdf and other files
-    # if attachment is a text file
-    if main_type == 'text':
-        with open(file_name, 'r') as fp:
-            msg = MIMEText(fp.read(), _subtype=sub_type)
-        fp.close()
-    # if attachment is an image file    
-    elif main_type == 'image':
-        fp = open(file_name, 'rb')
-        msg = MIMEImage(fp.read(), _subtype=sub_type)
-        fp.close()
-    # if attachment is a pdf file, then we need to set the main_type to application and sub_type to octet-stream
-    elif main_type == 'application' and sub_type == 'pdf' and encoding is None:  # Reference - https://coderzcolumn.com/tutorials/python/mimetypes-guide-to-determine-mime-type-of-file
-        print("INSIDE PDF")
-        main_type = 'application'
-        sub_type = 'octet-stream'
-        fp = open(file_name, 'rb')
-        msg = MIMEBase(main_type, sub_type)
-        msg.set_payload(fp.read())
-        encoders.encode_base64(msg)
-        fp.close()
-    # if attachment is anything else
+    # convert img_file into jpeg format unless it is encoded already
+    if isinstance(img_file, bytes):
+        jpeg = img_file
     else:
-        fp = open(file_name, 'rb')
-        msg = MIMEBase(main_type, sub_type)
-        msg.set_payload(fp.read())
-        fp.close()
+        jpeg = cv2.imencode('.jpg', img_file)[1].tobytes()
+
+    if filename is None:
+        filename = 'violation_' + time.strftime("%H-%M-%S_%d-%m-%Y") + '.jpg'
 
-    filename = os.path.basename(file_name)
-    # add attachment to the message header
+    # add the image as an attachment
+    msg = MIMEImage(jpeg, _subtype='jpeg')
     msg.add_header('Content-Disposition', 'attachment', filename=filename)
     message.attach(msg)
 
@@ -0,0 +1,155 @@
+"""
+Preload-and-fork production server.
+
+The master process imports the application and loads the screening model
+once, then forks HTTP workers that all accept on the same listening socket
+and share the loaded weights copy-on-write. No inference runs before the
+fork, so each worker builds its own predictor and thread pools on warm-up.
+
+Camera pipelines are pinned to a single worker, the *owner*: only it restores
+and runs sources. Source state (frames, detections, episodes, events) lives
+in that process, so the other workers serve the stateless screening
+endpoints and static files themselves and relay every other request, streams
+included, to the owner over a Unix socket. Settings reach them through
+``SETTINGS_CONFIG``. A worker that dies is re-forked in the same role; a new
+owner restores the sources saved in ``SOURCES_CONFIG``.
+
+    python serve.py --workers 4 --port 5001
+"""
+
+import argparse
+import asyncio
+import gc
+import os
+import re
+import signal
+import socket
+import tempfile
+import traceback
+
+import uvicorn
+
+import asgi
+import app as webapp
+from streaming import relay
+
+# Served by every worker; anything else needs the owner's source state
+LOCAL_ROUTES = re.compile(
+    r"^/(static/.*|screening|healthz|readyz"
+    r"|api/screening/(sites|requirements|detect|check-position))$"
+)
+OWNER = "owner"
+
+
+def worker_application(owner_path):
+    """ASGI app of a non-owner worker: local routes here, the rest relayed."""
+
+    async def application(scope, receive, send):
+        if scope["type"] != "http" or LOCAL_ROUTES.match(scope["path"]):
+            return await asgi.application(scope, receive, send)
+        return await relay(
+            lambda: asyncio.open_unix_connection(owner_path),
+            scope,
+            receive,
+            send,
+            unavailable="Source owner unavailable",
+        )
+
+    return application
+
+
+def preload():
+    """Load what every worker needs before forking, without running it."""
+    webapp.get_shared_detector(webapp.app.config["SCREENING_DETECTOR"])
+    # Objects that exist now are never collected, so the collector does not
+    # write to (and un-share) their pages in every worker
+    gc.freeze()
+
+
+def run_worker(role, listener, owner_listener, owner_path):
+    """Body of a forked worker; never returns."""
+    is_owner = role == OWNER
+    webapp.app.config["OWNS_SOURCES"] = is_owner
+    application = asgi.application if is_owner else worker_application(owner_path)
+    sockets = [listener, owner_listener] if is_owner else [listener]
+    if not is_owner:
+        owner_listener.close()
+
+    config = uvicorn.Config(application, lifespan="on", log_level="info")
+    uvicorn.Server(config).run(sockets=sockets)
+    os._exit(0)
+
+
+def serve(host, port, workers):
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((host, port))
+    listener.listen(2048)
+
+    # Bound by the master so that a re-forked owner keeps the same address
+    owner_path = os.path.join(tempfile.gettempdir(), f"ppe-owner-{os.getpid()}.sock")
+    owner_listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    owner_listener.bind(owner_path)
+    owner_listener.listen(2048)
+
+    preload()
+
+    children = {}  # {pid: role}
+    stopping = False
+
+    def spawn(role):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            # Never return into the master's loop (or its cleanup) in a child
+            try:
+                run_worker(role, listener, owner_listener, owner_path)
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                os._exit(1)
+        children[pid] = role
+        print(f"Started {role} worker {pid}")
+
+    def shutdown(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    spawn(OWNER)
+    for i in range(1, workers):
+        spawn(f"http-{i}")
+
+    try:
+        while children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            role = children.pop(pid, None)
+            if role is not None and not stopping:
+                print(f"{role} worker {pid} exited ({status}); restarting")
+                spawn(role)
+    finally:
+        os.unlink(owner_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Preload-and-fork server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", 5001)))
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("WEB_WORKERS", 2)),
+        help="HTTP worker processes, including the one that owns the sources",
+    )
+    args = parser.parse_args()
+    serve(args.host, args.port, max(1, args.workers))
@@ -3,6 +3,9 @@ let sources = {};
 let detectionEvents = [];
 let eventSource = null;
 let timeRange = 300; // Default 5 minutes
+// Tiles poll the cached snapshot instead of holding a stream open: a stream
+// counts as a viewer and would make every camera decode at full size and rate
+const TILE_REFRESH_MS = 2000;
 
 // Initialize dashboard
 $(document).ready(function () {
@@ -10,6 +13,7 @@ $(document).ready(function () {
 	loadExistingSources();
 	updateTimeRange();
 	setInterval(updateTimeline, 1000); // Update timeline every second
+	setInterval(refreshTiles, TILE_REFRESH_MS);
 
 	// Event handlers
 	$("#source-type").change(function () {
@@ -37,9 +41,11 @@ $(document).ready(function () {
 function initializeEventStream() {
 	eventSource = new EventSource("/events");
 
-	eventSource.addEventListener("detection", function (event) {
-		const data = JSON.parse(event.data);
-		handleDetectionEvent(data);
+	["episode_started", "episode_updated", "episode_ended"].forEach((type) => {
+		eventSource.addEventListener(type, function (event) {
+			const data = JSON.parse(event.data);
+			handleEpisodeEvent(type, data);
+		});
 	});
 
 	eventSource.addEventListener("source_update", function (event) {
@@ -58,27 +64,40 @@ function initializeEventStream() {
 	};
 }
 
-// Handle detection events
-function handleDetectionEvent(data) {
-	// Add to events array
-	detectionEvents.push({
+// Handle violation episode events (one entry per episode, updated in place)
+function handleEpisodeEvent(type, data) {
+	const episode = {
 		source_id: data.source_id,
 		timestamp: new Date(data.timestamp),
+		ended_at: data.ended_at ? new Date(data.ended_at) : null,
 		violation_type: data.violation_type,
 		confidence: data.confidence,
-		event_id: data.event_id || "",
+		event_id: data.event_id,
 		frame_number: data.frame_number || 0,
-	});
+		duration: data.duration || 0,
+		best_frame: data.best_frame,
+		clip: data.clip,
+		clip_offset: data.clip_offset || 0,
+	};
 
-	// Keep only events within the time range
+	const index = detectionEvents.findIndex((e) => e.event_id === data.event_id);
+	if (index >= 0) {
+		detectionEvents[index] = episode;
+	} else {
+		detectionEvents.push(episode);
+	}
+
+	// Keep only episodes still visible within the time range
 	const cutoffTime = new Date(Date.now() - timeRange * 1000);
-	detectionEvents = detectionEvents.filter((e) => e.timestamp > cutoffTime);
+	detectionEvents = detectionEvents.filter(
+		(e) => (e.ended_at || new Date()) > cutoffTime
+	);
 
 	// Update timeline
 	updateTimeline();
 
 	// Show notification for high-confidence violations
-	if (data.confidence > 0.8) {
+	if (type === "episode_started" && data.confidence > 0.8) {
 		showNotification(
 			`${data.violation_type} detected at ${
 				sources[data.source_id]?.name || "Unknown"
@@ -180,6 +199,25 @@ function removeSource(sourceId) {
 	});
 }
 
+// Snapshot URL of a source's dashboard tile
+function tileUrl(sourceId) {
+	return `/api/sources/${sourceId}/snapshot.jpg?variant=tile&t=${Date.now()}`;
+}
+
+// Reload every tile's snapshot, unless the dashboard is in the background
+function refreshTiles() {
+	if (document.hidden) return;
+	$(".source-thumb").each(function () {
+		const img = new Image();
+		const tile = this;
+		// Swap only once loaded, so tiles never flash; 503s keep the old frame
+		img.onload = function () {
+			tile.src = img.src;
+		};
+		img.src = tileUrl($(tile).data("source"));
+	});
+}
+
 // View source feed
 function viewSource(sourceId) {
 	window.open(`/camera/${sourceId}`, "_blank");
@@ -200,6 +238,9 @@ function addSourceCard(source) {
 										}</span>
                 </div>
             </div>
+            <img class="source-thumb" data-source="${source.id}" src="${tileUrl(
+							source.id
+						)}" alt="${source.name} preview" loading="lazy" />
             <div class="source-stats">
                 <div class="stat-item">
                     <div class="stat-label">Violations</div>
@@ -287,16 +328,18 @@ function updateTimeline() {
 		const now = Date.now();
 
 		events.forEach((event) => {
-			const age = now - event.timestamp.getTime();
-			const position =
-				((timeRange * 1000 - age) / (timeRange * 1000)) * trackWidth;
+			// Episodes span from their start to their end (or now while active)
+			const toPosition = (time) =>
+				((timeRange * 1000 - (now - time)) / (timeRange * 1000)) * trackWidth;
+			const start = Math.max(0, toPosition(event.timestamp.getTime()));
+			const end = toPosition(event.ended_at ? event.ended_at.getTime() : now);
 
-			if (position > 0) {
+			if (end > 0) {
 				const eventEl = $(`
                     <div class="timeline-event ${event.violation_type
 											.toLowerCase()
 											.replace(" ", "-")}"
-                         style="left: ${position}px;"
+                         style="left: ${start}px; width: ${Math.max(8, end - start)}px;"
                          data-event-id="${event.event_id}"
                          data-source-id="${event.source_id}">
                     </div>
@@ -518,10 +561,24 @@ function showViolationPopup(event, element) {
 					<span class="detail-label">Confidence:</span>
 					<span class="detail-value">${Math.round(event.confidence * 100)}%</span>
 				</div>
+				<div class="popup-detail">
+					<span class="detail-label">Duration:</span>
+					<span class="detail-value">${
+						event.ended_at ? `${Math.round(event.duration)}s` : "ongoing"
+					}</span>
+				</div>
 				<div class="popup-detail">
 					<span class="detail-label">Frame:</span>
 					<span class="detail-value">#${event.frame_number}</span>
 				</div>
+				${
+					event.clip
+						? `<video class="popup-frame" src="${event.clip}#t=${event.clip_offset}"
+								controls autoplay muted playsinline></video>`
+						: event.best_frame
+						? `<img class="popup-frame" src="${event.best_frame}" alt="Best frame">`
+						: ""
+				}
 			</div>
 			<div class="popup-actions">
 				<button class="btn-primary" onclick="viewSource('${event.source_id}')">
@@ -0,0 +1,159 @@
+// Client-side detection overlay: draws the boxes from /source_detections on a
+// canvas over the raw MJPEG stream, so thresholds and class filters are
+// applied in the browser without any server-side drawing or re-encoding.
+//
+// The raw stream is read with fetch() rather than by the <img> itself, so the
+// X-Frame-Seq header of every part is visible. Each displayed frame gets the
+// detections of the same frame, or of the nearest earlier analysed one.
+
+const OVERLAY_COLOURS = {
+	"NO-Hardhat": "#ef4444",
+	"NO-Mask": "#f97316",
+	"NO-Safety Vest": "#eab308",
+	Person: "#3b82f6",
+};
+const OVERLAY_RECORDS = 120; // Detection records kept for matching frames
+const HEADER_END = new Uint8Array([13, 10, 13, 10]); // \r\n\r\n
+
+function DetectionOverlay(sourceId, img, canvas) {
+	this.img = img;
+	this.canvas = canvas;
+	this.threshold = 0.5;
+	this.hidden = new Set(); // Class names not drawn
+	this.meta = null;
+	this.records = []; // Recent detection records, oldest first
+	this.frameSeq = null; // X-Frame-Seq of the frame on screen
+	this.frameUrl = null;
+
+	this.events = new EventSource(`/source_detections/${sourceId}`);
+	this.events.addEventListener("meta", (event) => {
+		this.meta = JSON.parse(event.data);
+		if (this.onMeta) this.onMeta(this.meta);
+	});
+	this.events.addEventListener("detections", (event) => {
+		this.records.push(JSON.parse(event.data));
+		if (this.records.length > OVERLAY_RECORDS) this.records.shift();
+		this.draw();
+	});
+	new ResizeObserver(() => this.draw()).observe(img);
+	this.readStream(`/source_video_raw/${sourceId}`);
+}
+
+// Read the multipart stream part by part and show each JPEG with its seq
+DetectionOverlay.prototype.readStream = async function (url) {
+	try {
+		const response = await fetch(url);
+		const reader = response.body.getReader();
+		const decoder = new TextDecoder();
+		let buffer = new Uint8Array(0);
+
+		for (;;) {
+			const { done, value } = await reader.read();
+			if (done) break;
+			const joined = new Uint8Array(buffer.length + value.length);
+			joined.set(buffer);
+			joined.set(value, buffer.length);
+			buffer = joined;
+
+			// Every complete part in the buffer: boundary and headers, then
+			// Content-Length bytes of JPEG
+			for (;;) {
+				const headerEnd = indexOfBytes(buffer, HEADER_END);
+				if (headerEnd < 0) break;
+				const headers = {};
+				decoder
+					.decode(buffer.subarray(0, headerEnd))
+					.split("\r\n")
+					.forEach((line) => {
+						const colon = line.indexOf(":");
+						if (colon > 0) {
+							headers[line.slice(0, colon).trim().toLowerCase()] = line
+								.slice(colon + 1)
+								.trim();
+						}
+					});
+				const start = headerEnd + HEADER_END.length;
+				const length = parseInt(headers["content-length"], 10);
+				if (isNaN(length) || buffer.length < start + length) break;
+				const seq = parseInt(headers["x-frame-seq"], 10);
+				this.showFrame(buffer.slice(start, start + length), isNaN(seq) ? null : seq);
+				buffer = buffer.subarray(start + length);
+			}
+		}
+	} catch (error) {
+		console.error("Video stream error:", error);
+	}
+	setTimeout(() => this.readStream(url), 2000); // Reconnect
+};
+
+DetectionOverlay.prototype.showFrame = function (jpeg, seq) {
+	const previous = this.frameUrl;
+	this.frameUrl = URL.createObjectURL(new Blob([jpeg], { type: "image/jpeg" }));
+	this.img.onload = () => {
+		if (previous) URL.revokeObjectURL(previous);
+		this.frameSeq = seq;
+		this.draw();
+	};
+	this.img.src = this.frameUrl;
+};
+
+// Detections of the displayed frame, or of the latest frame analysed before it
+DetectionOverlay.prototype.recordFor = function (seq) {
+	if (seq === null) return this.records[this.records.length - 1] || null;
+	for (let i = this.records.length - 1; i >= 0; i--) {
+		if (this.records[i].seq <= seq) return this.records[i];
+	}
+	return null;
+};
+
+DetectionOverlay.prototype.setThreshold = function (threshold) {
+	this.threshold = threshold;
+	this.draw();
+};
+
+DetectionOverlay.prototype.toggleClass = function (name, visible) {
+	if (visible) {
+		this.hidden.delete(name);
+	} else {
+		this.hidden.add(name);
+	}
+	this.draw();
+};
+
+DetectionOverlay.prototype.draw = function () {
+	const canvas = this.canvas;
+	canvas.width = this.img.clientWidth;
+	canvas.height = this.img.clientHeight;
+	const ctx = canvas.getContext("2d");
+	ctx.clearRect(0, 0, canvas.width, canvas.height);
+	const record = this.recordFor(this.frameSeq);
+	if (!this.meta || !record || !this.meta.width) return;
+
+	// Boxes are in native frame coordinates
+	const sx = canvas.width / this.meta.width;
+	const sy = canvas.height / this.meta.height;
+	const { boxes, classes, scores } = record;
+	ctx.lineWidth = 2;
+	ctx.font = "12px sans-serif";
+
+	for (let i = 0; i < classes.length; i++) {
+		const name = this.meta.names[classes[i]];
+		if (scores[i] < this.threshold || this.hidden.has(name)) continue;
+		const [x1, y1, x2, y2] = boxes.slice(i * 4, i * 4 + 4);
+		const colour = OVERLAY_COLOURS[name] || "#22c55e";
+		ctx.strokeStyle = colour;
+		ctx.fillStyle = colour;
+		ctx.strokeRect(x1 * sx, y1 * sy, (x2 - x1) * sx, (y2 - y1) * sy);
+		ctx.fillText(`${name} ${scores[i].toFixed(2)}`, x1 * sx, Math.max(12, y1 * sy - 4));
+	}
+};
+
+function indexOfBytes(haystack, needle) {
+	outer: for (let i = 0; i <= haystack.length - needle.length; i++) {
+		for (let j = 0; j < needle.length; j++) {
+			if (haystack[i + j] !== needle[j]) continue outer;
+		}
+		return i;
+	}
+	return -1;
+}
@@ -0,0 +1,237 @@
+"""
+Helpers shared by the WSGI and ASGI streaming front ends and the relays in
+front of them.
+"""
+
+import asyncio
+import json
+import threading
+
+MJPEG_MIMETYPE = "multipart/x-mixed-replace; boundary=frame"
+HOP_BY_HOP_HEADERS = {
+    b"connection",
+    b"keep-alive",
+    b"proxy-authenticate",
+    b"proxy-authorization",
+    b"te",
+    b"trailer",
+    b"transfer-encoding",
+    b"upgrade",
+}
+
+
+def mjpeg_part(
+    jpeg: bytes, seq: int | None = None, captured_at: float | None = None
+) -> bytes:
+    """Wrap a JPEG as one part of a multipart/x-mixed-replace stream.
+
+    ``seq`` is sent as an ``X-Frame-Seq`` part header so that clients reading
+    the stream themselves can match frames with detection metadata, and
+    ``captured_at`` (epoch seconds) as ``X-Frame-Time`` for latency checks.
+    """
+    headers = b"Content-Type: image/jpeg\r\nContent-Length: %d\r\n" % len(jpeg)
+    if seq is not None:
+        headers += b"X-Frame-Seq: %d\r\n" % seq
+    if captured_at is not None:
+        headers += b"X-Frame-Time: %.3f\r\n" % captured_at
+    return b"--frame\r\n" + headers + b"\r\n" + jpeg + b"\r\n"
+
+
+def sse_message(event_type: str, data) -> str:
+    """Format one Server-Sent Events message."""
+    return f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+
+def ndjson_line(event_type: str, data) -> str:
+    """Format one newline-delimited JSON record."""
+    return json.dumps({"event": event_type, "data": data}, separators=(",", ":")) + "\n"
+
+
+class FrameSignal:
+    """Sequence counter that wakes threads and asyncio tasks on a new frame.
+
+    Producers call :meth:`notify` once per frame. Consumers remember the last
+    sequence number they saw and wait for a newer one, so nobody has to poll.
+    """
+
+    def __init__(self):
+        self.seq = 0
+        self._cond = threading.Condition()
+        self._waiters = set()  # {(loop, future)}
+
+    def notify(self):
+        with self._cond:
+            self.seq += 1
+            self._cond.notify_all()
+            waiters, self._waiters = self._waiters, set()
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_resolve, future)
+
+    def wait(self, last_seq: int, timeout: float | None = None) -> int:
+        """Block until the sequence moves past ``last_seq`` or timeout."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.seq != last_seq, timeout)
+            return self.seq
+
+    async def wait_async(self, last_seq: int, timeout: float | None = None) -> int:
+        """Asyncio counterpart of :meth:`wait`."""
+        loop = asyncio.get_running_loop()
+        with self._cond:
+            if self.seq != last_seq:
+                return self.seq
+            future = loop.create_future()
+            waiter = (loop, future)
+            self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            with self._cond:
+                self._waiters.discard(waiter)
+        return self.seq
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+async def json_response(send, status, payload):
+    body = json.dumps(payload).encode()
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json")],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+async def stream_response(send, receive, content_type, body):
+    """Send a streaming response until the generator ends or the client leaves."""
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", content_type.encode()),
+                (b"cache-control", b"no-cache"),
+            ],
+        }
+    )
+    await stream_response_body(send, receive, body)
+
+
+async def stream_response_body(send, receive, body):
+    """Send ``body`` chunks after the response start, stopping on disconnect."""
+
+    async def pump():
+        async for chunk in body:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+
+    async def wait_disconnect():
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+    pump_task = asyncio.ensure_future(pump())
+    disconnect_task = asyncio.ensure_future(wait_disconnect())
+    done, pending = await asyncio.wait(
+        {pump_task, disconnect_task}, return_when=asyncio.FIRST_COMPLETED
+    )
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    await body.aclose()
+    if pump_task in done and disconnect_task not in done:
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+async def relay(connect, scope, receive, send, unavailable="Upstream unavailable"):
+    """Forward one HTTP request upstream and stream the response back.
+
+    ``connect`` opens the upstream connection, e.g.
+    ``lambda: asyncio.open_connection(host, port)``; if it fails the client
+    gets a 503 with ``unavailable`` as the error. The request body is passed
+    on as it arrives, so an upload is never held in memory whole.
+    """
+    try:
+        reader, writer = await connect()
+    except OSError:
+        return await json_response(send, 503, {"error": unavailable})
+
+    target = scope.get("raw_path") or scope["path"].encode()
+    if scope.get("query_string"):
+        target += b"?" + scope["query_string"]
+    head = [scope["method"].encode() + b" " + target + b" HTTP/1.1"]
+    length = None
+    send_chunked = False  # The client sent no length, so neither can we
+    for name, value in scope["headers"]:
+        name = name.lower()
+        if name == b"content-length":
+            length = value
+        elif name == b"transfer-encoding":
+            send_chunked = b"chunked" in value.lower()
+        elif name not in HOP_BY_HOP_HEADERS:
+            head.append(name + b": " + value)
+    send_chunked = send_chunked and length is None
+    if send_chunked:
+        head.append(b"transfer-encoding: chunked")
+    else:
+        head.append(b"content-length: " + (length or b"0"))
+    head.append(b"connection: close")
+
+    try:
+        writer.write(b"\r\n".join(head) + b"\r\n\r\n")
+        try:
+            while True:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    return
+                chunk = message.get("body", b"")
+                if chunk:
+                    if send_chunked:
+                        chunk = b"%x\r\n%s\r\n" % (len(chunk), chunk)
+                    writer.write(chunk)
+                    await writer.drain()  # Read no faster than upstream takes it
+                if not message.get("more_body"):
+                    break
+            if send_chunked:
+                writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        except ConnectionError:
+            pass  # Upstream answered early and hung up; relay its answer
+
+        status = int((await reader.readline()).split()[1])
+        headers = []
+        chunked = False
+        while (line := await reader.readline()) not in (b"\r\n", b""):
+            name, _, value = line.rstrip(b"\r\n").partition(b":")
+            name, value = name.strip().lower(), value.strip()
+            if name == b"transfer-encoding":
+                chunked = b"chunked" in value.lower()
+            if name not in HOP_BY_HOP_HEADERS:
+                headers.append((name, value))
+        await send(
+            {"type": "http.response.start", "status": status, "headers": headers}
+        )
+        chunks = read_chunked(reader) if chunked else read_until_eof(reader)
+        await stream_response_body(send, receive, chunks)
+    finally:
+        writer.close()
+
+
+async def read_until_eof(reader):
+    while chunk := await reader.read(65536):
+        yield chunk
+
+
+async def read_chunked(reader):
+    """Decode an HTTP/1.1 chunked body."""
+    while True:
+        size = int((await reader.readline()).split(b";")[0], 16)
+        if size == 0:
+            return
+        yield await reader.readexactly(size)
+        await reader.readexactly(2)  # CRLF after each chunk
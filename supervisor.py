@@ -0,0 +1,205 @@
+"""
+Source pipeline supervision.
+
+Every source runs a small set of worker threads (frame capture, detection).
+The supervisor owns them: each pipeline has a stop event the workers poll,
+removal signals and joins the threads before the source is forgotten, and a
+worker that crashes or exits on its own is restarted with exponential
+backoff. It also refuses new sources beyond a source count or process
+memory cap, admitting each one with an atomic reservation that concurrent
+additions count against, and reports per-pipeline health.
+"""
+
+import os
+import threading
+import time
+import traceback
+
+
+class SourceLimitError(RuntimeError):
+    """Starting another source would exceed a configured cap."""
+
+
+def process_rss_bytes() -> int:
+    """Current resident memory of this process (peak RSS where unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+
+        # ru_maxrss is in KB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Pipeline:
+    """Worker threads, stop event and health counters of one source."""
+
+    def __init__(self, source_id: str, stop_event: threading.Event):
+        self.source_id = source_id
+        self.stop_event = stop_event
+        self.threads = {}  # {worker name: Thread}
+        self.backing_off = set()  # Workers waiting to be restarted
+        self.restarts = 0
+        self.errors = {}  # {worker name: count}
+        self.last_error = None
+        self.last_error_at = None
+        self.started_at = time.time()
+        self.stopped = False
+
+    @property
+    def state(self) -> str:
+        if self.stopped:
+            return "stopped"
+        if self.stop_event.is_set():
+            return "stopping"
+        if self.backing_off:
+            return "restarting"
+        return "running"
+
+    def as_dict(self) -> dict:
+        return {
+            "state": self.state,
+            "uptime": round(time.time() - self.started_at, 1),
+            "restarts": self.restarts,
+            "errors": dict(self.errors),
+            "last_error": self.last_error,
+            "last_error_at": self.last_error_at,
+            "threads": {
+                name: thread.is_alive() for name, thread in self.threads.items()
+            },
+        }
+
+
+class SourceSupervisor:
+    """Start, restart, stop and account for source pipelines."""
+
+    def __init__(
+        self,
+        max_sources: int = 32,
+        memory_limit_mb: float | None = None,
+        backoff_initial: float = 1.0,
+        backoff_max: float = 60.0,
+        healthy_after: float = 30.0,
+        join_timeout: float = 5.0,
+    ):
+        self.max_sources = max_sources
+        self.memory_limit_mb = memory_limit_mb
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.healthy_after = healthy_after  # Run time that resets the backoff
+        self.join_timeout = join_timeout
+        self._pipelines = {}  # {source_id: Pipeline}
+        self._reserved = set()  # Admitted sources not started yet
+        self._lock = threading.Lock()
+
+    def reserve(self, source_id: str):
+        """Admit a source; raise :class:`SourceLimitError` if it exceeds a cap.
+
+        The check and the reservation happen under one lock, so concurrent
+        additions cannot all pass the same check. The reservation is turned
+        into a pipeline by :meth:`start` or dropped by :meth:`release`.
+        """
+        with self._lock:
+            if source_id in self._pipelines or source_id in self._reserved:
+                return
+            admitted = len(self._pipelines) + len(self._reserved)
+            if admitted >= self.max_sources:
+                raise SourceLimitError(f"Source limit reached ({self.max_sources})")
+            if self.memory_limit_mb:
+                rss_mb = process_rss_bytes() / 2**20
+                if rss_mb >= self.memory_limit_mb:
+                    raise SourceLimitError(
+                        f"Memory limit reached ({rss_mb:.0f} MB of "
+                        f"{self.memory_limit_mb:.0f} MB)"
+                    )
+            self._reserved.add(source_id)
+
+    def release(self, source_id: str):
+        """Drop a reservation that was never started (no-op once started)."""
+        with self._lock:
+            self._reserved.discard(source_id)
+
+    def start(self, source_id: str, workers: dict, stop_event: threading.Event):
+        """Run ``workers`` ({name: callable}) for a source until it is stopped."""
+        pipeline = Pipeline(source_id, stop_event)
+        with self._lock:
+            self._reserved.discard(source_id)
+            self._pipelines[source_id] = pipeline
+        for name, target in workers.items():
+            thread = threading.Thread(
+                target=self._run,
+                args=(pipeline, name, target),
+                name=f"{name}-{source_id[:8]}",
+                daemon=True,
+            )
+            pipeline.threads[name] = thread
+            thread.start()
+        return pipeline
+
+    def _run(self, pipeline: Pipeline, name: str, target):
+        delay = self.backoff_initial
+        while not pipeline.stop_event.is_set():
+            started = time.time()
+            try:
+                target()
+                if pipeline.stop_event.is_set():
+                    break
+                error = "worker exited"
+            except Exception as e:
+                traceback.print_exc()
+                error = f"{type(e).__name__}: {e}"
+
+            pipeline.errors[name] = pipeline.errors.get(name, 0) + 1
+            pipeline.last_error = f"{name}: {error}"
+            pipeline.last_error_at = time.time()
+            if time.time() - started >= self.healthy_after:
+                delay = self.backoff_initial
+            print(
+                f"Source {pipeline.source_id} {name} failed ({error}); "
+                f"restarting in {delay:.0f}s"
+            )
+
+            pipeline.backing_off.add(name)
+            stopped = pipeline.stop_event.wait(delay)
+            pipeline.backing_off.discard(name)
+            if stopped:
+                break
+            delay = min(delay * 2, self.backoff_max)
+            pipeline.restarts += 1
+
+    def stop(self, source_id: str) -> bool:
+        """Signal a source's workers to stop and wait for them to exit."""
+        with self._lock:
+            pipeline = self._pipelines.pop(source_id, None)
+        if pipeline is None:
+            return False
+        pipeline.stop_event.set()
+        deadline = time.time() + self.join_timeout
+        for name, thread in pipeline.threads.items():
+            if thread is threading.current_thread():
+                continue
+            thread.join(max(0.0, deadline - time.time()))
+            if thread.is_alive():
+                print(
+                    f"Source {source_id} {name} did not stop within "
+                    f"{self.join_timeout:.0f}s"
+                )
+        pipeline.stopped = not any(t.is_alive() for t in pipeline.threads.values())
+        return True
+
+    def health(self, source_id: str) -> dict | None:
+        with self._lock:
+            pipeline = self._pipelines.get(source_id)
+        return pipeline.as_dict() if pipeline else None
+
+    def status(self) -> dict:
+        with self._lock:
+            pipelines = dict(self._pipelines)
+        return {
+            "max_sources": self.max_sources,
+            "memory_limit_mb": self.memory_limit_mb,
+            "rss_mb": round(process_rss_bytes() / 2**20, 1),
+            "threads": threading.active_count(),
+            "sources": {sid: p.as_dict() for sid, p in pipelines.items()},
+        }
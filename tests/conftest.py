@@ -0,0 +1,66 @@
+import os
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+
+def write_video(path, frames=30, size=(64, 48), fps=10):
+    """A short MJPEG clip whose brightness changes every frame."""
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), fps, size)
+    for i in range(frames):
+        writer.write(np.full((size[1], size[0], 3), (i * 8) % 256, dtype=np.uint8))
+    writer.release()
+    return path
+
+
+@pytest.fixture(scope="session")
+def webapp(tmp_path_factory):
+    """The application module with fake detectors, in a scratch directory.
+
+    Imported once per session: the module holds the process's sources,
+    scheduler and stores, as it does when served.
+    """
+    root = tmp_path_factory.mktemp("app")
+    (root / "static" / "video").mkdir(parents=True)
+    write_video(root / "static" / "video" / "clip.avi")
+    os.environ.update(
+        ANALYSIS_DETECTOR="fake",
+        SCREENING_DETECTOR="fake",
+        FAKE_DETECTOR_LATENCY_MS="1",
+        DETECTION_CACHE_DIR="",
+        TRACE_DIR="",
+        INFERENCE_THREAD_POLICY="balanced",
+    )
+    cwd = os.getcwd()
+    os.chdir(root)
+    try:
+        import app
+
+        yield app
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.fixture(scope="session")
+def client(webapp):
+    """Test client of a started application (models warmed, sources restored)."""
+    client = webapp.app.test_client()
+    deadline = time.time() + 10
+    while client.get("/readyz").status_code != 200:
+        assert time.time() < deadline, "application never became ready"
+        time.sleep(0.05)
+    return client
+
+
+@pytest.fixture
+def source(webapp, client):
+    """A file source on the test clip, removed after the test."""
+    response = client.post(
+        "/api/sources", json={"type": "file", "path": "clip.avi", "name": "Clip"}
+    )
+    assert response.status_code == 200, response.get_json()
+    source = webapp.sources[response.get_json()["id"]]
+    yield source
+    client.delete(f"/api/sources/{source.id}")
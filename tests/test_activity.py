@@ -0,0 +1,58 @@
+import time
+
+
+def wait_for(condition, timeout=3.0):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+def test_activity_follows_viewers_and_detection(source):
+    assert source.activity == "detection"
+    source.add_viewer()
+    assert source.activity == "full"
+    source.remove_viewer()
+    source.set_detection_enabled(False)
+    assert source.activity == "idle"
+    source.remove_viewer()  # Never goes below zero
+    assert source.viewers == 0
+
+
+def test_idle_sources_stop_decoding_until_watched(source):
+    source.set_detection_enabled(False)
+    time.sleep(0.3)  # Let a frame already being decoded land
+    idle_frames = source.frames_read
+    time.sleep(0.4)
+    assert source.frames_read == idle_frames
+
+    source.add_viewer()
+    try:
+        assert wait_for(lambda: source.frames_read > idle_frames)
+    finally:
+        source.remove_viewer()
+
+
+def test_detection_toggle_route(client, source):
+    url = f"/api/sources/{source.id}/detection"
+    response = client.put(url, json={"enabled": False})
+    assert response.get_json() == {"detection_enabled": False, "activity": "idle"}
+    assert source.config["detection_enabled"] is False
+
+    response = client.put(url, json={"enabled": True})
+    assert response.get_json()["activity"] == "detection"
+
+
+def test_detection_flags_must_be_booleans(client, source):
+    url = f"/api/sources/{source.id}/detection"
+    response = client.put(url, json={"enabled": "false"})
+    assert response.status_code == 400
+    assert source.detection_enabled
+
+    response = client.post(
+        "/api/sources",
+        json={"type": "file", "path": "clip.avi", "detection_enabled": "false"},
+    )
+    assert response.status_code == 400
@@ -0,0 +1,78 @@
+import numpy as np
+
+from detection.cache import (
+    MAX_DETECTIONS,
+    DetectionCache,
+    file_digest,
+    open_detection_cache,
+)
+from detection.results import Detections
+
+NAMES = {0: "Hardhat", 1: "Person"}
+
+
+def sample(count=2):
+    return Detections(
+        [[i, i, i + 10, i + 10] for i in range(count)],
+        np.linspace(0.9, 0.2, count),
+        [i % 2 for i in range(count)],
+        NAMES,
+    )
+
+
+def test_round_trip_and_misses(tmp_path):
+    cache = DetectionCache(str(tmp_path / "v"), 10, NAMES)
+    assert cache.get(3) is None
+    cache.put(3, sample())
+    cached = cache.get(3)
+    assert cached.boxes.tolist() == sample().boxes.tolist()
+    assert cached.class_names() == ["Hardhat", "Person"]
+    assert cache.coverage == 0.1
+    cache.put(99, sample())  # Out of range: ignored
+
+
+def test_frames_without_detections_are_cached_as_empty(tmp_path):
+    cache = DetectionCache(str(tmp_path / "v"), 5, NAMES)
+    cache.put(0, Detections.empty(NAMES))
+    assert len(cache.get(0)) == 0
+
+
+def test_tolerance_serves_the_nearest_cached_frame(tmp_path):
+    cache = DetectionCache(str(tmp_path / "v"), 10, NAMES)
+    cache.put(4, sample(1))
+    cache.put(7, sample(2))
+    assert len(cache.get(6, tolerance=1)) == 2
+    assert len(cache.get(5, tolerance=1)) == 1
+    assert cache.get(5) is None
+
+
+def test_only_the_strongest_detections_are_kept(tmp_path):
+    cache = DetectionCache(str(tmp_path / "v"), 1, NAMES)
+    cache.put(0, sample(MAX_DETECTIONS + 8))
+    cached = cache.get(0)
+    assert len(cached) == MAX_DETECTIONS
+    assert cached.confidences.min() > sample(MAX_DETECTIONS + 8).confidences.min()
+
+
+def test_cache_persists_across_opens(tmp_path):
+    cache = DetectionCache(str(tmp_path / "v"), 4, NAMES)
+    cache.put(2, sample())
+    cache.flush()
+    reopened = DetectionCache(str(tmp_path / "v"), 4, NAMES)
+    assert len(reopened.get(2)) == 2
+
+
+def test_caches_are_keyed_by_content_and_shared(tmp_path):
+    video, weights = tmp_path / "video.mp4", tmp_path / "model.pt"
+    video.write_bytes(b"video")
+    weights.write_bytes(b"weights")
+    directory = str(tmp_path / "cache")
+    args = (directory, str(video), str(weights), 0.1, 10, NAMES)
+    first = open_detection_cache(*args)
+    assert open_detection_cache(*args) is first
+    assert open_detection_cache(*args, tag="cascade") is not first
+    assert open_detection_cache(*args[:4], 0, NAMES) is None  # No frame count
+
+    copy = tmp_path / "copy.mp4"
+    copy.write_bytes(b"video")
+    assert file_digest(str(copy)) == file_digest(str(video))
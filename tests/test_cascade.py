@@ -0,0 +1,94 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from detection.cascade import CascadeDetector, suppress_duplicates
+from detection.ppe_detector import CONF_FLOOR, Detector
+from detection.results import Detections
+
+NAMES = dict(enumerate(Detector.CLASSES))
+PERSON = Detector.CLASSES.index("Person")
+
+
+class Array:
+    """Stands in for a torch tensor: ``.cpu().numpy()``."""
+
+    def __init__(self, values):
+        self.values = np.asarray(values, dtype=np.float32).reshape(-1, 4)
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.values
+
+
+def cascade(people=(), crops=False, gate_conf=None):
+    """A CascadeDetector around a stubbed model (no weights are loaded)."""
+    detector = CascadeDetector.__new__(CascadeDetector)
+    detector.conf = 0.25
+    detector.model = SimpleNamespace(names=NAMES)
+    detector.gate_imgsz = 320
+    detector.gate_conf = gate_conf
+    detector.crops = crops
+    detector.padding = 0.2
+    detector.max_crop_area = 0.5
+    detector.person_class = PERSON
+    detector.frames_total = detector.frames_gated = 0
+    detector.calls = []
+
+    def predict(source, **kwargs):
+        detector.calls.append(kwargs)
+        if "classes" in kwargs:
+            return [SimpleNamespace(boxes=SimpleNamespace(xyxy=Array(people)))]
+        return [SimpleNamespace(crop=crop) for crop in source]
+
+    detector._predict = predict
+    return detector
+
+
+def test_gate_runs_at_the_inference_floor_by_default():
+    detector = cascade(people=[[0, 0, 10, 10]])
+    assert detector.gate(np.zeros((100, 100, 3), np.uint8)).shape == (1, 4)
+    assert "conf" not in detector.calls[0]  # _predict applies the floor
+    assert detector.calls[0]["classes"] == [PERSON]
+
+    raised = cascade(gate_conf=0.4)
+    raised.gate(np.zeros((100, 100, 3), np.uint8))
+    assert raised.calls[0]["conf"] == 0.4 > CONF_FLOOR
+
+
+def test_frames_without_people_skip_the_full_model(monkeypatch):
+    monkeypatch.setattr(Detector, "detect_raw", lambda self, frame: pytest.fail())
+    detector = cascade()
+    assert len(detector.detect_raw(np.zeros((100, 100, 3), np.uint8))) == 0
+    assert detector.gate_skip_rate == 1.0
+
+
+def test_crop_regions_are_padded_and_clipped():
+    detector = cascade()
+    regions = detector.crop_regions(np.array([[10, 10, 60, 110]]), (100, 200, 3))
+    assert regions.tolist() == [[0, 0, 70, 100]]
+
+
+def test_crop_detections_are_shifted_back_to_the_frame():
+    detector = cascade(people=[[100, 100, 150, 200]], crops=True)
+    detector._to_detections = lambda result: Detections(
+        [[1, 2, 11, 12]], [0.8], [0], NAMES
+    )
+    detections = detector.detect_raw(np.zeros((400, 400, 3), np.uint8))
+    # Padded region starts at (90, 80)
+    assert detections.boxes.tolist() == [[91, 82, 101, 92]]
+
+
+def test_duplicates_from_overlapping_crops_are_suppressed():
+    detections = Detections(
+        [[0, 0, 10, 10], [1, 1, 10, 10], [1, 1, 10, 10], [50, 50, 60, 60]],
+        [0.6, 0.9, 0.7, 0.5],
+        [0, 0, 1, 0],
+        NAMES,
+    )
+    kept = suppress_duplicates(detections)
+    # Same class overlaps collapse to the strongest; other classes stay
+    assert sorted(kept.confidences.tolist()) == pytest.approx([0.5, 0.7, 0.9])
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from detection.compliance import assess_compliance, containment, pairwise_iou
+from detection.ppe_detector import Detector
+from detection.results import Detections
+
+NAMES = dict(enumerate(Detector.CLASSES))
+IDS = {name: i for i, name in NAMES.items()}
+
+
+def detections(*items):
+    """``(class_name, confidence, box)`` tuples as Detections."""
+    return Detections(
+        [box for _, _, box in items],
+        [conf for _, conf, _ in items],
+        [IDS[name] for name, _, _ in items],
+        NAMES,
+    )
+
+
+def test_iou_and_containment():
+    a = np.array([[0, 0, 10, 10]])
+    b = np.array([[0, 0, 10, 10], [5, 0, 15, 10], [2, 2, 4, 4]])
+    assert pairwise_iou(a, b)[0].tolist() == pytest.approx([1.0, 50 / 150, 0.04])
+    assert containment(a, b)[0].tolist() == [1.0, 0.5, 1.0]
+
+
+def test_each_person_gets_their_own_items():
+    records = assess_compliance(
+        detections(
+            ("Person", 0.9, [0, 0, 100, 200]),
+            ("Person", 0.8, [200, 0, 300, 200]),
+            ("Hardhat", 0.7, [30, 0, 70, 30]),
+            ("NO-Hardhat", 0.6, [230, 0, 270, 30]),
+            ("Safety Vest", 0.7, [210, 60, 290, 120]),
+        )
+    )
+    first, second = records
+    assert first["bbox"] == [0, 0, 100, 200]
+    assert first["hardhat"] is True and first["vest"] is None
+    assert first["violations"] == []
+    assert second["hardhat"] is False and second["vest"] is True
+    assert second["violations"] == [("NO-Hardhat", pytest.approx(0.6))]
+
+
+def test_the_stronger_of_worn_and_missing_wins():
+    records = assess_compliance(
+        detections(
+            ("Person", 0.9, [0, 0, 100, 200]),
+            ("Hardhat", 0.8, [30, 0, 70, 30]),
+            ("NO-Hardhat", 0.4, [30, 0, 70, 30]),
+        )
+    )
+    assert records[0]["hardhat"] is True
+    assert records[0]["violations"] == []
+
+
+def test_orphan_violations_are_kept():
+    records = assess_compliance(
+        detections(
+            ("Person", 0.9, [0, 0, 100, 200]),
+            ("NO-Mask", 0.7, [500, 500, 520, 520]),
+            ("Hardhat", 0.7, [600, 600, 620, 620]),  # Worn by nobody: dropped
+        )
+    )
+    assert len(records) == 2
+    orphan = records[1]
+    assert orphan["confidence"] is None
+    assert orphan["mask"] is False and orphan["hardhat"] is None
+    assert orphan["violations"] == [("NO-Mask", pytest.approx(0.7))]
+
+
+def test_threshold_and_overlap():
+    raw = detections(
+        ("Person", 0.9, [0, 0, 100, 200]),
+        ("NO-Hardhat", 0.3, [30, 0, 70, 30]),
+        ("NO-Safety Vest", 0.8, [80, 50, 140, 100]),  # A third inside
+    )
+    records = assess_compliance(raw, conf=0.5)
+    assert records[0]["hardhat"] is None
+    assert [r["violations"] for r in records] == [
+        [],
+        [("NO-Safety Vest", pytest.approx(0.8))],
+    ]
+    assert assess_compliance(raw, min_overlap=0.3)[0]["vest"] is False
+
+
+def test_no_detections():
+    assert assess_compliance(Detections.empty(NAMES)) == []
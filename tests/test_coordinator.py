@@ -0,0 +1,184 @@
+import asyncio
+from collections import Counter
+
+import pytest
+
+pytest.importorskip("uvicorn")
+server = pytest.importorskip("coordinator")
+
+from coordinator import Coordinator, HashRing  # noqa: E402
+
+KEYS = [f"source-{i}" for i in range(3000)]
+
+
+class FakeNodes:
+    """In-memory stand-ins for the nodes' source APIs."""
+
+    def __init__(self):
+        self.running = {}  # {node name: {source_id: config}}
+
+    def request(self, node, method, path, payload=None):
+        sources = self.running.setdefault(node.name, {})
+        if path == "/api/sources" and method == "GET":
+            listing = [
+                {"id": sid, "persistent": True, "config": config}
+                for sid, config in sources.items()
+            ]
+            return 200, listing
+        if path == "/api/sources" and method == "POST":
+            if payload["id"] in sources:
+                return 409, {"error": "Source already exists"}
+            sources[payload["id"]] = payload
+            return 200, {"id": payload["id"], "name": payload.get("name")}
+        source_id = path.rsplit("/", 1)[1]
+        if sources.pop(source_id, None) is None:
+            return 404, {"error": "Source not found"}
+        return 200, {"success": True}
+
+
+@pytest.fixture
+def cluster(tmp_path):
+    """A coordinator over in-memory nodes; ``join`` brings one up."""
+    nodes = FakeNodes()
+    coordinator = Coordinator(str(tmp_path / "coordinator.json"), replicas=64)
+    coordinator._request = nodes.request
+
+    def join(port):
+        node = coordinator.add_node(f"http://127.0.0.1:{port}")
+        node.up = True
+        coordinator._rebuild_ring()
+        return node
+
+    return coordinator, nodes, join
+
+
+def test_ring_is_deterministic_and_balanced():
+    ring = HashRing(["a:1", "b:1", "c:1"])
+    assert HashRing(["c:1", "a:1", "b:1"]).node_for("cam") == ring.node_for("cam")
+    shares = Counter(ring.node_for(key) for key in KEYS)
+    assert all(0.2 < count / len(KEYS) < 0.47 for count in shares.values())
+    assert HashRing().node_for("cam") is None
+
+
+def test_a_joining_node_only_takes_keys_for_itself():
+    before = HashRing(["a:1", "b:1", "c:1"])
+    after = HashRing(["a:1", "b:1", "c:1", "d:1"])
+    moved = [k for k in KEYS if before.node_for(k) != after.node_for(k)]
+    assert all(after.node_for(key) == "d:1" for key in moved)
+    assert 0.15 < len(moved) / len(KEYS) < 0.35
+
+
+def test_ring_is_rebuilt_only_when_membership_changes(cluster):
+    coordinator, _, join = cluster
+    join(5101)
+    ring = coordinator.ring
+    coordinator._rebuild_ring()
+    assert coordinator.ring is ring
+    join(5102)
+    assert coordinator.ring.nodes == ["127.0.0.1:5101", "127.0.0.1:5102"]
+
+
+def test_sources_start_on_their_owner(cluster):
+    coordinator, nodes, join = cluster
+    join(5101)
+    join(5102)
+    ids = [coordinator.add_source({"name": f"cam{i}"})[1]["id"] for i in range(20)]
+    for source_id in ids:
+        assert source_id in nodes.running[coordinator.owner(source_id).name]
+    assert sum(len(s) for s in nodes.running.values()) == 20
+
+
+def test_a_joining_node_takes_over_its_share(cluster):
+    coordinator, nodes, join = cluster
+    join(5101)
+    ids = [coordinator.add_source({"name": f"cam{i}"})[1]["id"] for i in range(20)]
+    join(5102)
+    coordinator.reconcile()
+    moved = set(nodes.running["127.0.0.1:5102"])
+    assert moved and moved == {
+        sid for sid in ids if coordinator.owner(sid).name == "127.0.0.1:5102"
+    }
+    assert coordinator.moves == len(moved)
+    # Started on the new node before being stopped on the old one, never both
+    assert not moved & set(nodes.running["127.0.0.1:5101"])
+
+
+def test_a_leaving_node_hands_its_sources_back(cluster):
+    coordinator, nodes, join = cluster
+    join(5101)
+    join(5102)
+    for i in range(20):
+        coordinator.add_source({"name": f"cam{i}"})
+    assert coordinator.remove_node("127.0.0.1:5102")
+    coordinator.reconcile()
+    assert len(nodes.running["127.0.0.1:5101"]) == 20
+    assert nodes.running["127.0.0.1:5102"] == {}
+    assert "127.0.0.1:5102" not in coordinator.nodes
+
+
+def test_removed_sources_are_stopped(cluster):
+    coordinator, nodes, join = cluster
+    join(5101)
+    source_id = coordinator.add_source({"name": "cam"})[1]["id"]
+    assert coordinator.remove_source(source_id)
+    assert nodes.running["127.0.0.1:5101"] == {}
+    assert not coordinator.remove_source(source_id)
+
+
+def test_no_nodes_means_no_owner(cluster):
+    coordinator, _, _ = cluster
+    assert coordinator.add_source({"name": "cam"})[0] == 503
+
+
+def test_node_events_are_tagged_and_replays_dropped(cluster):
+    coordinator, _, join = cluster
+    node = join(5101)
+    subscriber = coordinator.event_bus.subscribe()
+    episode = {"event_id": "e1", "best_frame": "/episodes/e1.jpg"}
+    coordinator._on_event(node, "episode_started", episode)
+    coordinator._on_event(node, "episode_started", episode)  # After a reconnect
+    event_type, data = subscriber.get_nowait()
+    assert event_type == "episode_started"
+    assert data["node"] == "127.0.0.1:5101"
+    assert data["best_frame"] == "/nodes/127.0.0.1:5101/episodes/e1.jpg"
+    assert subscriber.empty()
+
+
+def test_stats_of_all_nodes_are_combined(cluster):
+    coordinator, _, join = cluster
+    first, second = join(5101), join(5102)
+    coordinator._on_event(
+        first, "stats", {"total_frames": 10, "frames_with_violations": 5}
+    )
+    coordinator._on_event(
+        second, "stats", {"total_frames": 30, "frames_with_violations": 5}
+    )
+    stats = coordinator.stats()
+    assert stats["total_frames"] == 40
+    assert stats["compliance_rate"] == 75
+    assert stats["nodes_up"] == 2
+
+
+def test_streams_are_redirected_to_the_owner(cluster, monkeypatch):
+    coordinator, _, join = cluster
+    coordinator.streams = "redirect"
+    monkeypatch.setattr(server, "coordinator", coordinator)
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    def request(source_id):
+        path = f"/source_video_raw/{source_id}"
+        scope = {"type": "http", "method": "GET", "path": path, "query_string": b"x=1"}
+        messages.clear()
+        asyncio.run(server.to_owner(source_id, scope, None, send))
+        return messages[0]
+
+    assert request("missing")["status"] == 404  # No node could run it
+    join(5101)
+    source_id = coordinator.add_source({"name": "cam"})[1]["id"]
+    response = request(source_id)
+    assert response["status"] == 307
+    location = dict(response["headers"])[b"location"].decode()
+    assert location == f"http://127.0.0.1:5101/source_video_raw/{source_id}?x=1"
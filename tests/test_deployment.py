@@ -0,0 +1,165 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from detection import deployment
+from detection.deployment import ModelDeployment, ShadowComparison, match_detections
+from detection.fake import FakeDetector
+from detection.ppe_detector import Detector
+from detection.results import Detections
+
+NAMES = dict(enumerate(Detector.CLASSES))
+FRAME = np.zeros((48, 64, 3), np.uint8)
+
+
+class SlowDetector(FakeDetector):
+    """Fake detector whose warm-up takes a while, can fail, and can be held."""
+
+    active = peak = 0
+    failures = 0
+    gate = None
+    lock = threading.Lock()
+
+    def warm_up(self, runs: int = 2, imgsz: int = 640):
+        cls = type(self)
+        with cls.lock:
+            cls.active += 1
+            cls.peak = max(cls.peak, cls.active)
+        try:
+            if cls.gate is not None:
+                cls.gate.wait(2)
+            time.sleep(0.02)
+            with cls.lock:
+                if cls.failures:
+                    cls.failures -= 1
+                    raise RuntimeError("weights unreadable")
+        finally:
+            with cls.lock:
+                cls.active -= 1
+
+
+@pytest.fixture
+def detector_cls(monkeypatch):
+    monkeypatch.setenv("FAKE_DETECTOR_LATENCY_MS", "0")
+    return type("TestDetector", (SlowDetector,), {"lock": threading.Lock()})
+
+
+def detections(boxes, classes):
+    boxes = np.array(boxes, dtype=np.float32).reshape(-1, 4)
+    confidences = np.full(len(boxes), 0.9, dtype=np.float32)
+    return Detections(boxes, confidences, np.array(classes), NAMES)
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.time() + timeout
+    while not predicate():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_matching_is_class_aware():
+    hardhat = Detector.CLASSES.index("Hardhat")
+    no_hardhat = Detector.CLASSES.index("NO-Hardhat")
+    live = detections([[0, 0, 10, 10], [20, 20, 30, 30]], [hardhat, hardhat])
+    same = detections([[0, 0, 10, 10], [20, 20, 30, 30]], [hardhat, no_hardhat])
+    assert match_detections(live, same).tolist() == [1.0]
+    assert len(match_detections(live, detections([], []))) == 0
+
+
+def test_identical_models_agree_completely():
+    comparison = ShadowComparison(conf=0.5)
+    frame = detections([[0, 0, 10, 10]], [Detector.CLASSES.index("NO-Mask")])
+    comparison.record(frame, frame, 0.02, 0.01)
+    stats = comparison.as_dict()
+    assert stats["box_agreement"] == 1.0
+    assert stats["violation_agreement"] == 1.0
+    assert stats["latency_ratio"] == 0.5
+
+
+def test_first_detector_is_built_inline_per_source(detector_cls):
+    models = ModelDeployment(detector_cls)
+    generation, first = models.detector_for("s1")
+    assert generation == 1
+    assert models.detector_for("s1") == (1, first)
+    assert models.detector_for("s2")[1] is not first
+
+
+def test_preloaded_model_is_shared_until_private_copies_load(detector_cls):
+    models = ModelDeployment(detector_cls)
+    models.preload()
+    shared = models.live.shared
+    for source_id in ("s1", "s2", "s3", "s4"):
+        assert models.detector_for(source_id)[1] is shared
+    wait_for(lambda: len(models.live.instances) == 4)
+    assert detector_cls.peak == 1  # One loader: sources load in turn
+    assert models.detector_for("s1")[1] is not shared
+
+
+def test_failed_load_is_retried_later(detector_cls, monkeypatch):
+    models = ModelDeployment(detector_cls)
+    models.preload()
+    detector_cls.failures = 1
+    models.detector_for("s1")
+    wait_for(lambda: "s1" in models.live.failed and not models.live.loading)
+    assert "s1" not in models.live.instances
+
+    models.detector_for("s1")  # Within the retry delay: no new load
+    assert not models.live.loading
+    monkeypatch.setattr(deployment, "LOAD_RETRY_SECONDS", 0)
+    models.detector_for("s1")
+    wait_for(lambda: "s1" in models.live.instances)
+
+
+def test_release_during_a_load_drops_the_instance(detector_cls):
+    models = ModelDeployment(detector_cls)
+    models.preload()
+    detector_cls.gate = threading.Event()
+    models.detector_for("s1")
+    wait_for(lambda: detector_cls.active == 1)
+    models.release("s1")
+    detector_cls.gate.set()
+    wait_for(lambda: detector_cls.active == 0)
+    time.sleep(0.05)
+    assert models.live.instances == {}
+    assert models.live.loading == set()
+
+
+def test_candidate_is_shadowed_then_promoted(detector_cls):
+    models = ModelDeployment(detector_cls)
+    models.preload()
+    with pytest.raises(ValueError):
+        models.promote()
+
+    candidate = models.load_candidate(FakeDetector.DEFAULT_WEIGHTS, 1.0)
+    wait_for(lambda: candidate.status == "ready")
+    live = models.live.shared.detect_raw(FRAME)
+    models.mirror(FRAME, live, 0.03)
+    wait_for(lambda: models.comparison.frames == 1)
+    assert models.status()["comparison"]["box_agreement"] == 1.0
+
+    models.promote()
+    assert models.generation == 2
+    assert models.status()["live"]["status"] == "live"
+    assert models.detector_for("s1") == (2, candidate.shared)
+
+
+def test_candidate_that_fails_to_load_reports_its_error(detector_cls):
+    models = ModelDeployment(detector_cls)
+    detector_cls.failures = 1
+    candidate = models.load_candidate("broken.pt")
+    wait_for(lambda: candidate.status == "error")
+    assert "weights unreadable" in candidate.error
+    with pytest.raises(ValueError):
+        models.promote()
+
+
+def test_candidate_route_validates_its_input(client):
+    assert client.get("/api/models").get_json()["live"]["generation"] >= 1
+    response = client.post("/api/models/candidate", json={})
+    assert response.status_code == 400
+    response = client.post(
+        "/api/models/candidate", json={"weights": "x.pt", "shadow_fraction": 2}
+    )
+    assert response.status_code == 400
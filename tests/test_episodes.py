@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+from episodes import EpisodeBuilder
+
+T0 = datetime(2026, 1, 1, 12)
+BOX = [0, 0, 10, 10]
+
+
+def feed(builder, seconds, violations, frame_number=0):
+    return builder.observe(T0 + timedelta(seconds=seconds), frame_number, violations)
+
+
+def kinds(events):
+    return [(kind, episode.violation_type) for kind, episode in events]
+
+
+def test_single_frame_blips_are_never_reported():
+    builder = EpisodeBuilder("s", start_hits=2, end_window=1, end_misses=1)
+    assert feed(builder, 0, {"NO-Mask": (0.9, BOX)}) == []
+    assert feed(builder, 2, {}) == []
+    assert builder.open == {}
+
+
+def test_episode_starts_after_start_hits_and_ends_after_the_gap():
+    builder = EpisodeBuilder("s", start_hits=2, end_window=3, end_misses=2)
+    feed(builder, 0, {"NO-Hardhat": (0.6, BOX)}, 1)
+    started = feed(builder, 1, {"NO-Hardhat": (0.7, BOX)}, 2)
+    assert kinds(started) == [("episode_started", "NO-Hardhat")]
+
+    # Absent for two frames but not yet three seconds: still open
+    assert feed(builder, 2, {}) == []
+    assert feed(builder, 3, {}) == []
+    ended = feed(builder, 4.5, {})
+    assert kinds(ended) == [("episode_ended", "NO-Hardhat")]
+
+    episode = ended[0][1]
+    assert episode.first_frame == 1
+    assert episode.peak_frame == 2
+    assert episode.duration == 1.0
+    assert episode.as_dict()["status"] == "ended"
+
+
+def test_short_gaps_do_not_split_an_incident():
+    builder = EpisodeBuilder("s", start_hits=1, end_window=3, end_misses=2)
+    feed(builder, 0, {"NO-Mask": (0.6, BOX)})
+    feed(builder, 1, {})
+    feed(builder, 2, {})
+    assert feed(builder, 2.5, {"NO-Mask": (0.6, BOX)}) == []
+    assert len(builder.open) == 1
+
+
+def test_updates_only_for_a_better_peak_and_not_too_often():
+    builder = EpisodeBuilder("s", start_hits=1, update_interval=10)
+    feed(builder, 0, {"NO-Mask": (0.5, BOX)})
+    assert feed(builder, 5, {"NO-Mask": (0.9, BOX)}) == []  # Too soon
+    assert feed(builder, 11, {"NO-Mask": (0.6, BOX)}) != []  # 0.9 not reported yet
+    assert feed(builder, 22, {"NO-Mask": (0.8, BOX)}) == []  # No better peak
+
+
+def test_violation_types_are_independent_episodes():
+    builder = EpisodeBuilder("s", start_hits=1)
+    events = feed(builder, 0, {"NO-Mask": (0.5, BOX), "NO-Hardhat": (0.5, BOX)})
+    assert sorted(kinds(events)) == [
+        ("episode_started", "NO-Hardhat"),
+        ("episode_started", "NO-Mask"),
+    ]
+    first, second = (episode for _, episode in events)
+    assert first.id != second.id
+
+
+def test_close_all_ends_only_confirmed_episodes():
+    builder = EpisodeBuilder("s", start_hits=2)
+    feed(builder, 0, {"NO-Mask": (0.5, BOX)})
+    feed(builder, 1, {"NO-Mask": (0.5, BOX), "NO-Hardhat": (0.5, BOX)})
+    assert kinds(builder.close_all()) == [("episode_ended", "NO-Mask")]
+    assert builder.open == {}
+
+
+def test_best_frame_follows_the_peak():
+    builder = EpisodeBuilder("s", start_hits=1)
+    builder.observe(T0, 1, {"NO-Mask": (0.5, [1, 1, 2, 2])}, frame="first")
+    builder.observe(T0, 2, {"NO-Mask": (0.9, [3, 3, 4, 4])}, frame="peak")
+    builder.observe(T0, 3, {"NO-Mask": (0.7, [5, 5, 6, 6])}, frame="later")
+    episode = builder.open["NO-Mask"]
+    assert episode.best_frame == "peak"
+    assert episode.bbox == [3, 3, 4, 4]
+    assert episode.best_frame_dirty
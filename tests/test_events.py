@@ -0,0 +1,112 @@
+import queue
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from events import DashboardStats, EventBroadcaster
+
+
+def make_source(source_id, status="active"):
+    return SimpleNamespace(
+        id=source_id,
+        status=status,
+        violation_counts={},
+        total_frames_processed=0,
+        frames_with_violations=0,
+        people_checked=0,
+        people_compliant=0,
+        last_detection=None,
+    )
+
+
+def person(violations=(), confidence=0.9):
+    return {"confidence": confidence, "violations": list(violations)}
+
+
+def test_broadcaster_fans_out_to_every_subscriber():
+    broadcaster = EventBroadcaster()
+    first, second = broadcaster.subscribe(), broadcaster.subscribe()
+    broadcaster.publish("stats", {"n": 1})
+    assert first.get_nowait() == ("stats", {"n": 1})
+    assert second.get_nowait() == ("stats", {"n": 1})
+    assert broadcaster.published == 1
+
+
+def test_broadcaster_drops_for_full_subscribers_only():
+    broadcaster = EventBroadcaster(maxsize=1)
+    slow, fast = broadcaster.subscribe(), broadcaster.subscribe()
+    broadcaster.publish("a", {})
+    fast.get_nowait()
+    broadcaster.publish("b", {})
+    assert fast.get_nowait() == ("b", {})
+    assert slow.get_nowait() == ("a", {})
+    assert broadcaster.dropped == 1
+
+
+def test_unsubscribed_queue_gets_nothing():
+    broadcaster = EventBroadcaster()
+    q = broadcaster.subscribe()
+    broadcaster.unsubscribe(q)
+    broadcaster.publish("a", {})
+    assert broadcaster.subscriber_count == 0
+    with pytest.raises(queue.Empty):
+        q.get_nowait()
+
+
+def test_rollups_follow_frames_and_violations():
+    stats = DashboardStats()
+    source = make_source("s1")
+    stats.register_source(source)
+    stats.record_frame(source, False, [person()])
+    stats.record_frame(source, True, [person([("NO-Hardhat", 0.8)]), person()])
+    when = datetime(2026, 1, 1, 12)
+    stats.record_violation(source, "NO-Hardhat", when)
+
+    snapshot = stats.snapshot()
+    assert snapshot["active_sources"] == 1
+    assert snapshot["total_frames"] == 2
+    assert snapshot["frames_with_violations"] == 1
+    assert snapshot["compliance_rate"] == 50
+    assert snapshot["people_checked"] == 3
+    assert snapshot["people_compliant"] == 2
+    assert snapshot["active_violations"] == 1
+    assert snapshot["last_detection"] == when.isoformat()
+
+
+def test_orphan_violations_are_not_counted_as_people():
+    stats = DashboardStats()
+    source = make_source("s1")
+    stats.register_source(source)
+    stats.record_frame(source, True, [person([("NO-Mask", 0.6)], confidence=None)])
+    assert stats.snapshot()["people_checked"] == 0
+    assert stats.snapshot()["person_compliance_rate"] == 100
+
+
+def test_unregister_removes_a_sources_contribution():
+    stats = DashboardStats()
+    early, late = make_source("early"), make_source("late")
+    for source in (early, late):
+        stats.register_source(source)
+    now = datetime(2026, 1, 1)
+    stats.record_violation(early, "NO-Mask", now)
+    stats.record_violation(late, "NO-Mask", now + timedelta(minutes=1))
+    stats.record_frame(late, True)
+
+    stats.unregister_source(late)
+    snapshot = stats.snapshot()
+    assert snapshot["active_sources"] == 1
+    assert snapshot["active_violations"] == 1
+    assert snapshot["total_frames"] == 0
+    assert snapshot["last_detection"] == now.isoformat()
+
+
+def test_status_changes_adjust_active_sources():
+    stats = DashboardStats()
+    source = make_source("s1", status="inactive")
+    stats.register_source(source)
+    assert stats.snapshot()["active_sources"] == 0
+    stats.status_changed(source, "inactive", "active")
+    assert stats.snapshot()["active_sources"] == 1
+    stats.status_changed(source, "active", "error")
+    assert stats.snapshot()["active_sources"] == 0
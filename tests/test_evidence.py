@@ -0,0 +1,148 @@
+import os
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from evidence import EvidenceStore, content_name
+
+
+def image(level, size=(640, 480)):
+    frame = np.full((size[1], size[0], 3), level, dtype=np.uint8)
+    cv2.putText(frame, str(level), (20, 60), cv2.FONT_HERSHEY_SIMPLEX, 2, (0, 0, 255))
+    return frame
+
+
+def settle(store, timeout=2.0):
+    """Wait until the background writer has stored everything queued."""
+    deadline = time.time() + timeout
+    while store.status()["pending"]:
+        assert time.time() < deadline, "evidence writer stalled"
+        time.sleep(0.01)
+    time.sleep(0.05)  # Its retention pass after the batch
+
+
+@pytest.fixture
+def store(tmp_path):
+    return EvidenceStore(str(tmp_path / "evidence"), thumb_width=160)
+
+
+def test_names_are_content_addressed(store):
+    first = store.put(image(10), "s1", "e1", "snapshot")
+    second = store.put(image(20), "s1", "e2", "snapshot")
+    assert first.name == content_name(first.data, ".jpg")
+    assert first.name != second.name
+    assert first.url == f"/evidence/{first.name}"
+    settle(store)
+    assert os.path.isfile(store.path(first.name))
+    assert os.path.dirname(store.path(first.name)).endswith(first.name[:2])
+
+
+def test_pending_evidence_is_served_from_memory(store):
+    saved = store.put(image(30), "s1", "e1", "snapshot")
+    opened = store.open(saved.name)
+    assert opened == saved.data or opened == store.path(saved.name)
+    settle(store)
+    assert store.open(saved.name) == store.path(saved.name)
+    assert store.open("../index.db") is None
+
+
+def test_identical_images_are_written_once(store):
+    frame = image(40)
+    store.put(frame, "s1", "e1", "best_frame")
+    store.put(frame, "s1", "e1", "snapshot")
+    settle(store)
+    status = store.status()
+    assert status["stored"] == 1
+    assert status["deduplicated"] == 1
+    assert len(store.find(event_id="e1")) == 2
+
+
+def test_thumbnails_are_scaled_down(store):
+    saved = store.put(image(50), "s1", "e1", "snapshot")
+    settle(store)
+    thumb = cv2.imread(store.path(store.thumb_name(saved.name)))
+    assert thumb.shape[1] == 160
+    assert saved.thumbnail.endswith(".thumb.jpg")
+
+
+def test_an_episode_keeps_only_its_latest_best_frame(store):
+    old = store.put(image(60), "s1", "e1", "best_frame")
+    new = store.put(image(70), "s1", "e1", "best_frame")
+    settle(store)
+    assert [item["name"] for item in store.find(event_id="e1")] == [new.name]
+    assert not os.path.exists(store.path(old.name))
+
+
+def test_find_filters_by_source_kind_and_time(store):
+    now = time.time()
+    store.put(image(80), "s1", "e1", "snapshot", timestamp=now - 30)
+    store.put(image(90), "s2", "e2", "snapshot", timestamp=now - 20)
+    store.put(image(100), "s1", "e3", "best_frame", timestamp=now - 10)
+    settle(store)
+    assert [i["event_id"] for i in store.find(source_id="s1")] == ["e3", "e1"]
+    assert [i["event_id"] for i in store.find(kind="snapshot")] == ["e2", "e1"]
+    window = store.find(since=now - 25, until=now - 10)
+    assert [i["event_id"] for i in window] == ["e2"]
+    assert len(store.find(limit=1)) == 1
+
+
+def test_old_evidence_expires(store):
+    now = time.time()
+    old = store.put(image(110), "s1", "e1", "snapshot", timestamp=now - 3600)
+    new = store.put(image(120), "s1", "e2", "snapshot", timestamp=now)
+    settle(store)
+    store.max_age = 60
+    store.enforce_retention(now)
+    assert [i["name"] for i in store.find()] == [new.name]
+    assert not os.path.exists(store.path(old.name))
+    assert not os.path.exists(store.path(store.thumb_name(old.name)))
+
+
+def test_size_cap_deletes_the_oldest_first(store):
+    now = time.time()
+    saved = [
+        store.put(image(level), "s1", f"e{level}", "snapshot", timestamp=now + level)
+        for level in range(0, 200, 40)
+    ]
+    settle(store)
+    store.max_age = 0
+    store.max_bytes = store.bytes // 2
+    store.enforce_retention()
+    assert store.bytes <= store.max_bytes
+    kept = {item["name"] for item in store.find()}
+    assert saved[-1].name in kept and saved[0].name not in kept
+    assert store.status()["deleted"] == len(saved) - len(kept)
+
+
+def test_files_are_moved_into_the_store(store, tmp_path):
+    clip = tmp_path / "clip.webm"
+    clip.write_bytes(b"not really a video")
+    saved = store.put_file(str(clip), "s1", "e1", "clip")
+    settle(store)
+    assert not clip.exists()
+    assert saved.thumbnail is None
+    with open(store.path(saved.name), "rb") as f:
+        assert f.read() == b"not really a video"
+
+
+def test_a_full_writer_drops_instead_of_blocking(tmp_path):
+    store = EvidenceStore(str(tmp_path / "evidence"), max_pending=1)
+    store._start = lambda: None  # No writer: the queue fills up
+    assert store.put(image(130), "s1", "e1", "snapshot") is not None
+    assert store.put(image(140), "s1", "e2", "snapshot") is None
+    assert store.status()["dropped"] == 1
+
+
+def test_evidence_routes(webapp, client):
+    saved = webapp.evidence_store.put(image(150), "route-test", "e1", "snapshot")
+    response = client.get(saved.url)
+    assert response.status_code == 200
+    assert response.data == saved.data
+    settle(webapp.evidence_store)
+
+    items = client.get("/api/evidence?source=route-test").get_json()["items"]
+    assert [item["name"] for item in items] == [saved.name]
+    assert client.get("/evidence/missing.jpg").status_code == 404
+    assert client.get("/api/evidence?since=yesterday").status_code == 400
@@ -0,0 +1,101 @@
+from io import BytesIO
+
+import cv2
+import numpy as np
+import pytest
+
+from heatmap import ViolationHeatmap, render_heatmap
+
+HOUR = 3600
+
+
+def test_footprint_covers_the_box_cells():
+    heatmap = ViolationHeatmap(cols=4, rows=2)
+    # Left half of a 400 x 200 frame, top row only
+    covered = heatmap.footprint([[0, 0, 200, 100]], 400, 200)
+    assert covered.tolist() == [[1, 1, 0, 0], [0, 0, 0, 0]]
+
+
+def test_overlapping_boxes_add_up():
+    heatmap = ViolationHeatmap(cols=4, rows=2)
+    covered = heatmap.footprint([[0, 0, 400, 200], [300, 100, 400, 200]], 400, 200)
+    assert covered.tolist() == [[1, 1, 1, 1], [1, 1, 1, 2]]
+
+
+def test_tiny_boxes_cover_at_least_one_cell():
+    heatmap = ViolationHeatmap(cols=4, rows=2)
+    assert heatmap.footprint([[10, 10, 11, 11]], 400, 200).sum() == 1
+
+
+def test_frames_accumulate_into_their_time_bucket():
+    heatmap = ViolationHeatmap(cols=4, rows=2)
+    box = [[0, 0, 100, 100]]
+    heatmap.add(box, 400, 200, timestamp=10 * HOUR + 5)
+    heatmap.add(box, 400, 200, timestamp=10 * HOUR + 50)
+    heatmap.add(box, 400, 200, timestamp=11 * HOUR)
+    assert heatmap.bucket(10 * HOUR)[0, 0] == 2
+    assert heatmap.bucket(11 * HOUR + 10)[0, 0] == 1
+    assert heatmap.bucket(12 * HOUR) is None
+    assert heatmap.total()[0, 0] == 3
+    assert [b["start"] for b in heatmap.buckets()] == [10 * HOUR, 11 * HOUR]
+
+
+def test_oldest_buckets_are_evicted():
+    heatmap = ViolationHeatmap(cols=4, rows=2, buckets=2)
+    for hour in range(3):
+        heatmap.add([[0, 0, 100, 100]], 400, 200, timestamp=hour * HOUR)
+    assert heatmap.bucket(0) is None
+    assert heatmap.total()[0, 0] == 2
+
+
+def test_decayed_grid_halves_every_half_life():
+    heatmap = ViolationHeatmap(cols=4, rows=2, half_life=10)
+    heatmap._decayed_at = 0.0
+    heatmap.add([[0, 0, 100, 100]], 400, 200, timestamp=0.0)
+    heatmap.add([[0, 0, 100, 100]], 400, 200, timestamp=10.0)
+    assert heatmap._decayed[0, 0] == pytest.approx(1.5)
+
+
+def test_empty_frames_change_nothing():
+    heatmap = ViolationHeatmap(cols=4, rows=2)
+    heatmap.add([], 400, 200)
+    heatmap.add([[0, 0, 10, 10]], 0, 0)
+    assert heatmap.buckets() == []
+
+
+def test_render_blends_over_a_background():
+    grid = np.zeros((2, 4), np.float32)
+    grid[0, 0] = 1
+    assert render_heatmap(grid, 80, 40).shape == (40, 80, 3)
+    background = np.zeros((200, 400, 3), np.uint8)
+    image = render_heatmap(grid, 80, 40, background)
+    assert image.shape == (40, 80, 3)
+    assert image[-1, -1].sum() == 0  # Cold cells leave the background alone
+
+
+def test_heatmap_route_formats(client, source):
+    source.heatmap.add([[0, 0, 32, 24]], 64, 48)
+    grid = client.get(f"/api/sources/{source.id}/heatmap?format=json").get_json()
+    assert grid["shape"] == list(source.heatmap.shape)
+    assert grid["grid"][0][0] > 0
+
+    response = client.get(f"/api/sources/{source.id}/heatmap?window=total&format=npy")
+    assert np.load(BytesIO(response.data)).sum() > 0
+
+    response = client.get(f"/api/sources/{source.id}/heatmap?width=1")
+    assert response.status_code == 200
+    image = cv2.imdecode(np.frombuffer(response.data, np.uint8), cv2.IMREAD_COLOR)
+    assert image.shape[1] == 1
+
+
+@pytest.mark.parametrize("width", ["abc", "0", "-5", "99999"])
+def test_heatmap_route_rejects_bad_widths(client, source, width):
+    response = client.get(f"/api/sources/{source.id}/heatmap?width={width}")
+    assert response.status_code == 400
+
+
+def test_heatmap_route_rejects_bad_windows(client, source):
+    base = f"/api/sources/{source.id}/heatmap"
+    assert client.get(f"{base}?window=yesterday").status_code == 400
+    assert client.get(f"{base}?window=0").status_code == 404
+    assert client.get(f"{base}?format=gif").status_code == 400
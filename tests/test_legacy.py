@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+from conftest import write_video
+
+
+@pytest.fixture
+def second_video(webapp):
+    videos = webapp.app.config["VIDEO_UPLOADS"]
+    write_video(f"{videos}/other.avi", frames=10)
+    yield "other.avi"
+    webapp.switch_legacy_video("clip.avi")
+
+
+def test_legacy_view_is_a_regular_source(webapp, client):
+    source = webapp.get_legacy_source()
+    assert source is not None
+    assert webapp.sources[source.id] is source
+    assert webapp.get_legacy_source() is source  # Registered once
+    assert not source.persistent
+
+
+def test_switching_video_replaces_the_legacy_source(webapp, client, second_video):
+    old = webapp.get_legacy_source()
+    response = client.post(
+        "/submit", data={"change_video": "1", "video_name": second_video}
+    )
+    assert response.status_code == 200
+
+    new = webapp.get_legacy_source()
+    assert new.id != old.id
+    assert new.path == second_video
+    assert old.id not in webapp.sources
+
+
+def test_unknown_videos_are_refused(client):
+    response = client.post(
+        "/submit", data={"change_video": "1", "video_name": "missing.avi"}
+    )
+    assert response.status_code == 404
+
+
+def test_legacy_source_is_not_saved(webapp, client, source):
+    webapp.get_legacy_source()
+    webapp.save_sources_config()
+    with open(webapp.app.config["SOURCES_CONFIG"]) as f:
+        saved = [config["id"] for config in json.load(f)]
+    assert saved == [source.id]
+
+
+def test_legacy_stream_rejects_an_invalid_conf(client):
+    assert client.get("/video_processed?conf=high").status_code == 400
@@ -0,0 +1,130 @@
+import io
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+from detection import get_detector
+from detection.ppe_detector import CONF_FLOOR
+from events import EventBroadcaster
+
+loadtest = pytest.importorskip("loadtest")
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    monkeypatch.setenv("FAKE_DETECTOR_LATENCY_MS", "0")
+    return get_detector("fake")
+
+
+def frame(level):
+    return np.full((48, 64, 3), level, dtype=np.uint8)
+
+
+def test_fake_detector_is_deterministic(fake):
+    first, second = fake(conf=CONF_FLOOR), fake(conf=CONF_FLOOR)
+    for level in (0, 40, 120, 250):
+        a, b = first.detect_raw(frame(level)), second.detect_raw(frame(level))
+        assert np.array_equal(a.boxes, b.boxes)
+        assert np.array_equal(a.confidences, b.confidences)
+        assert np.array_equal(a.class_ids, b.class_ids)
+
+
+def test_fake_detector_varies_with_brightness(fake):
+    detector = fake(conf=CONF_FLOOR)
+    labels = {
+        detector.names[int(i)]
+        for level in range(0, 256, 8)
+        for i in detector.detect_raw(frame(level)).class_ids
+    }
+    assert {"Person", "Hardhat", "NO-Hardhat"} <= labels
+
+
+def test_fake_detector_filters_at_its_threshold(fake):
+    # Level 0: the helmet box scores 0.5, the person 0.9
+    raw = fake(conf=0.8).detect_raw(frame(0))
+    assert len(raw) == 2  # detect_raw keeps everything above the floor
+    labelled = fake(conf=0.8).detect(frame(0))
+    assert [label for _, label in labelled] == ["Person 0.90"]
+
+
+def test_fake_detector_sleeps_for_its_latency(monkeypatch):
+    monkeypatch.setenv("FAKE_DETECTOR_LATENCY_MS", "250")
+    assert get_detector("fake")().latency == 0.25
+
+
+def test_percentile():
+    assert loadtest.percentile([], 50) is None
+    values = [0.5, 0.1, 0.4, 0.2, 0.3]
+    assert loadtest.percentile(values, 0) == 0.1
+    assert loadtest.percentile(values, 50) == 0.3
+    assert loadtest.percentile(values, 100) == 0.5
+
+
+def test_viewer_splits_mjpeg_parts():
+    stream = io.BytesIO(
+        b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: 3\r\n"
+        b"X-Frame-Time: 12.500\r\n\r\nabc\r\n"
+    )
+    headers = loadtest.Viewer._read_headers(stream)
+    assert headers["content-length"] == "3"
+    assert headers["x-frame-time"] == "12.500"
+    assert stream.read(3) == b"abc"
+
+
+def test_viewer_stops_at_end_of_stream():
+    assert loadtest.Viewer._read_headers(io.BytesIO(b"")) is None
+    truncated = io.BytesIO(b"--frame\r\nContent-Length: 3\r\n")
+    assert loadtest.Viewer._read_headers(truncated) is None
+
+
+def test_generated_video_is_readable(tmp_path):
+    path = str(tmp_path / "synthetic.mp4")
+    loadtest.generate_video(path, seconds=1, fps=5, size=(160, 120))
+    capture = cv2.VideoCapture(path)
+    frames = 0
+    while capture.read()[0]:
+        frames += 1
+    capture.release()
+    assert frames == 5
+
+
+def test_metrics_poller_summarises_deltas():
+    poller = loadtest.MetricsPoller("http://unused", threading.Event())
+    sample = {"rss_mb": 100, "threads": 8, "events_dropped": 0}
+    poller.samples = [
+        dict(sample, time=0.0, cpu_seconds=0.0, events_published=10),
+        dict(sample, time=1.0, cpu_seconds=0.5, events_published=30, rss_mb=120),
+    ]
+    summary = poller.summary()
+    assert summary["cpu_percent_mean"] == 50
+    assert summary["rss_mb_max"] == 120
+    assert summary["events_published"] == 20
+
+
+def test_broadcaster_counts_drops_from_concurrent_publishers():
+    broadcaster = EventBroadcaster(maxsize=10)
+    q = broadcaster.subscribe()
+
+    def publish():
+        for _ in range(100):
+            broadcaster.publish("tick", {})
+
+    threads = [threading.Thread(target=publish) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert broadcaster.published == 400
+    assert q.qsize() == 10
+    assert broadcaster.dropped == 390
+
+
+def test_metrics_endpoint_reports_event_counters(client, webapp):
+    before = client.get("/api/metrics").get_json()
+    webapp.event_bus.publish("test", {})
+    after = client.get("/api/metrics").get_json()
+    assert after["events_published"] == before["events_published"] + 1
+    assert after["rss_mb"] > 0
+    assert after["threads"] >= 1
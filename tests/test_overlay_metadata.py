@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from detection.results import Detections
+
+
+def test_payload_is_compact_and_flat(webapp):
+    detections = Detections(
+        [[1, 2, 3, 4], [5, 6, 7, 8]], [0.91234, 0.5], [5, 2], {2: "a", 5: "b"}
+    )
+    payload = webapp.detection_payload(detections, 42, 1700000000.12345)
+    assert payload["seq"] == 42
+    assert payload["ts"] == 1700000000.123
+    assert payload["boxes"] == [1, 2, 3, 4, 5, 6, 7, 8]
+    assert payload["classes"] == [5, 2]
+    assert payload["scores"] == pytest.approx([0.912, 0.5])
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("0", 0.0),
+        ("0.35", 0.35),
+        (1, 1.0),
+        ("abc", None),
+        ("-0.1", None),
+        ("1.01", None),
+        ("nan", None),
+        (None, None),
+    ],
+)
+def test_parse_confidence(webapp, value, expected):
+    assert webapp.parse_confidence(value) == expected
+
+
+def test_metadata_stream_starts_with_meta_then_detections(webapp, source):
+    records = webapp.generate_detection_metadata(source.id, 0.0, "ndjson")
+    meta = json.loads(next(records))
+    assert meta["event"] == "meta"
+    assert meta["data"]["width"] == 64 and meta["data"]["height"] == 48
+    assert meta["data"]["names"]["5"] == "Person"
+
+    record = json.loads(next(records))
+    assert record["event"] == "detections"
+    assert 0 < record["data"]["seq"] <= source.frames_read
+    assert len(record["data"]["boxes"]) == 4 * len(record["data"]["classes"])
+    records.close()
+
+
+def test_server_side_threshold_drops_weak_detections(webapp, source):
+    records = webapp.generate_detection_metadata(source.id, 0.95, "sse")
+    assert next(records).startswith("event: meta\n")
+    record = next(records)
+    assert record.startswith("event: detections\n")
+    data = json.loads(record.split("data: ", 1)[1])
+    assert data["scores"] == []  # The fake detector never scores 0.95
+    records.close()
+
+
+def test_metadata_route_errors(client, source):
+    url = f"/source_detections/{source.id}"
+    assert client.get(url + "?conf=abc").status_code == 400
+    assert client.get(url + "?format=xml").status_code == 400
+    assert client.get("/source_detections/missing").status_code == 404
+
+
+def test_metadata_of_a_removed_source_ends_quietly(webapp):
+    assert list(webapp.generate_detection_metadata("missing")) == []
@@ -0,0 +1,119 @@
+import queue
+import threading
+import time
+
+import pytest
+
+from pipeline import Stage, StagedPipeline, StageQueue
+
+
+def drain(q):
+    items = []
+    while len(q):
+        items.append(q.get()[0])
+    return items
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        StageQueue(1, "drop_random")
+
+
+def test_drop_oldest_keeps_the_newest_items():
+    q = StageQueue(2, "drop_oldest")
+    assert all(q.put(i) for i in range(5))
+    assert drain(q) == [3, 4]
+    assert q.dropped == 3
+
+
+def test_drop_newest_keeps_the_first_items():
+    q = StageQueue(2, "drop_newest")
+    assert [q.put(i) for i in range(4)] == [True, True, False, False]
+    assert drain(q) == [0, 1]
+    assert q.dropped == 2
+
+
+def test_block_waits_for_the_consumer():
+    q = StageQueue(1, "block")
+    q.put("first")
+    put_done = threading.Event()
+
+    def producer():
+        q.put("second")
+        put_done.set()
+
+    threading.Thread(target=producer, daemon=True).start()
+    assert not put_done.wait(0.1)
+    assert q.get()[0] == "first"
+    assert put_done.wait(1)
+    assert q.get()[0] == "second"
+    assert q.dropped == 0
+
+
+def test_blocked_producer_gives_up_when_stopped():
+    q = StageQueue(1, "block")
+    q.put("first")
+    stop = threading.Event()
+    stop.set()
+    # The stop wins over waiting: the item is counted as dropped
+    assert q.put("second", stop.is_set) is False
+    assert q.dropped == 1
+
+
+def test_hand_off_wakes_the_consumer_without_polling():
+    q = StageQueue(1, "drop_oldest")
+    received = []
+
+    def consumer():
+        received.append(q.get(lambda: False))
+
+    thread = threading.Thread(target=consumer)
+    thread.start()
+    time.sleep(0.05)
+    sent = time.perf_counter()
+    q.put("frame")
+    thread.join(1)
+    woke = time.perf_counter() - sent
+    [(item, queued)] = received
+    assert item == "frame"
+    assert woke < 0.05  # Far below the stop poll interval
+    assert queued < 0.05
+
+
+def test_get_raises_empty_once_stopped():
+    with pytest.raises(queue.Empty):
+        StageQueue(1).get(lambda: True)
+
+
+def test_stage_returns_none_when_stopped():
+    assert Stage("detection", StageQueue(1)).get(lambda: True) is None
+
+
+def test_stage_times_its_items():
+    stage = Stage("events", StageQueue(4, "block"))
+    stage.put("item")
+    assert stage.get(lambda: False) == "item"
+    with stage.timed():
+        time.sleep(0.02)
+    stats = stage.as_dict(uptime=1.0)
+    assert stats["items"] == 1
+    assert stats["busy_ms"] >= 20
+    assert stats["max_busy_ms"] == stats["last_busy_ms"]
+    assert stats["queue_size"] == 4
+    assert stats["policy"] == "block"
+    assert stats["queued_ms"] is not None
+
+
+def test_pipeline_reports_every_stage():
+    pipeline = StagedPipeline({"capture": None, "detection": (1, "drop_oldest")})
+    assert "queue_depth" not in pipeline.as_dict()["stages"]["capture"]
+    assert pipeline["detection"].inbox.policy == "drop_oldest"
+    assert pipeline.as_dict()["end_to_end_ms"] is None
+    pipeline.record_latency(time.time() - 0.1)
+    assert pipeline.as_dict()["end_to_end_ms"] >= 100
+
+
+def test_source_health_includes_stage_timings(webapp, client, source):
+    health = webapp.source_health(source)
+    assert set(health["pipeline"]["stages"]) == set(webapp.SOURCE_STAGES)
+    assert health["pipeline"]["stages"]["events"]["policy"] == "block"
@@ -0,0 +1,81 @@
+import os
+import queue
+import time
+
+import numpy as np
+
+from recorder import ClipRecorder, FrameHistory, write_clip
+
+
+def frame(width=64, height=48, level=0):
+    return np.full((height, width, 3), level, dtype=np.uint8)
+
+
+def filled_history(start, count, fps=5, seconds=10):
+    history = FrameHistory(seconds, fps=fps, width=32)
+    for i in range(count):
+        # A little over the interval apart, so float rounding never skips one
+        history.add(frame(level=i), i, start + i * (1.001 / fps))
+    return history
+
+
+def test_history_is_rate_limited_and_downscaled():
+    history = FrameHistory(10, fps=5, width=32)
+    for i in range(10):
+        history.add(frame(), i, 100 + i * 0.11)  # ~9 fps in, every other kept
+    frames = history.between(0, 200)
+    assert [number for _, number, _ in frames] == [0, 2, 4, 6, 8]
+    assert history.size_bytes == sum(len(jpeg) for _, _, jpeg in frames)
+
+
+def test_history_evicts_frames_older_than_its_window():
+    history = filled_history(100, 20, fps=5, seconds=2)
+    timestamps = [t for t, _, _ in history.between(0, 200)]
+    assert timestamps[0] >= timestamps[-1] - 2
+    assert len(timestamps) == 10
+
+
+def test_claim_then_store_on_another_thread():
+    history = FrameHistory(10, fps=1)
+    assert history.claim(100.0)
+    assert not history.claim(100.5)
+    history.store(frame(), 1, 100.0)
+    assert len(history.between(99, 101)) == 1
+
+
+def test_write_clip(tmp_path):
+    history = filled_history(100, 5)
+    path = write_clip(history.between(0, 200), str(tmp_path / "clip"), fps=5)
+    assert path is not None and os.path.getsize(path) > 0
+
+
+def test_recorder_writes_the_window_around_the_event(tmp_path):
+    now = time.time()
+    history = filled_history(now - 2, 15)  # Two seconds before to one after
+    recorder = ClipRecorder(str(tmp_path), pre_seconds=1, post_seconds=0.5)
+    done = queue.Queue()
+    recorder.record(history, now, "event", lambda *args: done.put(args))
+
+    filename, offset = done.get(timeout=5)
+    assert filename.startswith("event.")
+    assert os.path.exists(tmp_path / filename)
+    assert 0.5 <= offset <= 1.0
+
+
+def test_recorder_survives_a_failing_callback(tmp_path):
+    history = filled_history(time.time() - 1, 5)
+    recorder = ClipRecorder(str(tmp_path), pre_seconds=1, post_seconds=0)
+    done = queue.Queue()
+
+    def failing(filename, offset):
+        raise OSError("evidence store is full")
+
+    recorder.record(history, time.time(), "first", failing)
+    recorder.record(history, time.time(), "second", lambda *args: done.put(args))
+    assert done.get(timeout=5)[0].startswith("second.")
+
+
+def test_sources_keep_history_beyond_the_clip_window(webapp, source):
+    config = webapp.app.config
+    window = config["CLIP_PRE_SECONDS"] + config["CLIP_POST_SECONDS"]
+    assert source.history.seconds > window
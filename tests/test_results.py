@@ -0,0 +1,54 @@
+import numpy as np
+
+from detection.results import Detections
+
+NAMES = {0: "Hardhat", 1: "NO-Hardhat", 2: "Person"}
+
+
+def sample():
+    return Detections(
+        [[0, 0, 10, 10], [5, 5, 20, 20], [1, 2, 3, 4]],
+        [0.15, 0.6, 0.9],
+        [1, 0, 2],
+        NAMES,
+    )
+
+
+def test_filter_applies_a_threshold_without_touching_the_original():
+    detections = sample()
+    above = detections.filter(0.5)
+    assert len(above) == 2
+    assert above.class_names() == ["Hardhat", "Person"]
+    assert len(detections) == 3
+
+
+def test_filter_by_class_names():
+    person_only = sample().filter(0.1, classes={"Person"})
+    assert person_only.class_names() == ["Person"]
+    assert person_only.boxes.tolist() == [[1, 2, 3, 4]]
+
+
+def test_each_consumer_filters_the_same_raw_detections():
+    detections = sample()
+    thresholds = {0.1: 3, 0.5: 2, 0.95: 0}
+    for conf, expected in thresholds.items():
+        assert len(detections.filter(conf)) == expected
+
+
+def test_empty_detections():
+    empty = Detections.empty(NAMES)
+    assert len(empty) == 0
+    assert empty.boxes.shape == (0, 4)
+    assert len(empty.filter(0.5)) == 0
+
+
+def test_scaled_rounds_boxes_and_keeps_scores():
+    scaled = Detections([[1, 1, 3, 3]], [0.5], [0], NAMES).scaled(1.5)
+    assert scaled.boxes.tolist() == [[2, 2, 4, 4]]
+    assert np.allclose(scaled.confidences, [0.5])
+
+
+def test_iteration_and_legacy_labels():
+    detections = sample().filter(0.5)
+    assert list(detections)[0][:2] == ((5, 5, 20, 20), "Hardhat")
+    assert detections.to_labelled()[1] == ((1, 2, 3, 4), "Person 0.90")
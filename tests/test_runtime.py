@@ -0,0 +1,63 @@
+import json
+import os
+import sys
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from detection import runtime
+from detection.runtime import ThreadBudget, candidate_splits, split_cores
+
+
+@pytest.mark.parametrize(
+    "policy, expected",
+    [
+        ("latency", (1, 16)),
+        ("throughput", (8, 2)),
+        ("balanced", (4, 4)),
+        ("2x3", (2, 3)),
+        ("0x0", (1, 1)),
+    ],
+)
+def test_split_cores(policy, expected):
+    assert split_cores(16, policy) == expected
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        split_cores(4, "fastest")
+
+
+def test_candidate_splits_use_every_core():
+    assert candidate_splits(8) == [(1, 8), (2, 4), (4, 2), (8, 1)]
+
+
+def test_auto_uses_the_benchmark_for_this_machine(tmp_path, monkeypatch):
+    benchmark = tmp_path / "runtime_benchmark.json"
+    benchmark.write_text(json.dumps({"cores": 8, "best": {"lanes": 8, "threads": 1}}))
+    monkeypatch.setattr(runtime, "BENCHMARK_FILE", benchmark)
+    assert ThreadBudget("auto", cores=8).lanes == 8
+    # Measured on another machine: fall back to balanced
+    assert ThreadBudget("auto", cores=16).as_dict()["threads_per_lane"] == 4
+
+
+def test_torch_threads_are_set_once_for_the_process(monkeypatch):
+    calls = []
+    fake_torch = SimpleNamespace(
+        set_num_threads=lambda n: calls.append(("intra", n)),
+        set_num_interop_threads=lambda n: calls.append(("interop", n)),
+    )
+    monkeypatch.setitem(sys.modules, "torch", fake_torch)
+    monkeypatch.delenv("OMP_NUM_THREADS", raising=False)
+    budget = ThreadBudget("4x2", cores=8)
+
+    threads = [threading.Thread(target=budget.bind_current_thread) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    budget.bind_current_thread()
+
+    assert sorted(calls) == [("interop", 1), ("intra", 2)]
+    assert os.environ["OMP_NUM_THREADS"] == "2"
@@ -0,0 +1,99 @@
+import threading
+import time
+
+import pytest
+
+from scheduler import TRICKLE_FPS, InferenceScheduler
+
+
+def test_every_source_runs_at_its_maximum_without_measurements():
+    scheduler = InferenceScheduler()
+    scheduler.register("a", max_fps=5)
+    scheduler.register("b", max_fps=8)
+    assert scheduler.allocated_fps("a") == 5
+    assert scheduler.allocated_fps("b") == 8
+
+
+def test_minimums_first_then_spare_capacity_by_priority():
+    scheduler = InferenceScheduler(capacity_fps=10)
+    scheduler.register("high", priority=2, min_fps=1, max_fps=6)
+    scheduler.register("low", priority=1, min_fps=2, max_fps=10)
+    assert scheduler.allocated_fps("high") == pytest.approx(6)
+    assert scheduler.allocated_fps("low") == pytest.approx(4)
+
+
+def test_same_priority_sources_share_spare_capacity_evenly():
+    scheduler = InferenceScheduler(capacity_fps=9)
+    scheduler.register("a", min_fps=1, max_fps=2)
+    scheduler.register("b", min_fps=1, max_fps=10)
+    scheduler.register("c", min_fps=1, max_fps=10)
+    # "a" is capped at 2; what it cannot take goes to the other two
+    assert scheduler.allocated_fps("a") == pytest.approx(2)
+    assert scheduler.allocated_fps("b") == pytest.approx(3.5)
+    assert scheduler.allocated_fps("c") == pytest.approx(3.5)
+
+
+def test_starved_sources_are_reported_and_still_trickle():
+    scheduler = InferenceScheduler(capacity_fps=1)
+    scheduler.register("first", priority=2, min_fps=1)
+    scheduler.register("starved", priority=1, min_fps=1)
+    assert scheduler.allocated_fps("starved") == TRICKLE_FPS
+    assert scheduler.status()["under_served"] == ["starved"]
+
+
+def test_update_keeps_max_at_least_min():
+    scheduler = InferenceScheduler(capacity_fps=100)
+    scheduler.register("a", min_fps=1, max_fps=5)
+    assert scheduler.update("a", min_fps=8)
+    assert scheduler.status()["sources"]["a"]["max_fps"] == 8
+    assert not scheduler.update("missing", priority=3)
+
+
+def test_capacity_follows_measured_latency():
+    scheduler = InferenceScheduler(lanes=2, headroom=1.0, rebalance_interval=0)
+    scheduler.register("a", min_fps=1, max_fps=100)
+    scheduler.record("a", 0.1)
+    assert scheduler.capacity() == pytest.approx(20)
+    assert scheduler.allocated_fps("a") == pytest.approx(20)
+
+
+def test_unknown_sources_get_the_default_rate():
+    scheduler = InferenceScheduler()
+    assert scheduler.allocated_fps("missing") == TRICKLE_FPS
+    assert scheduler.allocated_fps("missing", default=3) == 3
+
+
+def test_wait_turn_paces_a_source_without_bursting():
+    scheduler = InferenceScheduler(capacity_fps=20)
+    scheduler.register("a", min_fps=20, max_fps=20)
+    started = time.time()
+    for _ in range(5):
+        assert scheduler.wait_turn("a")
+    # At most one slot is owed on arrival; after that one turn every 50 ms
+    assert 0.14 <= time.time() - started < 0.5
+    scheduler.unregister("a")
+    assert not scheduler.wait_turn("a")
+
+
+def test_lanes_bound_concurrent_inference():
+    scheduler = InferenceScheduler(lanes=2)
+    scheduler.register("a")
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def infer():
+        with scheduler.slot("a"):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+
+    threads = [threading.Thread(target=infer) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak[0] == 2
+    assert scheduler.avg_latency >= 0.05
@@ -0,0 +1,93 @@
+import json
+import os
+
+import pytest
+
+
+@pytest.fixture
+def settings(webapp, client):
+    """SETTINGS_CONFIG's path; the settings are put back after the test."""
+    names = ("email_alert_enabled", "email_recipient", "default_confidence")
+    saved = {name: getattr(webapp, name) for name in names}
+    yield webapp.app.config["SETTINGS_CONFIG"]
+    for name, value in saved.items():
+        setattr(webapp, name, value)
+    webapp.save_settings()
+
+
+def read(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_from_another_worker(path, **changes):
+    """Rewrite the settings file with a later mtime, as a sibling worker would."""
+    settings = dict(read(path), **changes)
+    mtime = os.stat(path).st_mtime_ns
+    with open(path, "w") as f:
+        json.dump(settings, f)
+    os.utime(path, ns=(mtime + 10**9, mtime + 10**9))
+
+
+def test_api_settings_are_saved(webapp, client, settings):
+    response = client.post(
+        "/api/settings",
+        json={"confidence_threshold": 0.7, "email_recipient": "ops@example.com"},
+    )
+    assert response.status_code == 200
+    assert read(settings)["confidence_threshold"] == 0.7
+    assert read(settings)["email_recipient"] == "ops@example.com"
+
+
+def test_submitted_email_settings_are_saved(webapp, client, settings):
+    response = client.post(
+        "/submit",
+        data={"alert_email_checkbox": "on", "alert_email_textbox": "a@example.com"},
+    )
+    assert response.status_code == 200
+    assert read(settings)["email_alert_enabled"] is True
+    assert read(settings)["email_recipient"] == "a@example.com"
+
+
+def test_requests_see_settings_saved_by_another_worker(webapp, client, settings):
+    client.post("/api/settings", json={"confidence_threshold": 0.5})
+    write_from_another_worker(settings, confidence_threshold=0.3)
+    client.get("/healthz")
+    assert webapp.default_confidence == 0.3
+
+
+def test_unchanged_settings_file_is_not_reread(webapp, client, settings):
+    client.post("/api/settings", json={"confidence_threshold": 0.6})
+    webapp.default_confidence = 0.4  # Not saved: the file is no newer
+    webapp.refresh_settings()
+    assert webapp.default_confidence == 0.4
+
+
+def test_unreadable_settings_file_is_ignored(webapp, client, settings):
+    client.post("/api/settings", json={"confidence_threshold": 0.6})
+    with open(settings, "w") as f:
+        f.write("{not json")
+    webapp.refresh_settings()
+    assert webapp.default_confidence == 0.6
+
+
+@pytest.mark.parametrize(
+    "path, local",
+    [
+        ("/healthz", True),
+        ("/readyz", True),
+        ("/screening", True),
+        ("/static/js/app.js", True),
+        ("/api/screening/detect", True),
+        ("/api/screening/sites", True),
+        ("/api/sources", False),
+        ("/events", False),
+        ("/video_feed/abc", False),
+        ("/api/screening/detect/extra", False),
+    ],
+)
+def test_only_stateless_routes_stay_on_non_owner_workers(webapp, path, local):
+    pytest.importorskip("uvicorn")
+    import serve
+
+    assert bool(serve.LOCAL_ROUTES.match(path)) is local
@@ -0,0 +1,63 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_importing_the_app_loads_no_model_framework(tmp_path):
+    code = (
+        "import sys, app; "
+        "print(sorted(m for m in ('torch', 'ultralytics') if m in sys.modules))"
+    )
+    env = dict(
+        os.environ,
+        PYTHONPATH=ROOT,
+        ANALYSIS_DETECTOR="fake",
+        SCREENING_DETECTOR="fake",
+        DETECTION_CACHE_DIR="",
+        TRACE_DIR="",
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=tmp_path,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == "[]"
+
+
+def test_probes_once_started(webapp, client):
+    assert client.get("/healthz").status_code == 200
+    state = client.get("/readyz").get_json()
+    assert state["ready"] and state["model_ready"] and state["sources_restored"]
+    assert state["error"] is None
+    # The analysis model is warm before the first live frame
+    assert webapp.analysis_models.live.shared is not None
+
+
+def test_startup_runs_once(webapp, client, monkeypatch):
+    calls = []
+    monkeypatch.setattr(webapp, "run_startup", lambda: calls.append(1))
+    webapp.start_background_startup()
+    assert calls == []
+
+
+def test_sources_are_saved_atomically_and_restored(webapp, client, source):
+    source.persistent = True
+    webapp.save_sources_config()
+    path = webapp.app.config["SOURCES_CONFIG"]
+    assert not os.path.exists(path + ".tmp")
+    with open(path) as f:
+        saved = json.load(f)
+    assert [config["id"] for config in saved] == [source.id]
+
+    webapp.remove_source(source.id)
+    webapp.restore_sources()
+    restored = webapp.sources[source.id]
+    assert restored.persistent
+    assert restored.path == "clip.avi"
@@ -0,0 +1,135 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from streaming import (
+    FrameSignal,
+    mjpeg_part,
+    ndjson_line,
+    sse_message,
+    stream_response,
+)
+
+
+def run_asgi(application, path, query=b"", disconnect_after=0.3):
+    """Call an ASGI app; the client disconnects after ``disconnect_after`` s."""
+    messages = []
+
+    async def receive():
+        await asyncio.sleep(disconnect_after)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": path,
+        "query_string": query,
+        "headers": [],
+    }
+    asyncio.run(asyncio.wait_for(application(scope, receive, send), 5))
+    body = b"".join(m.get("body", b"") for m in messages[1:])
+    return messages[0]["status"], body
+
+
+def test_mjpeg_part_carries_length_seq_and_time():
+    part = mjpeg_part(b"JPEG", seq=7, captured_at=12.5)
+    assert part.startswith(b"--frame\r\nContent-Type: image/jpeg\r\n")
+    assert b"Content-Length: 4\r\n" in part
+    assert b"X-Frame-Seq: 7\r\n" in part
+    assert b"X-Frame-Time: 12.500\r\n" in part
+    assert part.endswith(b"\r\n\r\nJPEG\r\n")
+
+
+def test_sse_and_ndjson_records():
+    assert sse_message("stats", {"a": 1}) == 'event: stats\ndata: {"a": 1}\n\n'
+    line = ndjson_line("stats", {"a": 1})
+    assert line.endswith("\n")
+    assert json.loads(line) == {"event": "stats", "data": {"a": 1}}
+
+
+def test_frame_signal_wakes_threads_and_tasks():
+    signal = FrameSignal()
+    assert signal.wait(0, timeout=0.01) == 0
+
+    threading.Timer(0.05, signal.notify).start()
+    assert signal.wait(0, timeout=2) == 1
+
+    async def waiter():
+        asyncio.get_running_loop().call_later(0.05, signal.notify)
+        return await signal.wait_async(1, timeout=2)
+
+    assert asyncio.run(waiter()) == 2
+
+
+def test_stream_response_stops_and_closes_the_body_on_disconnect():
+    closed = []
+
+    async def body():
+        try:
+            while True:
+                yield "tick\n"
+                await asyncio.sleep(0.01)
+        finally:
+            closed.append(True)
+
+    async def app(scope, receive, send):
+        await stream_response(send, receive, "text/plain", body())
+
+    status, chunks = run_asgi(app, "/", disconnect_after=0.1)
+    assert status == 200
+    assert chunks.startswith(b"tick\n")
+    assert closed == [True]
+
+
+def test_stream_response_ends_with_the_body():
+    messages = []
+
+    async def body():
+        yield b"only"
+
+    async def receive():
+        await asyncio.sleep(10)
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(stream_response(send, receive, "text/plain", body()))
+    assert messages[-1]["body"] == b""
+    assert messages[-1]["more_body"] is False
+
+
+@pytest.fixture
+def asgi_app(client):
+    import asgi
+
+    return asgi.application
+
+
+def test_asgi_rejects_unknown_stream_variants(asgi_app, source):
+    status, body = run_asgi(
+        asgi_app, f"/source_video_raw/{source.id}", b"variant=huge"
+    )
+    assert status == 400
+    assert json.loads(body)["error"] == "Unknown stream variant: huge"
+
+
+def test_asgi_streams_frames_of_a_source(asgi_app, source):
+    status, body = run_asgi(asgi_app, f"/source_video_raw/{source.id}")
+    assert status == 200
+    assert body.startswith(b"--frame\r\nContent-Type: image/jpeg")
+    assert b"X-Frame-Seq: " in body
+
+
+def test_asgi_detection_stream_starts_with_metadata(asgi_app, source):
+    status, body = run_asgi(
+        asgi_app, f"/source_detections/{source.id}", b"format=ndjson"
+    )
+    assert status == 200
+    first = json.loads(body.split(b"\n", 1)[0])
+    assert first["event"] == "meta"
+    assert first["data"]["width"] == 64
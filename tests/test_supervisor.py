@@ -0,0 +1,108 @@
+import threading
+import time
+
+import pytest
+
+from supervisor import SourceLimitError, SourceSupervisor
+
+
+def wait_for(condition, timeout=3.0):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "condition never became true"
+        time.sleep(0.01)
+
+
+def test_reservations_count_against_the_source_cap():
+    supervisor = SourceSupervisor(max_sources=2)
+    supervisor.reserve("a")
+    supervisor.reserve("a")  # Idempotent
+    supervisor.reserve("b")
+    with pytest.raises(SourceLimitError):
+        supervisor.reserve("c")
+    supervisor.release("b")
+    supervisor.reserve("c")
+
+
+def test_concurrent_admission_never_overshoots():
+    supervisor = SourceSupervisor(max_sources=3)
+    barrier = threading.Barrier(12)
+    admitted = []
+
+    def add(i):
+        barrier.wait()
+        try:
+            supervisor.reserve(f"s{i}")
+            admitted.append(i)
+        except SourceLimitError:
+            pass
+
+    threads = [threading.Thread(target=add, args=(i,)) for i in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(admitted) == 3
+
+
+def test_memory_cap(monkeypatch):
+    monkeypatch.setattr("supervisor.process_rss_bytes", lambda: 600 * 2**20)
+    with pytest.raises(SourceLimitError, match="Memory limit"):
+        SourceSupervisor(memory_limit_mb=512).reserve("a")
+
+
+def test_start_turns_a_reservation_into_a_pipeline():
+    supervisor = SourceSupervisor(max_sources=1)
+    supervisor.reserve("a")
+    stop = threading.Event()
+    supervisor.start("a", {"worker": lambda: stop.wait()}, stop)
+    supervisor.release("a")  # No-op once started
+    with pytest.raises(SourceLimitError):
+        supervisor.reserve("b")
+    assert supervisor.health("a")["state"] == "running"
+
+    assert supervisor.stop("a")
+    assert not supervisor.stop("a")
+    assert supervisor.health("a") is None
+    supervisor.reserve("b")
+
+
+def test_crashing_workers_restart_with_backoff():
+    supervisor = SourceSupervisor(backoff_initial=0.05, backoff_max=0.1)
+    stop = threading.Event()
+    runs = []
+
+    def flaky():
+        runs.append(time.time())
+        if len(runs) < 3:
+            raise RuntimeError("camera went away")
+        stop.wait()
+
+    supervisor.start("a", {"capture": flaky}, stop)
+    wait_for(lambda: len(runs) == 3)
+    health = supervisor.health("a")
+    assert health["restarts"] == 2
+    assert health["errors"] == {"capture": 2}
+    assert health["last_error"] == "capture: RuntimeError: camera went away"
+    assert runs[2] - runs[1] >= runs[1] - runs[0] >= 0.05
+    supervisor.stop("a")
+
+
+def test_stop_joins_workers():
+    supervisor = SourceSupervisor()
+    stop = threading.Event()
+    supervisor.start("a", {"w1": lambda: stop.wait(), "w2": lambda: stop.wait()}, stop)
+    pipeline = supervisor._pipelines["a"]
+    supervisor.stop("a")
+    assert pipeline.state == "stopped"
+    assert not any(thread.is_alive() for thread in pipeline.threads.values())
+    assert supervisor.status()["sources"] == {}
+
+
+def test_api_refuses_sources_beyond_the_cap(webapp, client, source, monkeypatch):
+    running = len(webapp.supervisor.status()["sources"])
+    monkeypatch.setattr(webapp.supervisor, "max_sources", running)
+    response = client.post("/api/sources", json={"type": "file", "path": "clip.avi"})
+    assert response.status_code == 503
+    assert "Source limit reached" in response.get_json()["error"]
+    assert len(webapp.supervisor.status()["sources"]) == running
@@ -0,0 +1,112 @@
+import json
+import time
+
+import pytest
+
+from tracing import FrameTrace, TraceRecorder
+
+
+def finished(recorder, source_id="s1", seq=1, age=0.0, laps=("detection",)):
+    trace = FrameTrace(source_id, seq, time.time() - age)
+    for name in laps:
+        trace.lap(name)
+    recorder.finish(trace)
+    return trace
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.time() + timeout
+    while not predicate():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_laps_are_contiguous_and_add_up():
+    trace = FrameTrace("s1", 7, time.time() - 0.05)
+    trace.lap("capture")
+    time.sleep(0.01)
+    trace.lap("inference")
+    (_, first_start, first_end), (_, second_start, second_end) = trace.spans
+    assert first_start == trace.captured_at
+    assert second_start == first_end
+    assert trace.total == pytest.approx(second_end - trace.captured_at)
+
+    spans = trace.as_dict()["spans"]
+    assert [s["name"] for s in spans] == ["capture", "inference"]
+    assert spans[0]["offset_ms"] == 0
+    assert sum(s["ms"] for s in spans) == pytest.approx(
+        trace.as_dict()["total_ms"], abs=0.05
+    )
+
+
+def test_glass_to_alert_keeps_the_first_alert():
+    trace = FrameTrace("s1", 1, time.time() - 0.2)
+    assert trace.glass_to_alert is None
+    trace.alerted()
+    first = trace.alerted_at
+    trace.alerted()
+    assert trace.alerted_at == first
+    assert trace.glass_to_alert >= 0.2
+
+
+def test_recent_filters_by_window_and_source():
+    recorder = TraceRecorder(directory=None)
+    finished(recorder, "s1", age=600)
+    new = finished(recorder, "s1")
+    other = finished(recorder, "s2")
+    assert recorder.recent(300) == [new, other]
+    assert recorder.recent(300, source_id="s2") == [other]
+
+
+def test_report_lists_the_slowest_frames_first():
+    recorder = TraceRecorder(directory=None)
+    for seq, age in enumerate((0.1, 0.3, 0.2)):
+        finished(recorder, seq=seq, age=age, laps=("capture", "inference"))
+    report = recorder.report(limit=2)
+    assert report["frames"] == 3
+    assert [t["seq"] for t in report["slowest"]] == [1, 2]
+    assert set(report["stages_ms"]) == {"capture", "inference"}
+    assert report["glass_to_alert_ms"]["count"] == 0
+
+
+def test_sampled_traces_are_exported_as_json_lines(tmp_path):
+    recorder = TraceRecorder(directory=str(tmp_path), sample_rate=1.0)
+    for seq in range(3):
+        finished(recorder, seq=seq)
+    wait_for(lambda: recorder.exported == 3)
+    (path,) = tmp_path.glob("traces-*.jsonl")
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line["seq"] for line in lines] == [0, 1, 2]
+    assert lines[0]["outcome"] == "analysed"
+
+
+def test_alerted_traces_are_always_exported(tmp_path):
+    recorder = TraceRecorder(directory=str(tmp_path), sample_rate=0.0)
+    finished(recorder, seq=1)
+    trace = FrameTrace("s1", 2, time.time())
+    trace.alerted()
+    recorder.finish(trace, "alerted")
+    wait_for(lambda: recorder.exported == 1)
+    (path,) = tmp_path.glob("traces-*.jsonl")
+    assert json.loads(path.read_text())["seq"] == 2
+
+
+def test_traces_route_shows_a_running_source(client, source):
+    wait_for(lambda: source.frames_read > 5, timeout=5)
+    deadline = time.time() + 5
+    while True:
+        report = client.get(f"/api/traces?source={source.id}").get_json()
+        if report["frames"] or time.time() > deadline:
+            break
+        time.sleep(0.05)
+    assert report["frames"] > 0
+    slowest = report["slowest"][0]
+    assert slowest["source_id"] == source.id
+    names = [span["name"] for span in slowest["spans"]]
+    assert names[:3] == ["capture", "detection_queue", "inference"]
+
+
+def test_traces_route_validates_its_arguments(client):
+    assert client.get("/api/traces?source=missing").status_code == 404
+    assert client.get("/api/traces?window=soon").status_code == 400
+    assert client.get("/api/traces?limit=1.5").status_code == 400
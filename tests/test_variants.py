@@ -0,0 +1,68 @@
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+
+def snapshot(client, source, **params):
+    query = "&".join(f"{k}={v}" for k, v in params.items())
+    return client.get(f"/api/sources/{source.id}/snapshot.jpg?{query}")
+
+
+def wait_for_frame(source, timeout=3.0):
+    deadline = time.time() + timeout
+    while not source.frames_buffer:
+        assert time.time() < deadline, "source produced no frame"
+        time.sleep(0.02)
+
+
+def decode(jpeg):
+    return cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+
+
+def test_snapshot_is_the_latest_frame(client, source):
+    wait_for_frame(source)
+    response = snapshot(client, source)
+    assert response.status_code == 200
+    assert response.mimetype == "image/jpeg"
+    assert int(response.headers["X-Frame-Sequence"]) > 0
+    assert decode(response.data).shape[:2] == (48, 64)
+
+
+def test_tile_variant_is_downscaled(webapp, client, source, monkeypatch):
+    variants = webapp.app.config["STREAM_VARIANTS"]
+    monkeypatch.setitem(variants, "tile", dict(variants["tile"], width=32))
+    wait_for_frame(source)
+    response = snapshot(client, source, variant="tile")
+    assert decode(response.data).shape[:2] == (24, 32)
+
+
+def test_viewers_of_one_view_share_an_encode(webapp, source):
+    wait_for_frame(source)
+    source.set_detection_enabled(False)  # Hold the frame still
+    time.sleep(0.2)
+    first = webapp.encode_source_frame(source, True, 0.5, ["ppe"], "full")
+    second = webapp.encode_source_frame(source, True, 0.5, ["ppe"], "full")
+    assert second[1] is first[1]
+    other = webapp.encode_source_frame(source, False, 0.5, ["ppe"], "full")
+    assert other[0] == first[0]
+    assert other[1] is not first[1]
+
+
+@pytest.mark.parametrize(
+    "params, error",
+    [
+        ({"variant": "huge"}, "Unknown stream variant: huge"),
+        ({"conf": "abc"}, "conf must be a number from 0 to 1"),
+        ({"conf": "1.5"}, "conf must be a number from 0 to 1"),
+    ],
+)
+def test_snapshot_rejects_bad_arguments(client, source, params, error):
+    response = snapshot(client, source, **params)
+    assert response.status_code == 400
+    assert response.get_json()["error"] == error
+
+
+def test_snapshot_of_an_unknown_source(client):
+    assert client.get("/api/sources/missing/snapshot.jpg").status_code == 404
@@ -0,0 +1,249 @@
+import asyncio
+import io
+import json
+import os
+import time
+
+import pytest
+
+import videos
+from conftest import write_video
+from streaming import relay
+from videos import UploadError, VideoLibrary
+
+
+@pytest.fixture
+def library(tmp_path):
+    return VideoLibrary(str(tmp_path / "video"), str(tmp_path / "index"))
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while not predicate():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_uploads_resume_at_the_reported_offset(library):
+    upload = library.create_upload("../site clip.avi", 10)
+    assert upload.filename == "site_clip.avi"
+    upload, name = library.write(upload.id, 0, io.BytesIO(b"0123"))
+    assert (upload.offset, name) == (4, None)
+    assert library.upload(upload.id).offset == 4  # Read back from disk
+
+    with pytest.raises(UploadError) as error:
+        library.write(upload.id, 0, io.BytesIO(b"0123"))
+    assert (error.value.status, error.value.offset) == (409, 4)
+
+    upload, name = library.write(upload.id, 4, io.BytesIO(b"456789"), chunk_size=2)
+    assert name == "site_clip.avi"
+    with open(f"{library.directory}/{name}", "rb") as f:
+        assert f.read() == b"0123456789"
+    assert library.uploads() == []
+
+
+def test_extra_bytes_are_refused_and_the_chunk_rolled_back(library):
+    upload = library.create_upload("clip.avi", 4)
+    with pytest.raises(UploadError) as error:
+        library.write(upload.id, 0, io.BytesIO(b"012345"))
+    assert (error.value.status, error.value.offset) == (413, 0)
+    assert library.upload(upload.id).offset == 0
+
+
+@pytest.mark.parametrize(
+    "filename, size, status",
+    [("notes.txt", 10, 400), ("clip.avi", "many", 400), ("clip.avi", 0, 400)],
+)
+def test_invalid_uploads_are_rejected(library, filename, size, status):
+    with pytest.raises(UploadError) as error:
+        library.create_upload(filename, size)
+    assert error.value.status == status
+
+
+def test_oversized_uploads_are_rejected(tmp_path):
+    library = VideoLibrary(
+        str(tmp_path / "video"), str(tmp_path / "index"), max_upload_bytes=5
+    )
+    with pytest.raises(UploadError) as error:
+        library.create_upload("clip.avi", 6)
+    assert error.value.status == 413
+
+
+def test_an_upload_being_written_cannot_be_cancelled(library):
+    upload = library.create_upload("clip.avi", 4)
+    library._writing.add(upload.id)
+    with pytest.raises(UploadError) as error:
+        library.cancel(upload.id)
+    assert error.value.status == 409
+    with pytest.raises(UploadError):
+        library.write(upload.id, 0, io.BytesIO(b"0123"))
+    library._writing.discard(upload.id)
+    assert library.cancel(upload.id)
+    assert not library.cancel(upload.id)
+
+
+def test_abandoned_uploads_expire(library):
+    upload = library.create_upload("clip.avi", 4)
+    library.expire_uploads(now=time.time() + videos.UPLOAD_TTL + 1)
+    with pytest.raises(UploadError):
+        library.upload(upload.id)
+
+
+def test_completed_files_never_overwrite(library):
+    for _ in range(2):
+        upload = library.create_upload("clip.avi", 2)
+        _, name = library.write(upload.id, 0, io.BytesIO(b"ab"))
+    assert name == "clip-1.avi"
+
+
+def test_videos_are_probed_once_and_cached(library, monkeypatch):
+    write_video(f"{library.directory}/clip.avi", frames=20)
+    entry = library.info("clip.avi")
+    assert entry["status"] == "ready"
+    assert (entry["frames"], entry["fps"], entry["duration"]) == (20, 10, 2)
+    assert (entry["width"], entry["height"]) == (64, 48)
+    assert entry["thumbnail"] == "clip.avi.jpg"
+
+    monkeypatch.setattr(library, "_probe", lambda name: pytest.fail("re-probed"))
+    assert library.info("clip.avi") == entry
+    assert VideoLibrary(library.directory, library.index_dir).info("clip.avi") == entry
+    with open(f"{library.index_dir}/index.json") as f:
+        assert json.load(f)["videos"]["clip.avi"]["frames"] == 20
+
+
+def test_header_count_is_used_without_packet_access(library, monkeypatch):
+    monkeypatch.setattr(videos, "HAS_PACKET_ACCESS", False)
+    write_video(f"{library.directory}/clip.avi", frames=20)
+    entry = library.info("clip.avi")
+    assert entry["frames"] == 20
+    assert entry["keyframes"] is None
+    assert entry["status"] == "ready"
+
+
+def test_listing_queues_new_files_without_probing_them(library):
+    write_video(f"{library.directory}/clip.avi")
+    (summary,) = library.summaries()
+    assert summary["status"] in ("indexing", "ready")
+    wait_for(lambda: library.summaries()[0]["status"] == "ready")
+    assert "keyframes" not in library.summaries()[0]
+
+
+def test_unreadable_files_are_indexed_as_errors(library):
+    with open(f"{library.directory}/broken.avi", "wb") as f:
+        f.write(b"not a video")
+    entry = library.info("broken.avi")
+    assert entry["status"] == "error"
+    assert library.info("../broken.avi") is None
+
+
+def test_upload_routes(webapp, client):
+    data = {"filename": "up.avi", "size": 6}
+    response = client.post("/api/videos/uploads", json=data)
+    assert response.status_code == 201
+    url = f"/api/videos/uploads/{response.get_json()['id']}"
+
+    assert client.patch(url, data=b"abc").status_code == 400  # No Upload-Offset
+    response = client.patch(url, data=b"abc", headers={"Upload-Offset": "0"})
+    assert response.get_json()["offset"] == 3
+    response = client.patch(url, data=b"def", headers={"Upload-Offset": "0"})
+    assert response.status_code == 409
+    assert response.get_json()["offset"] == 3
+    response = client.patch(url, data=b"defg", headers={"Upload-Offset": "3"})
+    assert response.status_code == 413
+    response = client.patch(url, data=b"def", headers={"Upload-Offset": "3"})
+    assert response.get_json()["complete"] is True
+    name = response.get_json()["video"]
+    assert name.startswith("up")
+    assert client.get(url).status_code == 404
+    os.remove(os.path.join(webapp.video_library.directory, name))
+
+
+def test_video_routes_describe_indexed_videos(client):
+    deadline = time.time() + 5
+    while client.get("/api/videos/clip.avi").get_json()["status"] != "ready":
+        assert time.time() < deadline
+        time.sleep(0.05)
+    assert client.get("/api/videos/clip.avi").get_json()["frames"] == 30
+    assert client.get("/api/videos/clip.avi/thumbnail.jpg").status_code == 200
+    assert client.get("/api/videos/missing.avi").status_code == 404
+    names = [v["name"] for v in client.get("/api/videos").get_json()["videos"]]
+    assert "clip.avi" in names
+
+
+def relay_to_upstream(headers, chunks, body_size):
+    """Relay a request to a local server; returns what it got and the reply."""
+    received = []
+
+    async def upstream(reader, writer):
+        head = await reader.readuntil(b"\r\n\r\n")
+        received.append(head + await reader.readexactly(body_size))
+        writer.write(b"HTTP/1.1 201 Created\r\nx-upstream: 1\r\n\r\n")
+        writer.write(b"stored")
+        await writer.drain()
+        writer.close()
+
+    async def main():
+        server = await asyncio.start_server(upstream, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        messages = list(chunks)
+        sent = []
+
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            await asyncio.sleep(10)  # Connected until the response is done
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"method": "PATCH", "path": "/up", "headers": headers}
+        async with server:
+            await relay(
+                lambda: asyncio.open_connection("127.0.0.1", port),
+                scope,
+                receive,
+                send,
+            )
+        return sent
+
+    sent = asyncio.run(asyncio.wait_for(main(), 5))
+    return received[0], sent
+
+
+def test_relay_streams_the_body_and_the_response():
+    chunks = [
+        {"type": "http.request", "body": b"abc", "more_body": True},
+        {"type": "http.request", "body": b"def", "more_body": False},
+    ]
+    request, sent = relay_to_upstream([(b"content-length", b"6")], chunks, 6)
+    head, _, body = request.partition(b"\r\n\r\n")
+    assert head.startswith(b"PATCH /up HTTP/1.1")
+    assert b"content-length: 6" in head
+    assert body == b"abcdef"
+    assert sent[0]["status"] == 201
+    assert (b"x-upstream", b"1") in sent[0]["headers"]
+    assert b"".join(m.get("body", b"") for m in sent[1:]) == b"stored"
+
+
+def test_relay_keeps_unsized_bodies_chunked():
+    chunks = [{"type": "http.request", "body": b"abc", "more_body": False}]
+    headers = [(b"transfer-encoding", b"chunked")]
+    request, _ = relay_to_upstream(headers, chunks, len(b"3\r\nabc\r\n0\r\n\r\n"))
+    head, _, body = request.partition(b"\r\n\r\n")
+    assert b"transfer-encoding: chunked" in head
+    assert body == b"3\r\nabc\r\n0\r\n\r\n"
+
+
+def test_relay_answers_503_when_upstream_is_down():
+    sent = []
+
+    async def refuse():
+        raise ConnectionRefusedError
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"method": "GET", "path": "/", "headers": []}
+    asyncio.run(relay(refuse, scope, None, send, unavailable="Owner down"))
+    assert sent[0]["status"] == 503
+    assert json.loads(sent[1]["body"]) == {"error": "Owner down"}
@@ -0,0 +1,200 @@
+"""
+Per-frame tracing from capture to alert.
+
+Every frame handed to detection carries a :class:`FrameTrace` with its source,
+sequence number and capture time (when ``grab()`` returned). Each stage it
+passes closes a *lap*: a span from the end of the previous lap to now, so
+queue waits show up as their own spans and the laps add up to the frame's
+total latency. When an episode starts on a frame the trace also records the
+moment the alert was published, giving glass-to-alert latency directly; if an
+email goes out, the alerts stage extends the trace until it is sent.
+
+:class:`TraceRecorder` keeps recent traces in memory for the slowest-frames
+endpoint and appends a sample of them, plus every trace that raised an
+alert, to daily JSON Lines files from a background thread.
+"""
+
+import json
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+
+class FrameTrace:
+    """Capture timestamp, sequence number and stage spans of one frame."""
+
+    __slots__ = (
+        "source_id",
+        "seq",
+        "captured_at",
+        "spans",
+        "alerted_at",
+        "outcome",
+        "awaiting_email",
+        "_mark",
+    )
+
+    def __init__(self, source_id: str, seq: int, captured_at: float):
+        self.source_id = source_id
+        self.seq = seq
+        self.captured_at = captured_at
+        self.spans = []  # [(name, start, end)] in time.time() seconds
+        self.alerted_at = None
+        self.outcome = None
+        self.awaiting_email = False  # Finished by the alerts stage instead
+        self._mark = captured_at
+
+    def lap(self, name: str):
+        """Close a span called ``name`` from the previous lap until now."""
+        now = time.time()
+        self.spans.append((name, self._mark, now))
+        self._mark = now
+
+    def alerted(self):
+        """Record that an alert for this frame has just been published."""
+        if self.alerted_at is None:
+            self.alerted_at = time.time()
+
+    @property
+    def total(self) -> float:
+        return self._mark - self.captured_at
+
+    @property
+    def glass_to_alert(self) -> float | None:
+        if self.alerted_at is None:
+            return None
+        return self.alerted_at - self.captured_at
+
+    def as_dict(self) -> dict:
+        glass_to_alert = self.glass_to_alert
+        return {
+            "source_id": self.source_id,
+            "seq": self.seq,
+            "captured_at": round(self.captured_at, 3),
+            "outcome": self.outcome,
+            "total_ms": round(1000 * self.total, 2),
+            "glass_to_alert_ms": (
+                round(1000 * glass_to_alert, 2) if glass_to_alert is not None else None
+            ),
+            "spans": [
+                {
+                    "name": name,
+                    "offset_ms": round(1000 * (start - self.captured_at), 2),
+                    "ms": round(1000 * (end - start), 2),
+                }
+                for name, start, end in self.spans
+            ],
+        }
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+class TraceRecorder:
+    """Recent finished traces, plus a sampled JSON Lines export."""
+
+    def __init__(
+        self,
+        directory: str | None = "traces",
+        sample_rate: float = 0.01,
+        max_recent: int = 5000,
+    ):
+        self.directory = directory or None
+        self.sample_rate = sample_rate
+        self.exported = 0
+        self._recent = deque(maxlen=max_recent)
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=1000)
+        self._worker = None
+
+    def finish(self, trace: FrameTrace, outcome: str = "analysed"):
+        """Record a trace whose last lap has been closed."""
+        trace.outcome = outcome
+        with self._lock:
+            self._recent.append(trace)
+        if self.directory and (
+            trace.alerted_at is not None or random.random() < self.sample_rate
+        ):
+            self._export(trace)
+
+    def _export(self, trace: FrameTrace):
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, daemon=True)
+                self._worker.start()
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            pass  # Tracing must never hold up the pipeline
+
+    def _run(self):
+        os.makedirs(self.directory, exist_ok=True)
+        while True:
+            traces = [self._queue.get()]
+            while not self._queue.empty():
+                traces.append(self._queue.get_nowait())
+            path = os.path.join(self.directory, f"traces-{datetime.now():%Y%m%d}.jsonl")
+            try:
+                with open(path, "a") as f:
+                    for trace in traces:
+                        f.write(json.dumps(trace.as_dict()) + "\n")
+                self.exported += len(traces)
+            except OSError as e:
+                print("Trace export failed:", e)
+
+    def recent(self, window: float = 300, source_id: str | None = None) -> list:
+        """Finished traces captured in the last ``window`` seconds, oldest first."""
+        cutoff = time.time() - window
+        with self._lock:
+            traces = list(self._recent)
+        return [
+            t
+            for t in traces
+            if t.captured_at >= cutoff
+            and (source_id is None or t.source_id == source_id)
+        ]
+
+    def report(self, window: float = 300, source_id=None, limit: int = 20) -> dict:
+        """Latency percentiles and the slowest frames with their stage breakdown."""
+        traces = self.recent(window, source_id)
+        totals = [t.total for t in traces]
+        alerts = [t.glass_to_alert for t in traces if t.alerted_at is not None]
+        stages = {}
+        for trace in traces:
+            for name, start, end in trace.spans:
+                stages.setdefault(name, []).append(end - start)
+
+        def ms(seconds):
+            return round(1000 * seconds, 2) if seconds is not None else None
+
+        return {
+            "window": window,
+            "frames": len(traces),
+            "total_ms": {
+                "p50": ms(percentile(totals, 50)),
+                "p95": ms(percentile(totals, 95)),
+            },
+            "glass_to_alert_ms": {
+                "count": len(alerts),
+                "p50": ms(percentile(alerts, 50)),
+                "p95": ms(percentile(alerts, 95)),
+                "max": ms(max(alerts, default=None)),
+            },
+            "stages_ms": {
+                name: {"p50": ms(percentile(v, 50)), "p95": ms(percentile(v, 95))}
+                for name, v in stages.items()
+            },
+            "slowest": [
+                t.as_dict()
+                for t in sorted(traces, key=lambda t: t.total, reverse=True)[:limit]
+            ],
+            "exported": self.exported,
+        }
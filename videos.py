@@ -0,0 +1,494 @@
+"""
+Video library: resumable uploads and a cached index of video metadata.
+
+Uploads are chunked: a client creates an upload with the file's name and
+size, then sends the bytes in any number of requests, each starting at the
+offset the server reports. Chunks are streamed straight to a ``.part`` file,
+whose size on disk is the upload's offset, so an interrupted upload resumes
+where it stopped, even after a restart. Once the last byte has arrived the
+file is moved into the video directory and queued for indexing.
+
+Indexing runs on a background thread. One pass reads the container's packets
+without decoding them, which gives the exact frame count and the keyframe
+positions; a single frame at a keyframe near the start becomes the thumbnail.
+The results are kept in ``index.json`` and reused until the file's size or
+modification time changes, so listing and selecting videos never opens a
+decoder. Files copied into the directory by hand are indexed on the next scan.
+"""
+
+import json
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+import uuid
+
+import cv2
+from werkzeug.utils import secure_filename
+
+INDEX_VERSION = 1  # Bump to re-index every file after changing what is probed
+UPLOAD_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+UPLOAD_TTL = 24 * 3600  # Abandoned uploads are deleted after a day untouched
+# Undecoded packet reads with keyframe flags (OpenCV >= 4.5)
+HAS_PACKET_ACCESS = hasattr(cv2, "CAP_PROP_LRF_HAS_KEY_FRAME")
+
+
+class UploadError(Exception):
+    """An upload request that cannot be honoured.
+
+    ``status`` is the HTTP status to answer with; ``offset`` is set when the
+    client should resume from another position.
+    """
+
+    def __init__(self, message: str, status: int = 400, offset: int | None = None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+class Upload:
+    """A video being uploaded; ``offset`` bytes of ``size`` have arrived."""
+
+    __slots__ = ("id", "filename", "size", "created", "offset")
+
+    def __init__(self, upload_id: str, filename: str, size: int, created: float):
+        self.id = upload_id
+        self.filename = filename
+        self.size = size
+        self.created = created
+        self.offset = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "filename": self.filename,
+            "size": self.size,
+            "offset": self.offset,
+            "created": self.created,
+        }
+
+
+class VideoLibrary:
+    """Uploaded videos, their probed metadata and their thumbnails."""
+
+    def __init__(
+        self,
+        directory: str,
+        index_dir: str = "video_index",
+        extensions=("MP4", "MOV", "AVI", "WMV", "WEBM"),
+        max_upload_bytes: float = 10 * 2**30,
+        thumb_width: int = 320,
+        on_indexed=None,
+    ):
+        self.directory = directory
+        self.index_dir = index_dir
+        self.extensions = {ext.upper() for ext in extensions}
+        self.max_upload_bytes = max_upload_bytes
+        self.thumb_width = thumb_width
+        self.on_indexed = on_indexed  # Called with each new index entry
+        self.upload_dir = os.path.join(index_dir, "uploads")
+        self.thumb_dir = os.path.join(index_dir, "thumbnails")
+        for path in (directory, self.upload_dir, self.thumb_dir):
+            os.makedirs(path, exist_ok=True)
+        self._index = self._load_index()
+        self._lock = threading.Lock()
+        self._probe_lock = threading.Lock()  # One probe at a time, inline or not
+        self._queued = set()
+        self._jobs = queue.Queue()
+        self._writing = set()  # Uploads with a request streaming into them
+        self._worker = None
+
+    # Index
+
+    def allowed(self, filename: str) -> bool:
+        if "." not in filename:
+            return False
+        return filename.rsplit(".", 1)[1].upper() in self.extensions
+
+    def names(self) -> list:
+        """Video files in the directory, sorted; only lists the directory."""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            f
+            for f in os.listdir(self.directory)
+            if self.allowed(f) and os.path.isfile(os.path.join(self.directory, f))
+        )
+
+    def _stat(self, name: str):
+        try:
+            return os.stat(os.path.join(self.directory, name))
+        except OSError:
+            return None
+
+    def _fresh(self, name: str, stat) -> dict | None:
+        """The index entry for ``name`` if it still describes the file."""
+        entry = self._index.get(name)
+        if (
+            entry is not None
+            and entry["size"] == stat.st_size
+            and entry["mtime"] == stat.st_mtime
+        ):
+            return entry
+        return None
+
+    def scan(self) -> list:
+        """Queue unindexed or changed files for probing; returns their names."""
+        stale = []
+        for name in self.names():
+            stat = self._stat(name)
+            with self._lock:
+                if stat is None or self._fresh(name, stat) is not None:
+                    continue
+            stale.append(name)
+            self._queue(name)
+        return stale
+
+    def summaries(self) -> list:
+        """Every video without its keyframes; files not indexed yet are queued."""
+        videos = []
+        for name in self.names():
+            stat = self._stat(name)
+            if stat is None:
+                continue
+            with self._lock:
+                entry = self._fresh(name, stat)
+            if entry is None:
+                self._queue(name)
+                entry = {"name": name, "size": stat.st_size, "status": "indexing"}
+            else:
+                keyframes = entry["keyframes"]
+                entry = {k: v for k, v in entry.items() if k != "keyframes"}
+                entry["keyframe_count"] = len(keyframes) if keyframes else None
+            videos.append(entry)
+        return videos
+
+    def info(self, name: str, wait: bool = True) -> dict | None:
+        """The index entry for ``name``, or None if there is no such video.
+
+        An unindexed file is probed on the caller's thread when ``wait`` is
+        set (this happens only once per file), otherwise queued.
+        """
+        if os.path.basename(name) != name or not self.allowed(name):
+            return None
+        stat = self._stat(name)
+        if stat is None:
+            return None
+        with self._lock:
+            entry = self._fresh(name, stat)
+        if entry is not None:
+            return entry
+        if not wait:
+            self._queue(name)
+            return {"name": name, "size": stat.st_size, "status": "indexing"}
+        return self._index_file(name)
+
+    def thumbnail_path(self, name: str) -> str | None:
+        entry = self.info(name, wait=False)
+        if entry is None or not entry.get("thumbnail"):
+            return None
+        return os.path.join(self.thumb_dir, entry["thumbnail"])
+
+    def _queue(self, name: str):
+        with self._lock:
+            if name in self._queued:
+                return
+            self._queued.add(name)
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, daemon=True)
+                self._worker.start()
+        self._jobs.put(name)
+
+    def _run(self):
+        while True:
+            name = self._jobs.get()
+            try:
+                self._index_file(name)
+            except Exception as e:
+                print(f"Indexing {name} failed:", e)
+            finally:
+                with self._lock:
+                    self._queued.discard(name)
+
+    def _index_file(self, name: str) -> dict | None:
+        with self._probe_lock:
+            stat = self._stat(name)
+            if stat is None:
+                return None
+            with self._lock:
+                entry = self._fresh(name, stat)
+            if entry is not None:
+                return entry  # Probed meanwhile by another caller
+
+            entry = {
+                "name": name,
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+                "indexed_at": time.time(),
+            }
+            entry.update(self._probe(name))
+            with self._lock:
+                self._index[name] = entry
+                index = dict(self._index)
+            self._save_index(index)
+        if self.on_indexed is not None:
+            self.on_indexed(entry)
+        return entry
+
+    def _probe(self, name: str) -> dict:
+        """Metadata, keyframe positions and thumbnail of one file."""
+        path = os.path.join(self.directory, name)
+        result = {
+            "status": "error",
+            "error": None,
+            "fps": None,
+            "frames": None,
+            "duration": None,
+            "width": None,
+            "height": None,
+            "codec": None,
+            "keyframes": None,
+            "thumbnail": None,
+        }
+
+        # Packets only: with CAP_PROP_FORMAT = -1 grab() returns the encoded
+        # packet without decoding it, so counting frames costs next to nothing.
+        # Needs OpenCV >= 4.5 (capture params, keyframe flag); older builds
+        # fall back to the header frame count below and have no keyframes
+        if HAS_PACKET_ACCESS:
+            capture = cv2.VideoCapture(
+                path, cv2.CAP_FFMPEG, [cv2.CAP_PROP_FORMAT, -1]
+            )
+            if capture.isOpened():
+                frames, keyframes = 0, []
+                while capture.grab():
+                    if capture.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+                        keyframes.append(frames)
+                    frames += 1
+                result["frames"] = frames
+                result["keyframes"] = keyframes
+            capture.release()
+
+        capture = cv2.VideoCapture(path)
+        try:
+            if not capture.isOpened():
+                result["error"] = "Not a readable video"
+                return result
+            fps = capture.get(cv2.CAP_PROP_FPS)
+            fourcc = int(capture.get(cv2.CAP_PROP_FOURCC))
+            result["fps"] = round(fps, 3) if fps > 0 else None
+            result["width"] = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+            result["height"] = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            result["codec"] = (
+                fourcc.to_bytes(4, "little").decode("ascii", "replace").strip("\0")
+                or None
+            )
+            if result["frames"] is None:
+                # No packet access (old OpenCV, not FFmpeg): trust the header
+                result["frames"] = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+            if result["fps"] and result["frames"]:
+                result["duration"] = round(result["frames"] / result["fps"], 3)
+
+            # Seek to a keyframe about a tenth of the way in: decoding starts
+            # there, so only one frame is decoded for the thumbnail
+            target = 0
+            if result["keyframes"] and result["frames"]:
+                tenth = result["frames"] // 10
+                target = max([k for k in result["keyframes"] if k <= tenth] or [0])
+            if target:
+                capture.set(cv2.CAP_PROP_POS_FRAMES, target)
+            ok, frame = capture.read()
+            if not ok and target:
+                capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ok, frame = capture.read()
+            if not ok:
+                result["error"] = "No decodable frames"
+                return result
+            result["thumbnail"] = self._write_thumbnail(name, frame)
+            result["status"] = "ready"
+            return result
+        finally:
+            capture.release()
+
+    def _write_thumbnail(self, name: str, frame) -> str | None:
+        height, width = frame.shape[:2]
+        if width > self.thumb_width:
+            frame = cv2.resize(
+                frame,
+                (self.thumb_width, round(height * self.thumb_width / width)),
+                interpolation=cv2.INTER_AREA,
+            )
+        ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
+        if not ok:
+            return None
+        thumbnail = f"{name}.jpg"
+        path = os.path.join(self.thumb_dir, thumbnail)
+        with open(path + ".tmp", "wb") as f:
+            f.write(buffer.tobytes())
+        os.replace(path + ".tmp", path)
+        return thumbnail
+
+    def _load_index(self) -> dict:
+        try:
+            with open(os.path.join(self.index_dir, "index.json")) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if data.get("version") != INDEX_VERSION:
+            return {}
+        return data.get("videos", {})
+
+    def _save_index(self, index: dict):
+        path = os.path.join(self.index_dir, "index.json")
+        try:
+            with open(path + ".tmp", "w") as f:
+                json.dump({"version": INDEX_VERSION, "videos": index}, f)
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            print("Could not save the video index:", e)
+
+    # Uploads
+
+    def _upload_paths(self, upload_id: str):
+        base = os.path.join(self.upload_dir, upload_id)
+        return base + ".json", base + ".part"
+
+    def create_upload(self, filename: str, size) -> Upload:
+        """Start an upload of ``size`` bytes to be saved as ``filename``."""
+        self.expire_uploads()
+        filename = secure_filename(filename or "")
+        if not self.allowed(filename):
+            raise UploadError("Invalid video file type")
+        try:
+            size = int(size)
+        except (TypeError, ValueError):
+            raise UploadError("Invalid size") from None
+        if size <= 0:
+            raise UploadError("Invalid size")
+        if size > self.max_upload_bytes:
+            raise UploadError("Video too large", status=413)
+
+        upload = Upload(uuid.uuid4().hex, filename, size, time.time())
+        meta_path, part_path = self._upload_paths(upload.id)
+        open(part_path, "wb").close()
+        with open(meta_path, "w") as f:
+            json.dump(
+                {"filename": filename, "size": size, "created": upload.created}, f
+            )
+        return upload
+
+    def upload(self, upload_id: str) -> Upload:
+        """The upload ``upload_id`` with its current offset."""
+        if not UPLOAD_ID_PATTERN.match(upload_id):
+            raise UploadError("Upload not found", status=404)
+        meta_path, part_path = self._upload_paths(upload_id)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            offset = os.path.getsize(part_path)
+        except (OSError, ValueError):
+            raise UploadError("Upload not found", status=404) from None
+        upload = Upload(upload_id, meta["filename"], meta["size"], meta["created"])
+        upload.offset = offset
+        return upload
+
+    def write(
+        self, upload_id: str, offset: int, stream, chunk_size: int = 1 << 20
+    ) -> tuple:
+        """Append ``stream`` to an upload at ``offset``.
+
+        Reads and writes ``chunk_size`` bytes at a time, so memory use does
+        not depend on the request size. Returns ``(upload, video_name)``;
+        ``video_name`` is set once the last byte has arrived and the file
+        has been moved into the library.
+        """
+        with self._lock:
+            if upload_id in self._writing:
+                raise UploadError("Upload already in progress", status=409)
+            self._writing.add(upload_id)
+        try:
+            upload = self.upload(upload_id)
+            if offset != upload.offset:
+                raise UploadError(
+                    "Offset does not match the upload", status=409, offset=upload.offset
+                )
+            _, part_path = self._upload_paths(upload_id)
+            with open(part_path, "ab") as f:
+                while upload.offset < upload.size:
+                    chunk = stream.read(min(chunk_size, upload.size - upload.offset))
+                    if not chunk:
+                        break
+                    f.write(chunk)
+                    upload.offset += len(chunk)
+                if stream.read(1):
+                    # The whole chunk is refused, so it can be sent again
+                    f.truncate(offset)
+                    raise UploadError(
+                        "More data than the declared size", status=413, offset=offset
+                    )
+            os.utime(self._upload_paths(upload_id)[0])  # Still alive
+            if upload.offset < upload.size:
+                return upload, None
+            return upload, self._complete(upload)
+        finally:
+            with self._lock:
+                self._writing.discard(upload_id)
+
+    def _complete(self, upload: Upload) -> str:
+        meta_path, part_path = self._upload_paths(upload.id)
+        with self._lock:
+            # Never overwrite: "clip.mp4" becomes "clip-1.mp4" and so on
+            stem, ext = os.path.splitext(upload.filename)
+            name, n = upload.filename, 0
+            while os.path.exists(os.path.join(self.directory, name)):
+                n += 1
+                name = f"{stem}-{n}{ext}"
+            shutil.move(part_path, os.path.join(self.directory, name))
+        os.remove(meta_path)
+        self._queue(name)
+        return name
+
+    def cancel(self, upload_id: str) -> bool:
+        """Delete an upload; refused (409) while a request is writing to it."""
+        if not UPLOAD_ID_PATTERN.match(upload_id):
+            return False
+        removed = False
+        with self._lock:
+            if upload_id in self._writing:
+                raise UploadError("Upload in progress", status=409)
+            for path in self._upload_paths(upload_id):
+                try:
+                    os.remove(path)
+                    removed = True
+                except FileNotFoundError:
+                    pass
+        return removed
+
+    def uploads(self) -> list:
+        """Unfinished uploads, oldest first."""
+        found = []
+        for filename in os.listdir(self.upload_dir):
+            if filename.endswith(".json"):
+                try:
+                    found.append(self.upload(filename[: -len(".json")]).as_dict())
+                except UploadError:
+                    pass
+        return sorted(found, key=lambda u: u["created"])
+
+    def expire_uploads(self, now: float | None = None):
+        """Delete uploads nothing has been written to for ``UPLOAD_TTL``."""
+        cutoff = (time.time() if now is None else now) - UPLOAD_TTL
+        for filename in os.listdir(self.upload_dir):
+            upload_id = filename.split(".", 1)[0]
+            meta_path, _ = self._upload_paths(upload_id)
+            try:
+                touched = os.path.getmtime(meta_path)
+            except OSError:
+                touched = 0  # A part without its description
+            if touched < cutoff:
+                try:
+                    self.cancel(upload_id)
+                except UploadError:
+                    pass  # Written to after all